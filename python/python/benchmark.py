@@ -0,0 +1,331 @@
+"""
+reproducible benchmark suite for the D* Lite planners.
+
+every case is a seeded map (random obstacles, maze or rooms), a start and goal in opposite
+corners and a scripted sequence of obstacle changes that the robot discovers through
+SLAM.rescan while it drives to the goal. reported per case: expansions, heap operations,
+wall time per replan and peak memory, written as JSON so that runs of two revisions can
+be compared with --compare
+
+usage: python benchmark.py [--sizes 50 100 250] [--generators random maze rooms]
+                           [--densities 0.2] [--change-rates 0.0 0.05] [--planners dstar flat]
+                           [--seeds 0] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from instrumentation import PlannerStats
+from utils import heuristic, NoPathError
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+PLANNERS = {
+    'dstar': DStarLite,
+    'flat': FlatDStarLite,
+}
+
+SIZES = (50, 100, 250, 500, 1000, 2000)
+
+
+def random_grid(size: int, density: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    :param size: edge length of the grid, or its (x_dim, y_dim)
+    :return: (size, size) grid with uniformly distributed obstacle cells
+    """
+    shape = (size, size) if np.isscalar(size) else tuple(size)
+    return np.where(rng.random(shape) < density, OBSTACLE, UNOCCUPIED).astype(np.uint8)
+
+
+def maze_grid(size: int, density: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    perfect maze carved by a randomized depth first search on the odd cells. density is the
+    fraction of walls knocked down afterwards to create loops
+    :return: (size, size) grid
+    """
+    grid = np.full((size, size), OBSTACLE, dtype=np.uint8)
+    cells = (size - 1) // 2
+    visited = np.zeros((cells, cells), dtype=bool)
+    stack = [(0, 0)]
+    visited[0, 0] = True
+    grid[1, 1] = UNOCCUPIED
+    directions = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    while stack:
+        (cx, cy) = stack[-1]
+        options = [(cx + dx, cy + dy) for (dx, dy) in directions
+                   if 0 <= cx + dx < cells and 0 <= cy + dy < cells and not visited[cx + dx, cy + dy]]
+        if not options:
+            stack.pop()
+            continue
+        (nx, ny) = options[rng.integers(len(options))]
+        visited[nx, ny] = True
+        grid[2 * nx + 1, 2 * ny + 1] = UNOCCUPIED
+        grid[cx + nx + 1, cy + ny + 1] = UNOCCUPIED  # the wall between the two cells
+        stack.append((nx, ny))
+
+    inner = grid[1:-1, 1:-1]
+    inner[(inner == OBSTACLE) & (rng.random(inner.shape) < density)] = UNOCCUPIED
+    return grid
+
+
+def rooms_grid(size: int, density: float, rng: np.random.Generator, room_size: int = 12) -> np.ndarray:
+    """
+    square rooms separated by one cell thick walls with a door to every neighboring room,
+    furnished with random obstacles of the given density
+    :return: (size, size) grid
+    """
+    grid = random_grid(size, density, rng)
+    walls = np.arange(room_size, size, room_size)
+    grid[walls, :] = OBSTACLE
+    grid[:, walls] = OBSTACLE
+    starts = np.concatenate([[0], walls + 1])
+    ends = np.concatenate([walls, [size]])
+    for wall in walls:
+        for lo, hi in zip(starts, ends):
+            if hi - lo < 3:
+                continue
+            door = rng.integers(lo, hi - 2)
+            grid[wall, door:door + 2] = UNOCCUPIED
+            door = rng.integers(lo, hi - 2)
+            grid[door:door + 2, wall] = UNOCCUPIED
+    return grid
+
+
+GENERATORS = {
+    'random': random_grid,
+    'maze': maze_grid,
+    'rooms': rooms_grid,
+}
+
+
+def make_case(generator: str, size: int, density: float, change_rate: float, seed: int,
+              view_range: int) -> dict:
+    """
+    :return: a benchmark case: ground truth grid, start, goal and change script.
+             the script is a list of (step, distance, lateral, block, value) events. at the given
+             step a block x block square around the cell 'distance' cells from the robot towards
+             the goal, shifted 'lateral' cells sideways, is set to value
+    """
+    rng = np.random.default_rng(seed)
+    grid = GENERATORS[generator](size, density, rng)
+    start, goal = (1, 1), (size - 2, size - 2)
+    grid[start] = grid[goal] = UNOCCUPIED
+
+    script = []
+    for step in np.flatnonzero(rng.random(4 * size) < change_rate).tolist():
+        script.append((step,
+                       int(rng.integers(2, 2 * view_range + 1)),
+                       int(rng.integers(-view_range, view_range + 1)),
+                       int(rng.integers(1, 4)),
+                       OBSTACLE if rng.random() < 0.7 else UNOCCUPIED))
+    return {'grid': grid, 'start': start, 'goal': goal, 'script': script}
+
+
+def apply_event(world: OccupancyGridMap, position: (int, int), goal: (int, int), event: tuple):
+    """
+    apply one change script event to the ground truth map, leaving robot and goal free
+    """
+    (_, distance, lateral, block, value) = event
+    (dx, dy) = (goal[0] - position[0], goal[1] - position[1])
+    norm = math.hypot(dx, dy) or 1.0
+    cx = int(round(position[0] + distance * dx / norm - lateral * dy / norm))
+    cy = int(round(position[1] + distance * dy / norm + lateral * dx / norm))
+    # clamp both bounds, a negative upper bound would wrap around the map
+    (x_min, x_max) = (min(max(cx - block // 2, 0), world.x_dim), min(max(cx + block - block // 2, 0), world.x_dim))
+    (y_min, y_max) = (min(max(cy - block // 2, 0), world.y_dim), min(max(cy + block - block // 2, 0), world.y_dim))
+    world.occupancy_grid_map[x_min:x_max, y_min:y_max] = value
+    for keep in (position, goal):
+        world.remove_obstacle(keep)
+
+
+def run_case(case: dict, planner: str, view_range: int, max_steps: int = None, cost_table=None,
+             options: dict = None) -> dict:
+    """
+    drive from start to goal, applying the change script, and measure the planner
+    :param cost_table: plan on a cost map with this table, see OccupancyGridMap
+    :param options: further keyword arguments of the planner, e.g. {'epsilon': 2.0}
+    :return: metrics of the run and the path driven
+    """
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1], cost_table=cost_table)
+    world.set_map(case['grid'].copy())
+    (start, goal) = (case['start'], case['goal'])
+    script = list(case['script'])
+    max_steps = max_steps or 4 * world.x_dim * world.y_dim
+
+    stats = PlannerStats()
+    dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal, stats=stats, **(options or {}))
+    slam = SLAM(map=world, view_range=view_range)
+
+    position = start
+    path = [start]
+    replan_times = []
+    scan_time = 0.0
+    status = 'reached'
+    while position != goal:
+        if len(path) > max_steps:
+            status = 'max_steps'
+            break
+        while script and script[0][0] <= len(path) - 1:
+            apply_event(world, position, goal, script.pop(0))
+
+        t = time.perf_counter()
+        changes, slam_map = slam.rescan(global_position=position)
+        scan_time += time.perf_counter() - t
+
+        t = time.perf_counter()
+        try:
+            dstar.apply_changes(changes=changes, sensed_map=slam_map, robot_position=position)
+            position = dstar.next_step()
+        except NoPathError:
+            status = 'no_path'
+            break
+        finally:
+            replan_times.append(time.perf_counter() - t)
+        path.append(position)
+
+    replan_times = np.array(replan_times)
+    return {
+        'status': status,
+        'steps': len(path) - 1,
+        'path_cost': sum(heuristic(p, q) for p, q in zip(path, path[1:])),
+        'path': path,
+        'replans': len(replan_times),
+        'expansions': stats.expansions,
+        'heap_operations': stats.heap_inserts + stats.heap_updates + stats.heap_removes,
+        'counters': {name: getattr(stats, name) for name in PlannerStats.COUNTERS},
+        'planning_time': float(replan_times.sum()),
+        'first_plan_time': float(replan_times[0]) if len(replan_times) else 0.0,
+        'replan_time_mean': float(replan_times.mean()) if len(replan_times) else 0.0,
+        'replan_time_p95': float(np.percentile(replan_times, 95)) if len(replan_times) else 0.0,
+        'replan_time_max': float(replan_times.max()) if len(replan_times) else 0.0,
+        'scan_time': scan_time,
+    }
+
+
+def peak_memory(case: dict, planner: str, view_range: int) -> int:
+    """
+    peak memory allocated while building the planner and computing the first plan. measured
+    separately because tracemalloc slows down the timed runs
+    :return: bytes
+    """
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    tracemalloc.start()
+    try:
+        dstar = PLANNERS[planner](map=world, s_start=case['start'], s_goal=case['goal'])
+        slam = SLAM(map=world, view_range=view_range)
+        changes, slam_map = slam.rescan(global_position=case['start'])
+        try:
+            dstar.apply_changes(changes=changes, sensed_map=slam_map)
+            dstar.next_step()
+        except NoPathError:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes, generators, densities, change_rates, planners, seeds, view_range, memory=True,
+              log=sys.stderr) -> dict:
+    """
+    :return: JSON serializable results of every combination of the parameters
+    """
+    results = []
+    for size in sizes:
+        for generator in generators:
+            for density in densities:
+                for change_rate in change_rates:
+                    for seed in seeds:
+                        case = make_case(generator, size, density, change_rate, seed, view_range)
+                        for planner in planners:
+                            params = {'size': size, 'generator': generator, 'density': density,
+                                      'change_rate': change_rate, 'seed': seed, 'planner': planner,
+                                      'view_range': view_range}
+                            metrics = run_case(case, planner, view_range)
+                            del metrics['path']
+                            metrics['peak_memory'] = peak_memory(case, planner, view_range) if memory else None
+                            results.append(dict(params, **metrics))
+                            if log:
+                                print(format_row(results[-1]), file=log)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+KEY = ('size', 'generator', 'density', 'change_rate', 'seed', 'planner', 'view_range')
+
+
+def format_row(result: dict) -> str:
+    return "{size:>5} {generator:<7} d={density:<5} cr={change_rate:<5} seed={seed:<3} {planner:<6} " \
+           "{status:<9} steps={steps:<6} expansions={expansions} planning={planning_time:.3f}s " \
+           "replan_mean={replan_time_mean:.5f}s".format(**result)
+
+
+def compare(baseline: dict, current: dict):
+    """
+    print the ratio current / baseline of the timing metrics for every case in both runs
+    """
+    before = {tuple(r[k] for k in KEY): r for r in baseline['results']}
+    print("{:<60}{:>14}{:>14}{:>14}".format("case", "planning", "replan_p95", "expansions"))
+    for result in current['results']:
+        case = tuple(result[k] for k in KEY)
+        if case not in before:
+            continue
+        old = before[case]
+        ratios = []
+        for metric in ('planning_time', 'replan_time_p95', 'expansions'):
+            if old.get(metric) and result.get(metric) is not None:
+                ratios.append("{:.2f}x".format(result[metric] / old[metric]))
+            else:
+                ratios.append("-")
+        print("{:<60}{:>14}{:>14}{:>14}".format(" ".join(str(c) for c in case), *ratios))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES[:3],
+                        help='map side lengths, the full range is {}'.format(' '.join(map(str, SIZES))))
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--change-rates', type=float, nargs='+', default=[0.0, 0.05],
+                        help='probability of an obstacle change per robot step')
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=sorted(PLANNERS))
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='JSON results of a baseline run')
+    args = parser.parse_args(argv)
+
+    results = run_suite(sizes=args.sizes,
+                        generators=args.generators,
+                        densities=args.densities,
+                        change_rates=args.change_rates,
+                        planners=args.planners,
+                        seeds=args.seeds,
+                        view_range=args.view_range,
+                        memory=not args.no_memory)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    return results
+
+
+if __name__ == '__main__':
+    main()
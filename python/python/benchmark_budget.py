@@ -0,0 +1,75 @@
+"""
+control cycle times with and without a replan budget. the robot drives through a benchmark case
+with the stepping API, a cycle is rescan, apply_changes and next_step. without a budget the
+first plan and large obstacle reveals block single cycles for long, with a budget the search is
+spread over the following cycles and the robot waits or takes the best step known meanwhile
+
+usage: python benchmark_budget.py [--sizes 250 500 1000] [--generator rooms] [--density 0.2]
+                                  [--change-rate 0.05] [--planners dstar flat] [--budget 0.05] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmark import apply_event, make_case, GENERATORS, PLANNERS
+from grid import OccupancyGridMap, SLAM
+from utils import heuristic
+
+
+def drive(case: dict, planner: str, budget: float, view_range: int) -> dict:
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    (start, goal) = (case['start'], case['goal'])
+    script = list(case['script'])
+    dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal)
+    dstar.set_budget(time_budget=budget)
+    slam = SLAM(map=world, view_range=view_range)
+
+    position = start
+    path = [start]
+    cycles = []
+    for _ in range(8 * world.x_dim * world.y_dim):
+        if position == goal:
+            break
+        while script and script[0][0] <= len(path) - 1:
+            apply_event(world, position, goal, script.pop(0))
+        t = time.perf_counter()
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        position = dstar.next_step()
+        cycles.append(time.perf_counter() - t)
+        path.append(position)
+    cycles = np.array(cycles)
+    return {'reached': position == goal, 'cycles': len(cycles), 'waits': sum(p == q for p, q in zip(path, path[1:])),
+            'path_cost': sum(heuristic(p, q) for p, q in zip(path, path[1:])),
+            'p99': float(np.percentile(cycles, 99)), 'max': float(cycles.max())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=['dstar', 'flat'])
+    parser.add_argument('--budget', type=float, default=0.05, help='seconds per replan')
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>10}{:>9}{:>8}{:>12}{:>12}{:>12}".format("size", "planner", "budget", "cycles", "waits",
+                                                              "path cost", "p99 [ms]", "max [ms]"))
+    for size in args.sizes:
+        case = make_case(args.generator, size, args.density, args.change_rate, args.seed, args.view_range)
+        for planner in args.planners:
+            for budget in (None, args.budget):
+                result = drive(case, planner, budget, args.view_range)
+                print("{:>6}{:>8}{:>10}{:>9}{:>8}{:>12.1f}{:>12.1f}{:>12.1f}{}".format(
+                    size, planner, '-' if budget is None else '{:g} s'.format(budget), result['cycles'],
+                    result['waits'], result['path_cost'], result['p99'] * 1e3, result['max'] * 1e3,
+                    '' if result['reached'] else '  (goal not reached)'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+DStarLite on the binary map against the same map as cost map, where the cells next to
+obstacles are slow, and the binary planning time against the cost table free planning
+of earlier revisions (run benchmark.py --compare for that)
+
+usage: python benchmark_cost_map.py [--sizes 100 200] [--generators random rooms] [--density 0.2]
+                                    [--change-rate 0.05] [--seed 0]
+"""
+import argparse
+
+import numpy as np
+
+from benchmark import make_case, run_case, GENERATORS
+from grid import linear_cost_table
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+SLOW = 128
+
+
+def inflate(grid: np.ndarray, radius: int = 1) -> np.ndarray:
+    """
+    :return: copy of the grid with the free cells within radius of an obstacle set to SLOW
+    """
+    obstacles = grid == OBSTACLE
+    near = np.zeros_like(obstacles)
+    padded = np.pad(obstacles, radius)
+    for dx in range(2 * radius + 1):
+        for dy in range(2 * radius + 1):
+            near |= padded[dx:dx + grid.shape[0], dy:dy + grid.shape[1]]
+    inflated = grid.copy()
+    inflated[near & ~obstacles] = SLOW
+    return inflated
+
+
+def clearance(grid: np.ndarray, path: list) -> float:
+    """
+    :return: fraction of the path cells that are next to an obstacle
+    """
+    near = inflate(grid) == SLOW
+    return float(np.mean([near[p] for p in path]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=['random', 'rooms'])
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>9}{:>8}{:>10}{:>12}{:>14}{:>11}{:>14}".format(
+        "size", "map", "mode", "status", "expansions", "planning [s]", "steps", "near walls"))
+    for size in args.sizes:
+        for generator in args.generators:
+            case = make_case(generator, size, args.density, args.change_rate, args.seed, args.view_range)
+            binary = case['grid']
+            weighted = dict(case, grid=inflate(binary))
+            for mode, run, cost_table in (('binary', case, None), ('cost', weighted, linear_cost_table(4.0))):
+                result = run_case(run, 'dstar', args.view_range, cost_table=cost_table)
+                print("{:>6}{:>9}{:>8}{:>10}{:>12}{:>14.3f}{:>11}{:>14.2f}".format(
+                    size, generator, mode, result['status'], result['expansions'], result['planning_time'],
+                    result['steps'], clearance(binary, result['path'])))
+
+
+if __name__ == '__main__':
+    main()
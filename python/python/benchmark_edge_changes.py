@@ -0,0 +1,108 @@
+"""
+repair time after a large obstacle reveal, e.g. a door closing or a pallet dropped in front
+of the robot: the batched edge change application of the planners against applying the
+changed edges one by one as in the original D* Lite pseudo code
+
+usage: python benchmark_edge_changes.py [--size 200] [--blocks 5 20 60] [--planners dstar flat]
+                                        [--repeat 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from instrumentation import PlannerStats
+from utils import EdgeChanges
+
+PLANNERS = {'dstar': DStarLite, 'flat': FlatDStarLite}
+
+
+def apply_sequential(dstar, changes: EdgeChanges) -> int:
+    """
+    the reference: every changed edge (u,v) updates rhs(u) and queues u on its own. the robot
+    must not have moved since the last plan, k_m is left as it is
+    :return: number of changed edges
+    """
+    vertex = (lambda p: (p[0] + 1) * dstar.width + p[1] + 1) if isinstance(dstar, FlatDStarLite) else tuple
+    inf = float('inf')
+    edge_changes = 0
+    for u, v, c_old in changes.edges():
+        u, v = vertex(u), vertex(v)
+        edge_changes += 1
+        c_new = dstar.c(u, v)
+        if c_old > c_new:
+            if u != dstar.s_goal:
+                dstar.rhs[u] = min(dstar.rhs[u], c_new + dstar.g[v])
+        elif dstar.rhs[u] != inf and dstar.rhs[u] == c_old + dstar.g[v]:
+            if u != dstar.s_goal:
+                dstar.rhs[u] = dstar.min_successor_cost(u)
+                if dstar.stats is not None:
+                    dstar.stats.rhs_recomputations += 1
+        dstar.update_vertex(u)
+    for v in changes.cells.tolist():
+        v = vertex(v)
+        if v != dstar.s_goal:
+            dstar.rhs[v] = dstar.min_successor_cost(v)
+            if dstar.stats is not None:
+                dstar.stats.rhs_recomputations += 1
+        dstar.update_vertex(v)
+    return edge_changes
+
+
+def reveal(size: int, block: int, planner: str, batched: bool) -> dict:
+    """
+    plan across an empty map, then reveal a block x block square of obstacles in the middle
+    :return: time of applying the changed edges and of the whole repair, rhs recomputations
+             of applying the edges, heap operations of the repair and the repaired g values
+    """
+    world = OccupancyGridMap(x_dim=size, y_dim=size)
+    start, goal = (size // 2, 2), (size // 2, size - 3)
+    slam = SLAM(map=world, view_range=size)
+    stats = PlannerStats()
+    dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal, stats=stats, sensed_map=slam.slam_map)
+    dstar.apply_changes(changes=slam.rescan(global_position=start)[0])
+
+    (x0, y0) = (size // 2 - block // 2, size // 2 - block // 2)
+    world.occupancy_grid_map[x0:x0 + block, y0:y0 + block] = 255
+    changes, _ = slam.rescan(global_position=start)
+    stats.reset()
+    if planner == 'flat':
+        dstar.sync_map(changes.cells)
+    t = time.perf_counter()
+    if batched:
+        dstar._apply_edge_changes(changes)
+    else:
+        apply_sequential(dstar, changes)
+    apply_recomputations = stats.rhs_recomputations
+    apply_time = time.perf_counter() - t
+    dstar.compute_shortest_path()
+    repair_time = time.perf_counter() - t
+    return {'apply_time': apply_time, 'repair_time': repair_time, 'apply_recomputations': apply_recomputations,
+            'heap_operations': stats.heap_inserts + stats.heap_updates + stats.heap_removes,
+            'g': np.array(dstar.g, dtype=float)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--blocks', type=int, nargs='+', default=[5, 20, 60])
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=['dstar', 'flat'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>10}{:>12}{:>14}{:>16}{:>12}".format("block", "planner", "mode", "apply [ms]", "repair [ms]",
+                                                            "rhs recomputed", "heap ops"))
+    for block in args.blocks:
+        for planner in args.planners:
+            for name, batched in (('per edge', False), ('batched', True)):
+                runs = [reveal(args.size, block, planner, batched) for _ in range(args.repeat)]
+                result = min(runs, key=lambda r: r['repair_time'])
+                print("{:>6}{:>8}{:>10}{:>12.2f}{:>14.2f}{:>16}{:>12}".format(
+                    block, planner, name, min(r['apply_time'] for r in runs) * 1e3, result['repair_time'] * 1e3,
+                    result['apply_recomputations'], result['heap_operations']))
+
+if __name__ == '__main__':
+    main()
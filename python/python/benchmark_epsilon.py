@@ -0,0 +1,82 @@
+"""
+expansions and path cost of DStarLite with an inflated heuristic, per epsilon, relative to
+epsilon = 1. 'first plan' plans once on the fully known map, 'drive' walks the unknown map
+with the change script of benchmark.py. the anytime rows start with the largest epsilon and
+lower it step by step to 1, reporting the expansions each step adds
+
+usage: python benchmark_epsilon.py [--size 150] [--generators random rooms] [--density 0.2]
+                                   [--epsilons 1 1.5 2 3 5] [--change-rate 0.05] [--seed 0]
+"""
+import argparse
+import time
+
+from benchmark import make_case, run_case, GENERATORS
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap
+from instrumentation import PlannerStats
+from utils import heuristic
+
+
+def path_cost(path: list) -> float:
+    return sum(heuristic(p, q) for p, q in zip(path, path[1:]))
+
+
+def first_plan(case: dict, epsilon: float) -> dict:
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'])
+    dstar = DStarLite(map=world, s_start=case['start'], s_goal=case['goal'], sensed_map=world,
+                      stats=PlannerStats(), epsilon=epsilon)
+    t = time.perf_counter()
+    dstar.replan()
+    planning_time = time.perf_counter() - t
+    return {'dstar': dstar, 'expansions': dstar.stats.expansions, 'planning_time': planning_time,
+            'path_cost': path_cost(list(dstar.current_path()))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=150)
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=['random', 'rooms'])
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--epsilons', type=float, nargs='+', default=[1.0, 1.5, 2.0, 3.0, 5.0])
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>8}{:>12}{:>9}{:>12}{:>14}{:>12}".format("map", "mode", "epsilon", "expansions", "planning [s]",
+                                                      "cost ratio"))
+    row = "{:>8}{:>12}{:>9.2f}{:>12}{:>14.3f}{:>12.3f}"
+    for generator in args.generators:
+        case = make_case(generator, args.size, args.density, args.change_rate, args.seed, args.view_range)
+
+        reference = first_plan(case, 1.0)
+        for epsilon in args.epsilons:
+            result = first_plan(case, epsilon)
+            print(row.format(generator, 'first plan', epsilon, result['expansions'], result['planning_time'],
+                             result['path_cost'] / reference['path_cost']))
+
+        # anytime: every lower epsilon continues the search of the one before
+        epsilons = sorted(args.epsilons, reverse=True)
+        result = first_plan(case, epsilons[0])
+        dstar = result['dstar']
+        print(row.format(generator, 'anytime', epsilons[0], result['expansions'], result['planning_time'],
+                         result['path_cost'] / reference['path_cost']))
+        for epsilon in epsilons[1:]:
+            dstar.stats.reset()
+            t = time.perf_counter()
+            dstar.set_epsilon(epsilon)
+            dstar.replan()
+            planning_time = time.perf_counter() - t
+            print(row.format(generator, 'anytime', epsilon, dstar.stats.expansions, planning_time,
+                             path_cost(list(dstar.current_path())) / reference['path_cost']))
+
+        reference = run_case(case, 'dstar', args.view_range)
+        for epsilon in args.epsilons:
+            result = run_case(case, 'dstar', args.view_range, options={'epsilon': epsilon})
+            print(row.format(generator, 'drive', epsilon, result['expansions'], result['planning_time'],
+                             result['path_cost'] / reference['path_cost']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+compare FlatDStarLite against DStarLite: the first plan on a fully known map, and the
+time spent in move_and_replan on a walk to the goal on an initially unknown map that
+is revealed by SLAM rescans
+
+usage: python benchmark_flat_d_star_lite.py [--size 500] [--density 0.2] [--view-range 5] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+PLANNERS = {
+    'DStarLite': DStarLite,
+    'FlatDStarLite': FlatDStarLite,
+}
+
+
+def random_map(size: int, density: float, seed: int) -> OccupancyGridMap:
+    rng = np.random.default_rng(seed)
+    world = OccupancyGridMap(x_dim=size, y_dim=size)
+    world.set_map(np.where(rng.random((size, size)) < density, OBSTACLE, UNOCCUPIED).astype(np.uint8))
+    world.remove_obstacle((0, 0))
+    world.remove_obstacle((size - 1, size - 1))
+    return world
+
+
+def first_plan(planner_cls, world: OccupancyGridMap) -> (float, int):
+    start, goal = (0, 0), (world.x_dim - 1, world.y_dim - 1)
+    planner = planner_cls(map=world, s_start=start, s_goal=goal)
+    planner.sensed_map = world
+    t = time.perf_counter()
+    path, g, rhs = planner.move_and_replan(robot_position=start)
+    return time.perf_counter() - t, len(path)
+
+
+def walk(planner_cls, world: OccupancyGridMap, view_range: int) -> (float, int):
+    start, goal = (0, 0), (world.x_dim - 1, world.y_dim - 1)
+    planner = planner_cls(map=world, s_start=start, s_goal=goal)
+    slam = SLAM(map=world, view_range=view_range)
+    position = start
+    steps = 0
+    planning_time = 0.0
+    while position != goal:
+        planner.new_edges_and_old_costs, planner.sensed_map = slam.rescan(global_position=position)
+        t = time.perf_counter()
+        path, g, rhs = planner.move_and_replan(robot_position=position)
+        planning_time += time.perf_counter() - t
+        position = path[1]
+        steps += 1
+    return planning_time, steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=500, help='side length of the map')
+    parser.add_argument('--density', type=float, default=0.2, help='obstacle density')
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    world = random_map(size=args.size, density=args.density, seed=args.seed)
+    results = {}
+    for name, planner_cls in PLANNERS.items():
+        results[name] = (first_plan(planner_cls, world), walk(planner_cls, world, args.view_range))
+
+    reference = results['DStarLite']
+    print("{:<16}{:>16}{:>10}{:>16}{:>10}".format("planner", "first plan [s]", "speedup", "walk [s]", "speedup"))
+    for name, ((plan_time, path_length), (walk_time, steps)) in results.items():
+        print("{:<16}{:>16.3f}{:>10.1f}{:>16.3f}{:>10.1f}".format(name,
+                                                               plan_time, reference[0][0] / plan_time,
+                                                               walk_time, reference[1][0] / walk_time))
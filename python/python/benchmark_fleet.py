@@ -0,0 +1,119 @@
+"""
+memory and step time of a fleet sharing one sensed map (FleetPlanner) against the same
+robots planning independently, each with its own SLAM map
+
+usage: python benchmark_fleet.py [--size 200] [--robots 1 8 64] [--planner flat] [--steps 20]
+                                 [--processes 0 4] [--seed 0] [--output results.json]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmark import rooms_grid
+from flat_d_star_lite import layout
+from fleet import FleetPlanner, PLANNERS, _advance
+from grid import OccupancyGridMap, SLAM
+
+
+def make_robots(grid: np.ndarray, count: int, rng: np.random.Generator) -> list:
+    free = np.argwhere(grid == 0)
+    picks = rng.choice(len(free), size=(count, 2))
+    return [(tuple(free[a].tolist()), tuple(free[b].tolist())) for a, b in picks]
+
+
+class IndependentFleet:
+    """
+    the baseline: every robot has its own SLAM map and planner and only knows what it sensed
+    itself
+    """
+
+    def __init__(self, map: OccupancyGridMap, robots: list, view_range: int, planner: str):
+        self.slams = [SLAM(map=map, view_range=view_range) for _ in robots]
+        self.planners = [PLANNERS[planner](map=map, s_start=start, s_goal=goal, sensed_map=slam.slam_map)
+                         for (start, goal), slam in zip(robots, self.slams)]
+        self.positions = [start for start, goal in robots]
+
+    def step(self):
+        for i, (slam, dstar) in enumerate(zip(self.slams, self.planners)):
+            changes, _ = slam.rescan(global_position=self.positions[i])
+            step = _advance([dstar], changes, [0])[0]
+            if step is not None:
+                self.positions[i] = step
+
+    def close(self):
+        pass
+
+
+def measure(make_fleet, steps: int) -> dict:
+    """
+    :return: memory allocated by building the fleet and taking the steps, and the mean step time
+    """
+    layout.cache_clear()  # both fleets pay for the shared vertex layout once
+    tracemalloc.start()
+    fleet = make_fleet()
+    try:
+        for _ in range(steps):
+            fleet.step()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        fleet.close()
+
+    layout.cache_clear()
+    fleet = make_fleet()
+    try:
+        t = time.perf_counter()
+        for _ in range(steps):
+            fleet.step()
+        step_time = (time.perf_counter() - t) / steps
+    finally:
+        fleet.close()
+    return {'memory': current, 'peak_memory': peak, 'step_time': step_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--robots', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--planner', choices=sorted(PLANNERS), default='flat')
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0],
+                        help='worker processes of the shared fleet, memory of workers is not traced')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    grid = rooms_grid(args.size, 0.1, rng)
+    world = OccupancyGridMap(x_dim=args.size, y_dim=args.size)
+    world.set_map(grid)
+
+    results = []
+    print("{:>7}{:>22}{:>16}{:>16}{:>14}".format("robots", "fleet", "memory [MB]", "per robot [MB]", "step [ms]"))
+    for count in args.robots:
+        robots = make_robots(grid, count, rng)
+        fleets = [('independent', lambda: IndependentFleet(world, robots, args.view_range, args.planner))]
+        for processes in args.processes:
+            fleets.append(('shared, {} processes'.format(processes),
+                           lambda p=processes: FleetPlanner(world, robots, view_range=args.view_range,
+                                                            planner=args.planner, processes=p)))
+        for name, make_fleet in fleets:
+            result = dict(measure(make_fleet, args.steps), robots=count, fleet=name, size=args.size,
+                          planner=args.planner)
+            results.append(result)
+            print("{:>7}{:>22}{:>16.2f}{:>16.3f}{:>14.2f}".format(count, name, result['memory'] / 1e6,
+                                                                  result['memory'] / 1e6 / count,
+                                                                  result['step_time'] * 1e3))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+first plan latency of robots driving to one docking station: a fresh planner per robot against
+planners taken from a GoalCache, which reuses the search tree earlier robots grew from the
+goal. the robots start at random free cells of a fully known map. the tree grows with every
+robot, so the later robots ('warm', the second half) mostly pay for copying the cached state
+
+usage: python benchmark_goal_cache.py [--sizes 250 500 1000] [--generator rooms] [--density 0.2]
+                                      [--planners dstar flat] [--robots 32] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmark import make_case, GENERATORS, PLANNERS
+from goal_cache import GoalCache
+from grid import OccupancyGridMap
+
+UNOCCUPIED = 0
+
+
+def run(case: dict, planner: str, starts: list) -> dict:
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    goal = case['goal']
+
+    fresh = []
+    costs = []
+    for start in starts:
+        t = time.perf_counter()
+        dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal, sensed_map=world)
+        dstar.replan()
+        fresh.append(time.perf_counter() - t)
+        costs.append(dstar.rhs[dstar.s_start])
+
+    cache = GoalCache(world, planner=planner)
+    cached = []
+    for start, cost in zip(starts, costs):
+        t = time.perf_counter()
+        dstar = cache.planner_for(start, goal)
+        cached.append(time.perf_counter() - t)
+        assert np.isclose(dstar.rhs[dstar.s_start], cost)
+    return {'fresh': fresh, 'cached': cached, 'memory': cache.memory}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=['dstar', 'flat'])
+    parser.add_argument('--robots', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>12}{:>12}{:>13}{:>11}{:>13}".format("size", "planner", "fresh [s]", "first [s]",
+                                                            "cached [s]", "warm [s]", "cache [MB]"))
+    for size in args.sizes:
+        case = make_case(args.generator, size, args.density, 0.0, args.seed, 0)
+        rng = np.random.default_rng(args.seed)
+        free = np.argwhere(case['grid'] == UNOCCUPIED)
+        starts = [tuple(cell) for cell in free[rng.choice(len(free), args.robots, replace=False)].tolist()]
+        for planner in args.planners:
+            result = run(case, planner, starts)
+            # the first robot misses the cache, the others reuse the tree
+            cached = result['cached']
+            print("{:>6}{:>8}{:>12.3f}{:>12.3f}{:>13.3f}{:>11.3f}{:>13.1f}".format(
+                size, planner, float(np.mean(result['fresh'])), cached[0], float(np.mean(cached[1:])),
+                float(np.mean(cached[len(cached) // 2:])), result['memory'] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+first plan latency on large, fully known maps: the time from a new goal to the first step, of
+the hierarchical planner against planning at full resolution, and the cost of the whole path
+relative to the one of FlatDStarLite
+
+usage: python benchmark_hierarchical.py [--sizes 500 1000 2000] [--generators random rooms]
+                                        [--density 0.2] [--planners flat hierarchical]
+                                        [--cluster-size 32] [--epsilon 1.2] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmark import make_case, GENERATORS, PLANNERS
+from grid import OccupancyGridMap
+from hierarchical import HierarchicalPlanner
+
+
+def first_plan(case: dict, planner: str, options: dict) -> dict:
+    """
+    plan on the known map of the case and take the first step
+    """
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    # building the planner for the new goal is part of the latency, for the hierarchical planner
+    # that is the entrances of the abstraction
+    t = time.perf_counter()
+    if planner == 'hierarchical':
+        dstar = HierarchicalPlanner(map=world, s_start=case['start'], s_goal=case['goal'], sensed_map=world,
+                                    **options)
+    else:
+        dstar = PLANNERS[planner](map=world, s_start=case['start'], s_goal=case['goal'], sensed_map=world)
+    dstar.next_step()
+    latency = time.perf_counter() - t
+    path = [case['start']] + list(dstar.current_path())
+    clusters = '-'
+    if planner == 'hierarchical':
+        clusters = "{}/{}".format(len(dstar.graph._intra), int(np.prod(dstar.graph.clusters_shape)))
+    return {'latency': latency, 'path_cost': sum(world.c(u, v) for u, v in zip(path, path[1:])),
+            'clusters': clusters}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=['random', 'rooms'])
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS) + ['hierarchical'],
+                        default=['flat', 'hierarchical'])
+    parser.add_argument('--cluster-size', type=int, default=32)
+    parser.add_argument('--epsilon', type=float, default=1.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    options = {'cluster_size': args.cluster_size, 'epsilon': args.epsilon}
+
+    print("{:>6}{:>9}{:>14}{:>14}{:>12}{:>12}".format("size", "map", "planner", "latency [s]", "cost ratio",
+                                                      "clusters"))
+    for size in args.sizes:
+        for generator in args.generators:
+            case = make_case(generator, size, args.density, 0.0, args.seed, 0)
+            results = {planner: first_plan(case, planner, options) for planner in args.planners}
+            reference = results.get('flat', next(iter(results.values())))['path_cost']
+            for planner, result in results.items():
+                print("{:>6}{:>9}{:>14}{:>14.3f}{:>12.3f}{:>12}".format(
+                    size, generator, planner, result['latency'], result['path_cost'] / reference,
+                    result['clusters']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+time of keeping the inflation layer up to date per scan, incrementally around the changed
+cells against recomputing the whole cost map, while a robot walks a diagonal through a
+rooms map
+
+usage: python benchmark_inflation.py [--sizes 200 1000] [--steps 50] [--view-range 5]
+                                     [--robot-radius 1.0] [--inflation-radius 3.0] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmark import rooms_grid
+from grid import OccupancyGridMap, SLAM
+from inflation import InflationLayer
+
+
+def run(world: OccupancyGridMap, steps: int, view_range: int, robot_radius: float, inflation_radius: float,
+        incremental: bool) -> dict:
+    layer = InflationLayer(SLAM(map=world, view_range=view_range), robot_radius=robot_radius,
+                           inflation_radius=inflation_radius)
+    update_time = 0.0
+    changed = 0
+    for step in range(steps):
+        position = (step % world.x_dim, step % world.y_dim)
+        scan, _ = layer.slam.rescan(global_position=position)
+        t = time.perf_counter()
+        changes = layer.update(scan.cells) if incremental else layer.rebuild()
+        update_time += time.perf_counter() - t
+        changed += len(changes)
+    return {'update_time': update_time / steps, 'changed_cells': changed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000])
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--robot-radius', type=float, default=1.0)
+    parser.add_argument('--inflation-radius', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>14}{:>16}{:>16}".format("size", "update", "per scan [ms]", "changed cells"))
+    for size in args.sizes:
+        world = OccupancyGridMap(x_dim=size, y_dim=size)
+        world.set_map(rooms_grid(size, 0.1, np.random.default_rng(args.seed)))
+        for name, incremental in (('incremental', True), ('full', False)):
+            result = run(world, args.steps, args.view_range, args.robot_radius, args.inflation_radius, incremental)
+            print("{:>6}{:>14}{:>16.3f}{:>16}".format(size, name, result['update_time'] * 1e3,
+                                                      result['changed_cells']))
+
+
+if __name__ == '__main__':
+    main()
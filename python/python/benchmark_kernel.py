@@ -0,0 +1,75 @@
+"""
+DStarLite with the interpreted compute_shortest_path against the kernel of kernel.py: the first
+plan and the drive through a benchmark case with the stepping API. the kernel is compiled if
+numba is installed, the compile time is paid once before the timing. without numba it runs as
+plain python, which shows its overhead instead
+
+usage: python benchmark_kernel.py [--sizes 100 250 500] [--generator rooms] [--density 0.2]
+                                  [--change-rate 0.05] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import kernel
+from benchmark import apply_event, make_case, GENERATORS
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap, SLAM
+
+
+def drive(case: dict, use_kernel: bool, view_range: int) -> dict:
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    (start, goal) = (case['start'], case['goal'])
+    script = list(case['script'])
+    dstar = DStarLite(map=world, s_start=start, s_goal=goal, kernel=use_kernel)
+    slam = SLAM(map=world, view_range=view_range)
+
+    position = start
+    path = [start]
+    t = time.perf_counter()
+    dstar.replan()
+    first_plan = time.perf_counter() - t
+    for _ in range(8 * world.x_dim * world.y_dim):
+        if position == goal:
+            break
+        while script and script[0][0] <= len(path) - 1:
+            apply_event(world, position, goal, script.pop(0))
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        position = dstar.next_step()
+        path.append(position)
+    return {'reached': position == goal, 'first_plan': first_plan, 'total': time.perf_counter() - t,
+            'path': path, 'g': dstar.g}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 250, 500])
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("kernel {}".format('compiled with numba' if kernel.NUMBA else 'interpreted, numba is not installed'))
+    # compile, or load the compiled kernel from the cache, outside of the timing
+    drive(make_case(args.generator, 20, args.density, args.change_rate, args.seed, args.view_range), True,
+          args.view_range)
+
+    print("{:>6}{:>10}{:>18}{:>12}{:>10}{:>10}".format("size", "kernel", "first plan [s]", "total [s]", "steps",
+                                                       "same"))
+    for size in args.sizes:
+        case = make_case(args.generator, size, args.density, args.change_rate, args.seed, args.view_range)
+        results = [drive(case, use_kernel, args.view_range) for use_kernel in (False, True)]
+        same = results[0]['path'] == results[1]['path'] and np.array_equal(results[0]['g'], results[1]['g'])
+        for use_kernel, result in zip(('-', 'yes'), results):
+            print("{:>6}{:>10}{:>18.3f}{:>12.3f}{:>10}{:>10}{}".format(
+                size, use_kernel, result['first_plan'], result['total'], len(result['path']) - 1,
+                'yes' if same else 'NO', '' if result['reached'] else '  (goal not reached)'))
+
+
+if __name__ == '__main__':
+    main()
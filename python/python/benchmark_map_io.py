@@ -0,0 +1,61 @@
+"""
+save and load time and file size of the map formats of map_io, against the text grid headless
+read before. 'load + scan' also reads every cell once after loading, which is what a memory
+mapped .npy defers
+
+usage: python benchmark_map_io.py [--sizes 1000 2000 5000] [--generator rooms] [--density 0.2]
+                                  [--formats .npy .npz .rle .txt] [--seed 0]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark import GENERATORS
+from grid import OccupancyGridMap
+from map_io import load_map, save_map
+
+
+def measure(world: OccupancyGridMap, path: str) -> dict:
+    t = time.perf_counter()
+    if path.endswith('.txt'):
+        np.savetxt(path, world.get_map(), fmt='%d')
+    else:
+        save_map(world, path)
+    save_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    loaded = load_map(path)
+    load_time = time.perf_counter() - t
+    assert int(loaded.get_map().sum(dtype=np.int64)) == int(world.get_map().sum(dtype=np.int64))
+    scan_time = time.perf_counter() - t
+    return {'save_time': save_time, 'load_time': load_time, 'scan_time': scan_time, 'bytes': os.path.getsize(path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000])
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--formats', nargs='+', choices=['.npy', '.npz', '.rle', '.txt'],
+                        default=['.npy', '.npz', '.rle', '.txt'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>11}{:>11}{:>18}{:>12}".format("size", "format", "save [ms]", "load [ms]",
+                                                     "load + scan [ms]", "size [kB]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            world = OccupancyGridMap(x_dim=size, y_dim=size)
+            world.set_map(GENERATORS[args.generator](size, args.density, np.random.default_rng(args.seed)))
+            for extension in args.formats:
+                result = measure(world, os.path.join(directory, 'map{}{}'.format(size, extension)))
+                print("{:>6}{:>8}{:>11.1f}{:>11.2f}{:>18.2f}{:>12.0f}".format(
+                    size, extension, result['save_time'] * 1e3, result['load_time'] * 1e3,
+                    result['scan_time'] * 1e3, result['bytes'] / 1e3))
+
+
+if __name__ == '__main__':
+    main()
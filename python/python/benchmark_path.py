@@ -0,0 +1,78 @@
+"""
+time a controller spends getting the path after every replan: extracting the whole path from
+the g values against the PathExtractor cache, and how many waypoints line of sight smoothing
+leaves of the path
+
+usage: python benchmark_path.py [--sizes 100 200] [--generators random rooms] [--density 0.2]
+                                [--planners dstar flat] [--view-range 5] [--seed 0]
+"""
+import argparse
+import time
+
+from benchmark import make_case, GENERATORS, PLANNERS
+from grid import OccupancyGridMap, SLAM
+from path import PathExtractor
+from utils import NoPathError
+
+
+def run(case: dict, planner: str, view_range: int) -> dict:
+    """
+    walk the case without its scripted changes, getting the path in every step both ways
+    """
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    slam = SLAM(map=world, view_range=view_range)
+    dstar = PLANNERS[planner](map=world, s_start=case['start'], s_goal=case['goal'], sensed_map=slam.slam_map)
+    extractor = PathExtractor(dstar, smooth=True)
+
+    full_time = cached_time = 0.0
+    full_vertices = waypoints = steps = 0
+    position = case['start']
+    while position != case['goal']:
+        changes, _ = slam.rescan(global_position=position)
+        try:
+            dstar.apply_changes(changes=changes)
+        except NoPathError:
+            break
+        t = time.perf_counter()
+        full = list(dstar.current_path())
+        full_time += time.perf_counter() - t
+        t = time.perf_counter()
+        extractor.path()
+        cached_time += time.perf_counter() - t
+        waypoints += len(extractor.waypoints())
+        full_vertices += len(full)
+        position = dstar.next_step()
+        steps += 1
+    return {'steps': steps, 'full_time': full_time, 'cached_time': cached_time,
+            'full_vertices': full_vertices, 'cached_vertices': extractor.extracted,
+            'path_length': full_vertices / max(steps, 1), 'waypoints': waypoints / max(steps, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=['random', 'rooms'])
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=['dstar', 'flat'])
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>9}{:>8}{:>11}{:>11}{:>13}{:>13}{:>11}{:>11}".format(
+        "size", "map", "planner", "full [ms]", "cache [ms]", "full vert.", "cache vert.", "path len",
+        "waypoints"))
+    for size in args.sizes:
+        for generator in args.generators:
+            case = make_case(generator, size, args.density, 0.0, args.seed, args.view_range)
+            for planner in args.planners:
+                result = run(case, planner, args.view_range)
+                steps = max(result['steps'], 1)
+                print("{:>6}{:>9}{:>8}{:>11.3f}{:>11.3f}{:>13}{:>13}{:>11.1f}{:>11.1f}".format(
+                    size, generator, planner, result['full_time'] / steps * 1e3,
+                    result['cached_time'] / steps * 1e3, result['full_vertices'], result['cached_vertices'],
+                    result['path_length'], result['waypoints']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+compare the indexed and the lazy-deletion priority queues against the previous
+list-scanning implementation, both on a synthetic D* Lite-like operation mix and
+end-to-end inside DStarLite.compute_shortest_path. a heap throughput benchmark
+compares the (key, vertex) tuples the queues hold against the previous Priority and
+PriorityNode objects
+
+usage: python benchmark_priority_queue.py [--ops 20000] [--size 100] [--seed 0]
+"""
+import argparse
+import heapq
+import random
+import time
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap
+from priority_queue import PriorityQueue, LazyPriorityQueue, INFINITE
+
+
+class ObjectPriority:
+    """
+    the previous key: an object per key with python-level lexicographic comparison
+    """
+
+    def __init__(self, k1, k2):
+        self.k1 = k1
+        self.k2 = k2
+
+    def __lt__(self, other):
+        return self.k1 < other.k1 or (self.k1 == other.k1 and self.k2 < other.k2)
+
+    def __le__(self, other):
+        return self.k1 < other.k1 or (self.k1 == other.k1 and self.k2 <= other.k2)
+
+
+class ObjectPriorityNode:
+    """
+    the previous heap node, ties on both keys are broken on the vertex
+    """
+
+    def __init__(self, priority, vertex):
+        self.priority = priority
+        self.vertex = vertex
+
+    def __le__(self, other):
+        return not other < self
+
+    def __lt__(self, other):
+        p = self.priority
+        q = other.priority
+        if p.k1 != q.k1:
+            return p.k1 < q.k1
+        if p.k2 != q.k2:
+            return p.k2 < q.k2
+        return self.vertex < other.vertex
+
+
+class LinearScanPriorityQueue:
+    """
+    the previous implementation: list membership and linear scan + build_heap on update/remove
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.vertices_in_heap = []
+
+    def __contains__(self, vertex):
+        return vertex in self.vertices_in_heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def top(self):
+        return self.heap[0][1]
+
+    def top_key(self):
+        if len(self.heap) == 0: return INFINITE
+        return self.heap[0][0]
+
+    def insert(self, vertex, priority):
+        self.vertices_in_heap.append(vertex)
+        heapq.heappush(self.heap, (priority, vertex))
+
+    def remove(self, vertex):
+        self.vertices_in_heap.remove(vertex)
+        for index, priority_node in enumerate(self.heap):
+            if priority_node[1] == vertex:
+                self.heap[index] = self.heap[len(self.heap) - 1]
+                self.heap.remove(self.heap[len(self.heap) - 1])
+                break
+        self.build_heap()
+
+    def update(self, vertex, priority):
+        for index, priority_node in enumerate(self.heap):
+            if priority_node[1] == vertex:
+                self.heap[index] = (priority, vertex)
+                break
+        self.build_heap()
+
+    def build_heap(self):
+        heapq.heapify(self.heap)
+
+
+QUEUES = {
+    'linear': LinearScanPriorityQueue,
+    'indexed': PriorityQueue,
+    'lazy': LazyPriorityQueue,
+}
+
+
+def operation_mix(n_ops: int, seed: int):
+    """
+    :param n_ops: number of queue operations
+    :param seed: random seed
+    :return: list of (operation, vertex, priority) resembling update_vertex traffic
+    """
+    rng = random.Random(seed)
+    in_heap = set()
+    ops = []
+    for _ in range(n_ops):
+        vertex = (rng.randrange(1000), rng.randrange(1000))
+        priority = (rng.random() * 100, rng.random() * 100)
+        if vertex not in in_heap:
+            ops.append(('insert', vertex, priority))
+            in_heap.add(vertex)
+        elif rng.random() < 0.5:
+            ops.append(('update', vertex, priority))
+        else:
+            ops.append(('remove', vertex, None))
+            in_heap.remove(vertex)
+        ops.append(('top', None, None))
+    return ops
+
+
+def run_operation_mix(queue_cls, ops) -> float:
+    queue = queue_cls()
+    start = time.perf_counter()
+    for op, vertex, priority in ops:
+        if op == 'insert':
+            queue.insert(vertex, priority)
+        elif op == 'update':
+            if vertex in queue:
+                queue.update(vertex, priority)
+        elif op == 'remove':
+            queue.remove(vertex)
+        elif len(queue) > 0:
+            queue.top_key()
+    return time.perf_counter() - start
+
+
+def heap_throughput(node, n_ops: int, seed: int) -> float:
+    """
+    :param node: builds a heap node of a vertex from its two key values, as calculate_key and
+                 insert do together
+    :param n_ops: number of pushes, each followed by a pop once the heap holds 1000 nodes
+    :param seed: random seed
+    :return: seconds
+    """
+    rng = random.Random(seed)
+    entries = [(rng.random() * 100, rng.random() * 100, (rng.randrange(1000), rng.randrange(1000)))
+               for _ in range(n_ops)]
+    heap = []
+    start = time.perf_counter()
+    for k1, k2, vertex in entries:
+        heapq.heappush(heap, node(k1, k2, vertex))
+        if len(heap) > 1000:
+            heapq.heappop(heap)
+    while heap:
+        heapq.heappop(heap)
+    return time.perf_counter() - start
+
+
+NODES = {
+    'objects': lambda k1, k2, vertex: ObjectPriorityNode(ObjectPriority(k1, k2), vertex),
+    'tuples': lambda k1, k2, vertex: ((k1, k2), vertex),
+}
+
+
+def run_planner(queue_cls, size: int, seed: int) -> float:
+    rng = np.random.default_rng(seed)
+    world = OccupancyGridMap(x_dim=size, y_dim=size)
+    dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(size - 1, size - 1))
+    dstar.sensed_map.set_map((rng.random((size, size)) < 0.2).astype(np.uint8) * 255)
+    dstar.sensed_map.remove_obstacle((0, 0))
+    dstar.sensed_map.remove_obstacle((size - 1, size - 1))
+
+    queue = queue_cls()
+    queue.insert(dstar.U.top(), dstar.U.top_key())
+    dstar.U = queue
+
+    start = time.perf_counter()
+    dstar.compute_shortest_path()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=20000, help='number of synthetic queue operations')
+    parser.add_argument('--size', type=int, default=100, help='side length of the planner map')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ops = operation_mix(n_ops=args.ops, seed=args.seed)
+    print("{:<10}{:>16}{:>26}".format("queue", "op mix [s]", "compute_shortest_path [s]"))
+    for name, queue_cls in QUEUES.items():
+        mix = run_operation_mix(queue_cls, ops)
+        planner = run_planner(queue_cls, size=args.size, seed=args.seed)
+        print("{:<10}{:>16.4f}{:>26.4f}".format(name, mix, planner))
+
+    print()
+    print("{:<10}{:>16}{:>16}".format("nodes", "heap [s]", "ops / s"))
+    for name, node in NODES.items():
+        seconds = heap_throughput(node, n_ops=10 * args.ops, seed=args.seed)
+        print("{:<10}{:>16.4f}{:>16.0f}".format(name, seconds, 20 * args.ops / seconds))
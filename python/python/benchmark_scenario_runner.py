@@ -0,0 +1,42 @@
+"""
+throughput of the scenario runner over the number of worker processes, with the speedup over one
+worker and the parallel efficiency (speedup / processes). the maps are generated once and shared
+by all runs
+
+usage: python benchmark_scenario_runner.py [--processes 1 2 4 8] [--sizes 100] [--seeds 0 1 2 3 4 5 6 7]
+                                           [--change-rate 0.05]
+"""
+import argparse
+import os
+import tempfile
+
+from benchmark import GENERATORS, PLANNERS
+from scenario_runner import make_scenarios, run_scenarios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100])
+    parser.add_argument('--seeds', type=int, nargs='+', default=list(range(8)))
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    scenarios, maps = make_scenarios(args.sizes, sorted(GENERATORS), [0.2], [args.change_rate], sorted(PLANNERS),
+                                     args.seeds)
+    print("{} scenarios on {} cores".format(len(scenarios), os.cpu_count()))
+    print("{:>10}{:>12}{:>18}{:>10}{:>12}".format("processes", "wall [s]", "scenarios / s", "speedup",
+                                                  "efficiency"))
+    base = None
+    with tempfile.TemporaryDirectory() as directory:
+        for processes in args.processes:
+            summary = run_scenarios(scenarios, maps, os.path.join(directory, 'results.jsonl'),
+                                    processes=processes, log=None)
+            wall = summary['wall_time']
+            base = base or wall
+            print("{:>10}{:>12.2f}{:>18.1f}{:>10.2f}{:>12.2f}".format(
+                processes, wall, len(scenarios) / wall, base / wall, base / wall / processes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+load test of the planning service: starts service.py in its own process and lets many robot
+controllers drive through it concurrently. every controller observes the ground truth around
+its robot and sends 'frames' updates per step without waiting in between, as a sensor that
+runs faster than the planner. reported are the throughput of updates, the p50 and p99 latency
+of an update and how many updates were coalesced into one replan
+
+usage: python benchmark_service.py [--size 100] [--generator rooms] [--density 0.2] [--robots 1 8 32]
+                                   [--frames 1 4] [--steps 50] [--planner dstar] [--seed 0]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmark import GENERATORS
+from grid import OccupancyGridMap
+from service import PLANNERS, PlanningClient, run_until_complete
+
+UNOCCUPIED = 0
+
+
+async def drive(port: int, robot: str, world: OccupancyGridMap, start: (int, int), goal: (int, int), frames: int,
+                steps: int, view_range: int, latencies: list):
+    client = await PlanningClient.connect(port=port)
+    try:
+        reply = await client.request(op='open', robot=robot, start=start, goal=goal)
+        position = start
+        for _ in range(steps):
+            if reply.get('next') is None or tuple(reply['next']) == position:
+                break
+            position = tuple(reply['next'])
+            window, origin = world.local_window(position, view_range=view_range)
+            message = {'op': 'update', 'robot': robot, 'position': position, 'origin': origin,
+                       'window': window.tolist()}
+
+            async def timed():
+                t = time.perf_counter()
+                answer = await client.request(**message)
+                latencies.append(time.perf_counter() - t)
+                return answer
+
+            reply = (await asyncio.gather(*[timed() for _ in range(frames)]))[-1]
+        await client.request(op='close', robot=robot)
+    finally:
+        await client.close()
+
+
+async def load(port: int, world: OccupancyGridMap, robots: list, frames: int, steps: int, view_range: int) -> dict:
+    latencies = []
+    t = time.perf_counter()
+    await asyncio.gather(*[drive(port, 'r{}'.format(i), world, start, goal, frames, steps, view_range, latencies)
+                           for i, (start, goal) in enumerate(robots)])
+    wall = time.perf_counter() - t
+    client = await PlanningClient.connect(port=port)
+    stats = await client.request(op='stats')
+    await client.close()
+    return {'requests': len(latencies), 'wall': wall, 'p50': float(np.percentile(latencies, 50)),
+            'p99': float(np.percentile(latencies, 99)), 'updates': stats['updates'], 'replans': stats['replans']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--robots', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--frames', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--steps', type=int, default=50, help='steps every robot drives at most')
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--planner', choices=sorted(PLANNERS), default='dstar')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    world = OccupancyGridMap(x_dim=args.size, y_dim=args.size)
+    world.set_map(GENERATORS[args.generator](args.size, args.density, rng))
+    free = np.argwhere(world.get_map() == UNOCCUPIED)
+
+    print("{:>7}{:>8}{:>11}{:>16}{:>11}{:>11}{:>18}".format("robots", "frames", "requests", "requests / s",
+                                                           "p50 [ms]", "p99 [ms]", "updates / replan"))
+    for robots in args.robots:
+        for frames in args.frames:
+            # a fresh service for every run, so that its counters only hold this run
+            service = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), 'service.py'),
+                                        '--port', '0', '--size', str(args.size), str(args.size),
+                                        '--planner', args.planner],
+                                       stdout=subprocess.PIPE, universal_newlines=True)
+            try:
+                port = int(service.stdout.readline().rsplit(':', 1)[1])
+                cells = [tuple(cell) for cell in free[rng.choice(len(free), 2 * robots, replace=False)].tolist()]
+                result = run_until_complete(load(port, world, list(zip(cells[::2], cells[1::2])), frames, args.steps,
+                                          args.view_range))
+            finally:
+                service.terminate()
+                service.wait()
+            print("{:>7}{:>8}{:>11}{:>16.0f}{:>11.1f}{:>11.1f}{:>18.2f}".format(
+                robots, frames, result['requests'], result['requests'] / result['wall'], result['p50'] * 1e3,
+                result['p99'] * 1e3, result['updates'] / max(result['replans'], 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+resuming a planner after a process restart: restoring a snapshot against planning again from
+scratch on the same sensed map. the planner first plans across the fully known map, so the
+snapshot holds the whole search tree
+
+usage: python benchmark_snapshot.py [--sizes 500 1000 2000] [--generator rooms] [--density 0.2]
+                                    [--planners dstar flat] [--seed 0]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark import make_case, GENERATORS, PLANNERS
+from grid import OccupancyGridMap
+from snapshot import load_snapshot, save_snapshot
+
+
+def run(case: dict, planner: str, path: str) -> dict:
+    world = OccupancyGridMap(x_dim=case['grid'].shape[0], y_dim=case['grid'].shape[1])
+    world.set_map(case['grid'].copy())
+    t = time.perf_counter()
+    dstar = PLANNERS[planner](map=world, s_start=case['start'], s_goal=case['goal'], sensed_map=world)
+    dstar.next_step()
+    plan_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    save_snapshot(dstar, path)
+    save_time = time.perf_counter() - t
+    t = time.perf_counter()
+    restored = load_snapshot(path)
+    step = restored.next_step()
+    restore_time = time.perf_counter() - t
+    assert step == dstar.next_step()
+    return {'plan_time': plan_time, 'save_time': save_time, 'restore_time': restore_time,
+            'bytes': os.path.getsize(path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--generator', choices=sorted(GENERATORS), default='rooms')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=['dstar', 'flat'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>12}{:>12}{:>15}{:>12}".format("size", "planner", "plan [s]", "save [s]", "restore [s]",
+                                                      "size [MB]"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            case = make_case(args.generator, size, args.density, 0.0, args.seed, 0)
+            for planner in args.planners:
+                result = run(case, planner, os.path.join(directory, 'planner.npz'))
+                print("{:>6}{:>8}{:>12.3f}{:>12.3f}{:>15.3f}{:>12.1f}".format(
+                    size, planner, result['plan_time'], result['save_time'], result['restore_time'],
+                    result['bytes'] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+memory and speed of DStarLite with dense against sparse g/rhs storage. the route has the
+same length on every map size, so the search touches about the same vertices while the
+map grows
+
+usage: python benchmark_sparse_state.py [--sizes 250 1000 4000] [--distance 100] [--density 0.2]
+                                        [--view-range 5] [--seed 0]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap, SLAM
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+
+def make_world(size: int, density: float, distance: int, seed: int) -> (OccupancyGridMap, tuple, tuple):
+    rng = np.random.default_rng(seed)
+    world = OccupancyGridMap(x_dim=size, y_dim=size)
+    world.set_map(np.where(rng.random((size, size)) < density, OBSTACLE, UNOCCUPIED).astype(np.uint8))
+    start, goal = (size // 2, size // 2), (size // 2 + distance, size // 2 + distance)
+    world.remove_obstacle(start)
+    world.remove_obstacle(goal)
+    return world, start, goal
+
+
+def run(world: OccupancyGridMap, start: tuple, goal: tuple, state: str, view_range: int) -> dict:
+    """
+    walk from start to goal on an initially unknown map
+    :return: memory held by the planner at the goal, peak memory and planning time
+    """
+    slam = SLAM(map=world, view_range=view_range)
+    tracemalloc.start()
+    try:
+        dstar = DStarLite(map=world, s_start=start, s_goal=goal, state=state, sensed_map=slam.slam_map)
+        planning_time = 0.0
+        position = start
+        while position != goal:
+            changes, slam_map = slam.rescan(global_position=position)
+            t = time.perf_counter()
+            dstar.apply_changes(changes=changes)
+            position = dstar.next_step()
+            planning_time += time.perf_counter() - t
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'memory': current, 'peak_memory': peak, 'planning_time': planning_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250, 1000, 4000])
+    parser.add_argument('--distance', type=int, default=100)
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>6}{:>8}{:>14}{:>14}{:>14}".format("size", "state", "memory [MB]", "peak [MB]", "planning [s]"))
+    for size in args.sizes:
+        world, start, goal = make_world(size, args.density, args.distance, args.seed)
+        for state in ('dense', 'sparse'):
+            result = run(world, start, goal, state, args.view_range)
+            print("{:>6}{:>8}{:>14.2f}{:>14.2f}{:>14.3f}".format(size, state, result['memory'] / 1e6,
+                                                                 result['peak_memory'] / 1e6,
+                                                                 result['planning_time']))
+
+
+if __name__ == '__main__':
+    main()
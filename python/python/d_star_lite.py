@@ -1,80 +1,190 @@
-from priority_queue import PriorityQueue, Priority
+import logging
+from time import perf_counter
+from priority_queue import PriorityQueue, LazyPriorityQueue
+from kernel import ArrayPriorityQueue, compute_shortest_path as kernel_shortest_path
 from grid import OccupancyGridMap
 import numpy as np
-from utils import heuristic, Vertex, Vertices
+from utils import heuristic, Vertex, Vertices, EdgeChanges, NoPathError, SparseValues
 from typing import Dict, List
+from instrumentation import PlannerStats
 
 OBSTACLE = 255
 UNOCCUPIED = 0
 
+logger = logging.getLogger(__name__)
+
 
 class DStarLite:
-    def __init__(self, map: OccupancyGridMap, s_start: (int, int), s_goal: (int, int)):
+    def __init__(self, map: OccupancyGridMap, s_start: (int, int), s_goal: (int, int),
+                 lazy_deletion: bool = False, stats: PlannerStats = None,
+                 sensed_map: OccupancyGridMap = None, state: str = 'dense', epsilon: float = 1.0,
+                 kernel: bool = False):
         """
         :param map: the ground truth map of the environment provided by gui
         :param s_start: start location
         :param s_goal: end location
+        :param lazy_deletion: use the lazy-deletion heap instead of the indexed heap
+        :param stats: collect counters and timers in this PlannerStats, off by default
+        :param sensed_map: plan on this map, e.g. one shared by a fleet, instead of an own empty one
+        :param state: 'dense' keeps g and rhs in arrays of the map size, 'sparse' only stores the
+                      vertices the search touched, for large maps that are mostly unexplored
+        :param epsilon: inflation factor >= 1 of the heuristic. the path costs at most epsilon times
+                        the optimal one, in exchange for fewer expansions. see set_epsilon
+        :param kernel: run compute_shortest_path in the kernel of kernel.py on flat arrays, with
+                       the same results. it is compiled if numba is installed, otherwise it runs
+                       as plain python and is slower than the default loop. needs dense state
         """
+        if epsilon < 1.0:
+            raise ValueError("epsilon must be >= 1, got {}".format(epsilon))
+        if kernel and (state != 'dense' or lazy_deletion):
+            raise ValueError("the kernel needs state='dense' and its own queue, not lazy_deletion")
+        self.epsilon = epsilon
+        self.kernel = kernel
         self.new_edges_and_old_costs = None
+        self.stats = stats
+        self.planned = False  # compute_shortest_path ran to the end, False while a budgeted one is unfinished
+        self.max_expansions = None  # budget of every replan, see set_budget
+        self.time_budget = None
+        self.replanned = False  # a replan ran since the last next_step, which does not spend the budget twice
+        # set of the vertices whose g value or edge costs changed, recorded only while it is not
+        # None, e.g. for PathExtractor
+        self.changed_vertices = None
 
         # algorithm start
         self.s_start = s_start
         self.s_goal = s_goal
         self.s_last = s_start
         self.k_m = 0  # accumulation
-        self.U = PriorityQueue()
-        self.rhs = np.ones((map.x_dim, map.y_dim)) * np.inf
+        if kernel:
+            self.U = ArrayPriorityQueue(map.x_dim, map.y_dim)
+        else:
+            self.U = LazyPriorityQueue() if lazy_deletion else PriorityQueue()
+        if state == 'dense':
+            self.rhs = np.ones((map.x_dim, map.y_dim)) * np.inf
+        elif state == 'sparse':
+            self.rhs = SparseValues((map.x_dim, map.y_dim))
+        else:
+            raise ValueError("state must be 'dense' or 'sparse', got {!r}".format(state))
         self.g = self.rhs.copy()
 
-        self.sensed_map = OccupancyGridMap(x_dim=map.x_dim,
-                                           y_dim=map.y_dim,
-                                           exploration_setting='8N')
+        if sensed_map is None:
+            sensed_map = map.empty_like()
+        self.sensed_map = sensed_map
 
         self.rhs[self.s_goal] = 0
-        self.U.insert(self.s_goal, Priority(heuristic(self.s_start, self.s_goal), 0))
+        self.U.insert(self.s_goal, self.calculate_key(self.s_goal))
 
     def calculate_key(self, s: (int, int)):
         """
         :param s: the vertex we want to calculate key
-        :return: Priority class of the two keys
+        :return: the (k1, k2) key, see priority_queue
         """
-        k1 = min(self.g[s], self.rhs[s]) + heuristic(self.s_start, s) + self.k_m
-        k2 = min(self.g[s], self.rhs[s])
-        return Priority(k1, k2)
+        g = self.g[s]
+        rhs = self.rhs[s]
+        if g > rhs and self.epsilon != 1.0:
+            # as in Anytime D*, only overconsistent vertices get the inflated heuristic. k_m is
+            # inflated too, so that queued keys stay lower bounds when the robot moves
+            return rhs + self.epsilon * heuristic(self.s_start, s) + self.epsilon * self.k_m, rhs
+        k2 = min(g, rhs)
+        return k2 + heuristic(self.s_start, s) + self.k_m, k2
+
+    def set_epsilon(self, epsilon: float):
+        """
+        change the inflation factor, e.g. lower it step by step towards 1 while there is time left
+        to improve the path (Anytime D*). the queue is re-keyed and the next apply_changes,
+        next_step or replan continues the search from there
+        :param epsilon: inflation factor >= 1 of the heuristic
+        """
+        if epsilon < 1.0:
+            raise ValueError("epsilon must be >= 1, got {}".format(epsilon))
+        self.epsilon = epsilon
+        for u in list(self.U.vertices_in_heap):
+            self.U.update(u, self.calculate_key(u))
+        self.planned = False
+
+    def set_budget(self, max_expansions: int = None, time_budget: float = None):
+        """
+        bound the work of every replan of the stepping API, e.g. to keep a control period. a
+        replan that runs out of budget leaves the search unfinished, and the next apply_changes,
+        next_step or current_path continues it from the queue where it stopped. until it is
+        finished next_step takes the best step known so far. move_and_replan ignores the budget
+        :param max_expansions: expansions per replan, None for no limit
+        :param time_budget: seconds per replan, None for no limit
+        """
+        self.max_expansions = max_expansions
+        self.time_budget = time_budget
 
     def c(self, u: (int, int), v: (int, int)) -> float:
         """
         calcuclate the cost between nodes
         :param u: from vertex
         :param v: to vertex
-        :return: euclidean distance to traverse. inf if obstacle in path
+        :return: euclidean distance to traverse, weighted by the cost map. inf if obstacle in path
         """
-        if not self.sensed_map.is_unoccupied(u) or not self.sensed_map.is_unoccupied(v):
-            return float('inf')
-        else:
-            return heuristic(u, v)
+        return self.sensed_map.c(u, v)
 
-    def contain(self, u: (int, int)) -> (int, int):
-        return u in self.U.vertices_in_heap
+    def min_successor_cost(self, u: (int, int)) -> float:
+        """
+        :param u: vertex
+        :return: min over all successors s_ of c(u, s_) + g(s_)
+        """
+        min_s = float('inf')
+        for s_ in self.sensed_map.succ(vertex=u):
+            temp = self.c(u, s_) + self.g[s_]
+            if min_s > temp:
+                min_s = temp
+        return min_s
+
+    def contain(self, u: (int, int)) -> bool:
+        return u in self.U
 
     def update_vertex(self, u: (int, int)):
+        stats = self.stats
         if self.g[u] != self.rhs[u] and self.contain(u):
             self.U.update(u, self.calculate_key(u))
+            if stats is not None:
+                stats.heap_updates += 1
         elif self.g[u] != self.rhs[u] and not self.contain(u):
             self.U.insert(u, self.calculate_key(u))
+            if stats is not None:
+                stats.heap_inserts += 1
         elif self.g[u] == self.rhs[u] and self.contain(u):
             self.U.remove(u)
+            if stats is not None:
+                stats.heap_removes += 1
 
-    def compute_shortest_path(self):
+    def compute_shortest_path(self, max_expansions: int = None, deadline: float = None) -> bool:
+        """
+        :param max_expansions: stop after this many expansions
+        :param deadline: stop once perf_counter() passes this time
+        :return: True if the search finished, False if it stopped early. the queue holds
+                 everything to continue it with the next call
+        """
+        if self.kernel:
+            return kernel_shortest_path(self, max_expansions=max_expansions, deadline=deadline)
+        if max_expansions is None:
+            max_expansions = float('inf')
+        finished = True
+        # counted in locals and added to stats at the end, so that disabled stats cost nothing
+        expansions = rekeys = overconsistent = rhs_recomputations = 0
+        changed = self.changed_vertices
         while self.U.top_key() < self.calculate_key(self.s_start) or self.rhs[self.s_start] > self.g[self.s_start]:
+            if expansions >= max_expansions or (deadline is not None and perf_counter() >= deadline):
+                finished = False
+                break
             u = self.U.top()
             k_old = self.U.top_key()
             k_new = self.calculate_key(u)
+            expansions += 1
 
             if k_old < k_new:
                 self.U.update(u, k_new)
+                rekeys += 1
             elif self.g[u] > self.rhs[u]:
+                overconsistent += 1
                 self.g[u] = self.rhs[u]
+                if changed is not None:
+                    changed.add(u)
                 self.U.remove(u)
                 pred = self.sensed_map.succ(vertex=u)
                 for s in pred:
@@ -84,6 +194,8 @@ class DStarLite:
             else:
                 self.g_old = self.g[u]
                 self.g[u] = float('inf')
+                if changed is not None:
+                    changed.add(u)
                 pred = self.sensed_map.succ(vertex=u)
                 pred.append(u)
                 for s in pred:
@@ -96,63 +208,213 @@ class DStarLite:
                                 if min_s > temp:
                                     min_s = temp
                             self.rhs[s] = min_s
-                    self.update_vertex(u)
+                            rhs_recomputations += 1
+                    self.update_vertex(s)
 
-    def rescan(self) -> Vertices:
+        stats = self.stats
+        if stats is not None:
+            stats.expansions += expansions
+            stats.rekeys += rekeys
+            stats.overconsistent += overconsistent
+            stats.underconsistent += expansions - rekeys - overconsistent
+            stats.rhs_recomputations += rhs_recomputations
+            stats.heap_updates += rekeys
+            stats.heap_removes += overconsistent
+            stats.interrupted += not finished
+        return finished
+
+    def rescan(self) -> EdgeChanges:
 
         new_edges_and_old_costs = self.new_edges_and_old_costs
         self.new_edges_and_old_costs = None
         return new_edges_and_old_costs
 
+    def replan(self, edge_changes: int = 0, edge_time: float = 0.0, budget: bool = True) -> bool:
+        """
+        compute_shortest_path, recorded as one replan if stats are enabled
+        :param edge_changes: number of changed edges that led to this replan
+        :param edge_time: time spent applying them
+        :param budget: stop at the budget of set_budget
+        :return: True if the search finished
+        """
+        # the robot may have moved since an unfinished search, see apply_changes
+        self.k_m += heuristic(self.s_last, self.s_start)
+        self.s_last = self.s_start
+        (max_expansions, deadline) = (None, None)
+        if budget:
+            max_expansions = self.max_expansions
+            if self.time_budget is not None:
+                deadline = perf_counter() + self.time_budget
+        self.replanned = True
+        stats = self.stats
+        if stats is None:
+            self.planned = self.compute_shortest_path(max_expansions=max_expansions, deadline=deadline)
+            return self.planned
+        before = stats.as_dict()
+        t = perf_counter()
+        self.planned = self.compute_shortest_path(max_expansions=max_expansions, deadline=deadline)
+        stats.time['compute_shortest_path'] += perf_counter() - t
+        stats.time['edge_updates'] += edge_time
+        stats.edge_changes += edge_changes
+        stats.replans += 1
+        stats.replanned(before, s_start=self.s_start, k_m=self.k_m, queue_size=len(self.U))
+        return self.planned
+
+    def _best_successor(self, u: (int, int)) -> (int, int):
+        """
+        :param u: vertex
+        :return: the successor s_ of u with the smallest c(u, s_) + g(s_), None if all are inf
+        """
+        min_s = float('inf')
+        arg_min = None
+        for s_ in self.sensed_map.succ(u, avoid_obstacles=False):
+            temp = self.c(u, s_) + self.g[s_]
+            if temp < min_s:
+                min_s = temp
+                arg_min = s_
+        return arg_min
+
+    def _apply_edge_changes(self, changed_edges_with_old_cost: EdgeChanges) -> int:
+        """
+        account for the robot movement in k_m and update the rhs of the vertices whose outgoing
+        edges changed cost
+        :param changed_edges_with_old_cost: changed edges and their costs before the change
+        :return: number of changed edges
+        """
+        self.k_m += heuristic(self.s_last, self.s_start)
+        self.s_last = self.s_start
+
+        # gather the changed edges (u,v) per vertex u first, so that every rhs(u) is recomputed
+        # at most once and every u is queued once, however many of its edges changed. rhs only
+        # has to be recomputed if an edge on its minimum got more expensive, otherwise the
+        # cheaper edges can only lower it. costs are symmetric, so all edges out of a changed
+        # cell changed as well
+        inf = float('inf')
+        rhs = self.rhs
+        g = self.g
+        recompute = dict.fromkeys(map(tuple, changed_edges_with_old_cost.cells.tolist()), True)
+        if self.changed_vertices is not None:
+            self.changed_vertices.update(recompute)
+        lowered = {}
+        edge_changes = 0
+        for u, v, c_old in changed_edges_with_old_cost.edges():
+            edge_changes += 1
+            if recompute.get(u):
+                continue
+            c_new = self.c(u, v)
+            if c_old > c_new:
+                lowered[u] = min(lowered.get(u, inf), c_new + g[v])
+                recompute.setdefault(u, False)
+            else:
+                # a more expensive edge can not lower rhs(u) = inf
+                recompute[u] = rhs[u] != inf and rhs[u] == c_old + g[v]
+
+        for u, full in recompute.items():
+            if u != self.s_goal:
+                if full:
+                    rhs[u] = self.min_successor_cost(u)
+                    if self.stats is not None:
+                        self.stats.rhs_recomputations += 1
+                elif u in lowered:
+                    rhs[u] = min(rhs[u], lowered[u])
+            self.update_vertex(u)
+        return edge_changes
+
+    def apply_changes(self, changes: EdgeChanges, sensed_map: OccupancyGridMap = None,
+                      robot_position: (int, int) = None):
+        """
+        repair the plan after the robot sensed changed edge costs. together with next_step
+        and current_path this is the stepping alternative to move_and_replan: only the
+        incremental compute_shortest_path of the change is paid for
+        :param changes: changed edges and their old costs, as returned by SLAM.rescan
+        :param sensed_map: the map the changes were sensed in, as returned by SLAM.rescan
+        :param robot_position: current robot position, if the robot did not follow next_step
+        """
+        if sensed_map is not None:
+            self.sensed_map = sensed_map
+        moved = robot_position is not None and robot_position != self.s_start
+        if moved:
+            self.s_start = robot_position
+        if changes:
+            t = perf_counter()
+            edge_changes = self._apply_edge_changes(changes)
+            self.replan(edge_changes=edge_changes, edge_time=perf_counter() - t)
+        elif moved or not self.planned:
+            # replan updates k_m, keys in the queue are only lower bounds for the new start then
+            self.replan()
+
+    def next_step(self) -> (int, int):
+        """
+        move the robot one step along the current path
+        :return: the new robot position, s_goal once it is reached. the old position while a
+                 budgeted search has not reached the robot yet, see set_budget
+        """
+        if not self.planned and not self.replanned:
+            self.replan()
+        self.replanned = False
+        if self.s_start != self.s_goal:
+            if not self.planned:
+                # the budget ran out: take the best step known so far, or wait for the search
+                step = self._best_successor(self.s_start)
+                if step is not None:
+                    self.s_start = step
+                return self.s_start
+            if self.rhs[self.s_start] == float('inf'):
+                raise NoPathError("There is no known path!")
+            self.s_start = self._best_successor(self.s_start)
+        return self.s_start
+
+    def current_path(self, start: (int, int) = None):
+        """
+        generator over the current path from the robot position to the goal, extracted
+        lazily so that a controller only pays for the steps it looks at. it follows the g
+        values, so restart it after apply_changes
+        :param start: follow the path from this vertex instead of the robot position
+        :return: vertices of the path, starting with the robot position (or start)
+        """
+        if not self.planned:
+            self.replan()
+        u = self.s_start if start is None else start
+        if not self.planned and self.rhs[u] == float('inf'):
+            # a budgeted search that did not reach u yet
+            yield u
+            return
+        if self.rhs[u] == float('inf'):
+            raise NoPathError("There is no known path!")
+        yield u
+        # a path never visits a vertex twice, the bound only guards against inconsistent g
+        for _ in range(self.sensed_map.x_dim * self.sensed_map.y_dim):
+            if u == self.s_goal:
+                return
+            u = self._best_successor(u)
+            if u is None:
+                return
+            yield u
+
     def move_and_replan(self, robot_position: (int, int)):
+        t_start = perf_counter()
         path = [robot_position]
         self.s_start = robot_position
         self.s_last = self.s_start
-        self.compute_shortest_path()
+        self.replan(budget=False)
 
         while self.s_start != self.s_goal:
-            assert (self.rhs[self.s_start] != float('inf')), "There is no known path!"
-
-            succ = self.sensed_map.succ(self.s_start, avoid_obstacles=False)
-            min_s = float('inf')
-            arg_min = None
-            for s_ in succ:
-                temp = self.c(self.s_start, s_) + self.g[s_]
-                if temp < min_s:
-                    min_s = temp
-                    arg_min = s_
+            if self.rhs[self.s_start] == float('inf'):
+                raise NoPathError("There is no known path!")
 
             ### algorithm sometimes gets stuck here for some reason !!! FIX
-            self.s_start = arg_min
+            self.s_start = self._best_successor(self.s_start)
             path.append(self.s_start)
             # scan graph for changed costs
             changed_edges_with_old_cost = self.rescan()
-            #print("len path: {}".format(len(path)))
             # if any edge costs changed
             if changed_edges_with_old_cost:
-                self.k_m += heuristic(self.s_last, self.s_start)
-                self.s_last = self.s_start
-
-                # for all directed edges (u,v) with changed edge costs
-                vertices = changed_edges_with_old_cost.vertices
-                for vertex in vertices:
-                    v = vertex.pos
-                    succ_v = vertex.edges_and_c_old
-                    for u, c_old in succ_v.items():
-                        c_new = self.c(u, v)
-                        if c_old > c_new:
-                            if u != self.s_goal:
-                                self.rhs[u] = min(self.rhs[u], self.c(u, v) + self.g[v])
-                        elif self.rhs[u] == c_old + self.g[v]:
-                            if u != self.s_goal:
-                                min_s = float('inf')
-                                succ_u = self.sensed_map.succ(vertex=u)
-                                for s_ in succ_u:
-                                    temp = self.c(u, s_) + self.g[s_]
-                                    if min_s > temp:
-                                        min_s = temp
-                                self.rhs[u] = min_s
-                            self.update_vertex(u)
-            self.compute_shortest_path()
-        print("path found!")
+                t = perf_counter()
+                edge_changes = self._apply_edge_changes(changed_edges_with_old_cost)
+                self.replan(edge_changes=edge_changes, edge_time=perf_counter() - t)
+            else:
+                self.compute_shortest_path()
+        logger.info("path found!")
+        if self.stats is not None:
+            self.stats.time['move_and_replan'] += perf_counter() - t_start
         return path, self.g, self.rhs
@@ -0,0 +1,628 @@
+import logging
+import math
+from functools import lru_cache
+from time import perf_counter
+from heapq import heappush, heappop
+
+import numpy as np
+
+from grid import OccupancyGridMap
+from instrumentation import PlannerStats
+from utils import EdgeChanges, NoPathError
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+logger = logging.getLogger(__name__)
+
+# cell states of the padded occupancy copy
+FREE = 0
+BLOCKED = 1
+OUTSIDE = 2  # the one cell wide border around the map
+
+
+@lru_cache(maxsize=8)
+def layout(x_dim: int, y_dim: int) -> tuple:
+    """
+    vertex layout of the padded map, shared by all planners on maps of the same size
+    :return: (neighbors, row, col, parity). neighbors holds the (offset, step cost) pairs in
+             the order OccupancyGridMap.succ returns them, indexed by parity, which is 1 where
+             x + y is even. row and col are the x and y of every flat index
+    """
+    w = y_dim + 2
+    moves = [(1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (-1, 1), (-1, -1), (1, -1)]
+    offsets = [(dx * w + dy, math.sqrt(dx ** 2 + dy ** 2)) for (dx, dy) in moves]
+    neighbors = (tuple(offsets), tuple(reversed(offsets)))
+
+    index = np.arange((x_dim + 2) * w)
+    row = (index // w - 1).tolist()
+    col = (index % w - 1).tolist()
+    parity = ((index // w + index % w) % 2 == 0).astype(np.uint8).tolist()
+    return neighbors, row, col, parity
+
+
+class FlatDStarLite:
+    """
+    D* Lite on flat integer vertex indices.
+
+    the map is padded with a one cell border so that every neighbor of a map cell is
+    found by adding a precomputed offset to its index. g, rhs and the (k1, k2) key of every
+    vertex live in flat lists indexed by vertex, and the priority queue holds packed
+    (k1, k2, index) entries that heapq compares natively, so the inner loop neither builds
+    position tuples nor key tuples.
+    """
+
+    def __init__(self, map: OccupancyGridMap, s_start: (int, int), s_goal: (int, int),
+                 stats: PlannerStats = None, sensed_map: OccupancyGridMap = None):
+        """
+        :param map: the ground truth map of the environment provided by gui
+        :param s_start: start location
+        :param s_goal: end location
+        :param stats: collect counters and timers in this PlannerStats, off by default
+        :param sensed_map: plan on this map, e.g. one shared by a fleet, instead of an own empty one
+        """
+        self.new_edges_and_old_costs = None
+        self.stats = stats
+        self.planned = False  # compute_shortest_path ran to the end, see DStarLite
+        self.max_expansions = None  # budget of every replan, see set_budget
+        self.time_budget = None
+        self.replanned = False  # a replan ran since the last next_step, which does not spend the budget twice
+        self.changed_vertices = None  # see DStarLite, holds vertex indices
+
+        self.x_dim = map.x_dim
+        self.y_dim = map.y_dim
+        self.width = map.y_dim + 2
+        self.n = (map.x_dim + 2) * self.width
+
+        self.neighbors, self.row, self.col, self.parity = layout(map.x_dim, map.y_dim)
+
+        inf = float('inf')
+        self.g = [inf] * self.n
+        self.rhs = [inf] * self.n
+        self.k1 = [inf] * self.n
+        self.k2 = [inf] * self.n
+        self.queued = [0] * self.n  # epoch in which the queued key was computed, 0 if not queued
+        self.epoch = 1
+        self.heap = []
+
+        self._occupancy_grid = np.full((map.x_dim + 2, self.width), OUTSIDE, dtype=np.uint8)
+        self.occupancy = None  # flat copy of _occupancy_grid, see sync_map
+        self._synced_map = None  # the sensed map the whole occupancy was last copied from
+
+        # algorithm start
+        self.s_start = self.to_index(s_start)
+        self.s_goal = self.to_index(s_goal)
+        self.s_last = self.s_start
+        self.k_m = 0  # accumulation
+
+        if sensed_map is None:
+            sensed_map = map.empty_like()
+        if sensed_map.weighted:
+            raise ValueError("FlatDStarLite plans on binary maps only, use DStarLite for cost maps")
+        self.sensed_map = sensed_map
+        self.sync_map()
+
+        self.rhs[self.s_goal] = 0
+        self.queue(self.s_goal, self.heuristic(self.s_start, self.s_goal), 0)
+
+    def to_index(self, pos: (int, int)) -> int:
+        """
+        :param pos: cell position (x,y)
+        :return: flat index of the cell in the padded arrays
+        """
+        return (pos[0] + 1) * self.width + pos[1] + 1
+
+    def to_pos(self, index: int) -> (int, int):
+        """
+        :param index: flat index in the padded arrays
+        :return: cell position (x,y)
+        """
+        return self.row[index], self.col[index]
+
+    def heuristic(self, p: int, q: int) -> float:
+        """
+        :param p: vertex index
+        :param q: vertex index
+        :return: euclidean distance between the two cells
+        """
+        dx = self.row[p] - self.row[q]
+        dy = self.col[p] - self.col[q]
+        return math.sqrt(dx * dx + dy * dy)
+
+    def set_budget(self, max_expansions: int = None, time_budget: float = None):
+        """
+        bound the work of every replan of the stepping API, see DStarLite.set_budget
+        :param max_expansions: expansions per replan, None for no limit
+        :param time_budget: seconds per replan, None for no limit
+        """
+        self.max_expansions = max_expansions
+        self.time_budget = time_budget
+
+    def sync_map(self, cells: np.ndarray = None):
+        """
+        copy the occupancy of the sensed map into the padded occupancy list. apply_changes and
+        move_and_replan sync the cells of the changes they apply, call it after changing
+        sensed_map outside of them
+        :param cells: (M, 2) positions of the cells to copy, e.g. EdgeChanges.cells. None compares
+                      the whole map and writes the cells that changed since the last sync
+        """
+        if cells is not None:
+            if len(cells):
+                (x, y) = (cells[:, 0], cells[:, 1])
+                blocked = (self.sensed_map.occupancy_at(x, y) != UNOCCUPIED).astype(np.uint8)  # binary maps only
+                self._occupancy_grid[x + 1, y + 1] = blocked
+                for index, value in zip(((x + 1) * self.width + y + 1).tolist(), blocked.tolist()):
+                    self.occupancy[index] = value
+            return
+        self._synced_map = self.sensed_map
+        blocked = (self.sensed_map.occupancy_grid_map != UNOCCUPIED).astype(np.uint8)  # binary maps only
+        if self.occupancy is None:
+            self._occupancy_grid[1:-1, 1:-1] = blocked
+            self.occupancy = self._occupancy_grid.ravel().tolist()
+            return
+        changed = np.flatnonzero(self._occupancy_grid[1:-1, 1:-1] != blocked)
+        if changed.size:
+            x, y = np.divmod(changed, self.y_dim)
+            self._occupancy_grid[x + 1, y + 1] = blocked[x, y]
+            for index, value in zip(((x + 1) * self.width + y + 1).tolist(), blocked[x, y].tolist()):
+                self.occupancy[index] = value
+
+    def _sync_changes(self, changes: EdgeChanges):
+        """
+        sync the cells of changes sensed in sensed_map, or the whole map if sensed_map was
+        replaced by another map since the last sync
+        """
+        if self.sensed_map is not self._synced_map:
+            self.sync_map()
+        elif changes:
+            self.sync_map(changes.cells)
+
+    def grid(self, values: list) -> 'VertexValues':
+        """
+        :param values: one of the flat per vertex lists
+        :return: values indexed by cell position (x,y)
+        """
+        return VertexValues(values, self)
+
+    # the priority queue uses lazy deletion: the current key of every queued vertex is kept
+    # in k1/k2, and heap entries of vertices that left the queue, or whose key changed since
+    # the entry was pushed, are dropped when they reach the top. ties on (k1, k2) are broken
+    # by the vertex index, i.e. by (x, y)
+
+    def queue(self, u: int, k1: float, k2: float):
+        """
+        insert u into the queue, or move it to a new key if it is queued already
+        """
+        self.k1[u] = k1
+        self.k2[u] = k2
+        self.queued[u] = self.epoch
+        heappush(self.heap, (k1, k2, u))
+
+    def top(self) -> int:
+        """
+        :return: queued vertex with the smallest key, -1 if the queue is empty
+        """
+        heap = self.heap
+        queued = self.queued
+        while heap:
+            k1, k2, u = heap[0]
+            if queued[u] and self.k1[u] == k1 and self.k2[u] == k2:
+                return u
+            heappop(heap)
+        return -1
+
+    def update_vertex(self, u: int):
+        g_u = self.g[u]
+        rhs_u = self.rhs[u]
+        if g_u != rhs_u:
+            k2 = g_u if g_u < rhs_u else rhs_u
+            self.queue(u, k2 + self.heuristic(self.s_start, u) + self.k_m, k2)
+        else:
+            self.queued[u] = 0
+
+    def c(self, u: int, v: int) -> float:
+        """
+        calcuclate the cost between nodes
+        :param u: from vertex index
+        :param v: to vertex index
+        :return: euclidean distance to traverse. inf if obstacle in path
+        """
+        if self.occupancy[u] or self.occupancy[v]:
+            return float('inf')
+        return self.heuristic(u, v)
+
+    def min_successor_cost(self, u: int) -> float:
+        """
+        :param u: vertex index
+        :return: min over all successors s_ of c(u, s_) + g(s_)
+        """
+        occupancy = self.occupancy
+        g = self.g
+        inf = float('inf')
+        min_s = inf
+        blocked = occupancy[u] != FREE
+        for offset, cost in self.neighbors[self.parity[u]]:
+            s_ = u + offset
+            if occupancy[s_] == OUTSIDE:
+                continue
+            temp = (inf if blocked or occupancy[s_] else cost) + g[s_]
+            if min_s > temp:
+                min_s = temp
+        return min_s
+
+    def compute_shortest_path(self, max_expansions: int = None, deadline: float = None) -> bool:
+        """
+        :param max_expansions: stop after this many expansions
+        :param deadline: stop once perf_counter() passes this time
+        :return: True if the search finished, False if it stopped early, see DStarLite
+        """
+        inf = float('inf')
+        if max_expansions is None:
+            max_expansions = inf
+        finished = True
+        sqrt = math.sqrt
+        g = self.g
+        rhs = self.rhs
+        k1 = self.k1
+        k2 = self.k2
+        queued = self.queued
+        heap = self.heap
+        occupancy = self.occupancy
+        neighbors = self.neighbors
+        parity = self.parity
+        row = self.row
+        col = self.col
+        k_m = self.k_m
+        s_start = self.s_start
+        s_goal = self.s_goal
+        start_x = row[s_start]
+        start_y = col[s_start]
+
+        # keys depend on s_start and k_m, so a vertex queued in the current epoch whose
+        # g and rhs did not change since does not need to be re-keyed
+        self.epoch += 1
+        epoch = self.epoch
+
+        # counted in locals and added to stats at the end, so that disabled stats cost nothing
+        expansions = rekeys = overconsistent = rhs_recomputations = stale = 0
+        heap_size = len(heap)
+        changed = self.changed_vertices
+
+        while True:
+            # U.Top(), dropping stale entries
+            u = -1
+            top_k1 = top_k2 = inf
+            while heap:
+                top_k1, top_k2, u = heap[0]
+                if queued[u] and k1[u] == top_k1 and k2[u] == top_k2:
+                    break
+                heappop(heap)
+                stale += 1
+                u = -1
+                top_k1 = top_k2 = inf
+
+            # loop while U.TopKey() < CalculateKey(s_start) or rhs(s_start) > g(s_start)
+            g_start = g[s_start]
+            rhs_start = rhs[s_start]
+            start_k2 = g_start if g_start < rhs_start else rhs_start
+            start_k1 = start_k2 + 0.0 + k_m
+            if u < 0 or not (top_k1 < start_k1 or (top_k1 == start_k1 and top_k2 < start_k2) or rhs_start > g_start):
+                break
+            if expansions >= max_expansions or (deadline is not None and perf_counter() >= deadline):
+                finished = False
+                break
+
+            expansions += 1
+            g_u = g[u]
+            rhs_u = rhs[u]
+            if queued[u] != epoch:
+                # the key is from an earlier epoch, k_old < k_new if s_start moved since
+                new_k2 = g_u if g_u < rhs_u else rhs_u
+                dx = row[u] - start_x
+                dy = col[u] - start_y
+                new_k1 = new_k2 + sqrt(dx * dx + dy * dy) + k_m
+                queued[u] = epoch
+                if top_k1 < new_k1 or (top_k1 == new_k1 and top_k2 < new_k2):
+                    k1[u] = new_k1
+                    k2[u] = new_k2
+                    heappush(heap, (new_k1, new_k2, u))
+                    rekeys += 1
+                    continue
+
+            blocked = occupancy[u] != FREE
+            if g_u > rhs_u:
+                overconsistent += 1
+                g[u] = rhs_u
+                if changed is not None:
+                    changed.add(u)
+                queued[u] = 0
+                heappop(heap)
+                for offset, cost in neighbors[parity[u]]:
+                    s = u + offset
+                    occupancy_s = occupancy[s]
+                    if occupancy_s == OUTSIDE:
+                        continue
+                    rhs_s = rhs[s]
+                    if not (blocked or occupancy_s) and cost + rhs_u < rhs_s and s != s_goal:
+                        rhs_s = rhs[s] = cost + rhs_u
+                    elif queued[s] == epoch:
+                        continue
+
+                    # UpdateVertex(s)
+                    g_s = g[s]
+                    if g_s != rhs_s:
+                        key2 = g_s if g_s < rhs_s else rhs_s
+                        dx = row[s] - start_x
+                        dy = col[s] - start_y
+                        key1 = key2 + sqrt(dx * dx + dy * dy) + k_m
+                        if queued[s] != epoch or k1[s] != key1 or k2[s] != key2:
+                            k1[s] = key1
+                            k2[s] = key2
+                            queued[s] = epoch
+                            heappush(heap, (key1, key2, s))
+                    else:
+                        queued[s] = 0
+            else:
+                g_old = g_u
+                g[u] = inf
+                if changed is not None:
+                    changed.add(u)
+                for offset, cost in neighbors[parity[u]]:
+                    s = u + offset
+                    occupancy_s = occupancy[s]
+                    if occupancy_s == OUTSIDE:
+                        continue
+                    if rhs[s] == (inf if blocked or occupancy_s else cost) + g_old and s != s_goal:
+                        rhs[s] = self.min_successor_cost(s)
+                        rhs_recomputations += 1
+                    self.update_vertex(s)
+                # u itself is the last member of Pred(u) + {u}, c(u, u) = 0
+                if rhs_u == (inf if blocked else 0.0) + g_old and u != s_goal:
+                    rhs[u] = self.min_successor_cost(u)
+                    rhs_recomputations += 1
+                self.update_vertex(u)
+
+        stats = self.stats
+        if stats is not None:
+            stats.expansions += expansions
+            stats.rekeys += rekeys
+            stats.overconsistent += overconsistent
+            stats.underconsistent += expansions - rekeys - overconsistent
+            stats.rhs_recomputations += rhs_recomputations
+            # the lazy heap never updates an entry in place: a new key is a push and the old
+            # entry is popped as stale later
+            pops = stale + overconsistent
+            stats.heap_removes += pops
+            stats.heap_inserts += len(heap) - heap_size + pops
+            stats.interrupted += not finished
+        return finished
+
+    def rescan(self) -> EdgeChanges:
+
+        new_edges_and_old_costs = self.new_edges_and_old_costs
+        self.new_edges_and_old_costs = None
+        return new_edges_and_old_costs
+
+    def replan(self, edge_changes: int = 0, edge_time: float = 0.0, budget: bool = True) -> bool:
+        """
+        compute_shortest_path, recorded as one replan if stats are enabled
+        :param edge_changes: number of changed edges that led to this replan
+        :param edge_time: time spent applying them
+        :param budget: stop at the budget of set_budget
+        :return: True if the search finished
+        """
+        # the robot may have moved since an unfinished search, see apply_changes
+        self.k_m += self.heuristic(self.s_last, self.s_start)
+        self.s_last = self.s_start
+        (max_expansions, deadline) = (None, None)
+        if budget:
+            max_expansions = self.max_expansions
+            if self.time_budget is not None:
+                deadline = perf_counter() + self.time_budget
+        self.replanned = True
+        stats = self.stats
+        if stats is None:
+            self.planned = self.compute_shortest_path(max_expansions=max_expansions, deadline=deadline)
+            return self.planned
+        before = stats.as_dict()
+        t = perf_counter()
+        self.planned = self.compute_shortest_path(max_expansions=max_expansions, deadline=deadline)
+        stats.time['compute_shortest_path'] += perf_counter() - t
+        stats.time['edge_updates'] += edge_time
+        stats.edge_changes += edge_changes
+        stats.replans += 1
+        stats.replanned(before, s_start=self.to_pos(self.s_start), k_m=self.k_m, queue_size=len(self.heap))
+        return self.planned
+
+    def _best_successor(self, u: int) -> int:
+        """
+        :param u: vertex index
+        :return: the successor s_ of u with the smallest c(u, s_) + g(s_), None if all are inf
+        """
+        occupancy = self.occupancy
+        g = self.g
+        inf = float('inf')
+        blocked = occupancy[u] != FREE
+        min_s = inf
+        arg_min = None
+        for offset, cost in self.neighbors[self.parity[u]]:
+            s_ = u + offset
+            if occupancy[s_] == OUTSIDE:
+                continue
+            temp = (inf if blocked or occupancy[s_] else cost) + g[s_]
+            if temp < min_s:
+                min_s = temp
+                arg_min = s_
+        return arg_min
+
+    def _apply_edge_changes(self, changed_edges_with_old_cost: EdgeChanges) -> int:
+        """
+        account for the robot movement in k_m and update the rhs of the vertices whose outgoing
+        edges changed cost
+        :param changed_edges_with_old_cost: changed edges and their costs before the change
+        :return: number of changed edges
+        """
+        self.k_m += self.heuristic(self.s_last, self.s_start)
+        self.s_last = self.s_start
+
+        # flat indices of all edges at once, edges to neighbors outside the map are not valid
+        changes = changed_edges_with_old_cost
+        w = self.width
+        v_index = ((changes.cells[:, 0] + 1) * w + changes.cells[:, 1] + 1).tolist()
+        u_index = ((changes.successors[..., 0] + 1) * w + changes.successors[..., 1] + 1).tolist()
+
+        # batched as in DStarLite._apply_edge_changes: every rhs(u) is recomputed at most once
+        # and every u is queued once
+        inf = float('inf')
+        rhs = self.rhs
+        g = self.g
+        recompute = dict.fromkeys(v_index, True)
+        if self.changed_vertices is not None:
+            self.changed_vertices.update(recompute)
+        lowered = {}
+        edge_changes = 0
+        heap_size = len(self.heap)
+        for v, us, costs, valid in zip(v_index, u_index, changes.old_costs.tolist(), changes.valid.tolist()):
+            for u, c_old, in_bounds in zip(us, costs, valid):
+                if not in_bounds:
+                    continue
+                edge_changes += 1
+                if recompute.get(u):
+                    continue
+                c_new = self.c(u, v)
+                if c_old > c_new:
+                    lowered[u] = min(lowered.get(u, inf), c_new + g[v])
+                    recompute.setdefault(u, False)
+                else:
+                    # a more expensive edge can not lower rhs(u) = inf
+                    recompute[u] = rhs[u] != inf and rhs[u] == c_old + g[v]
+
+        for u, full in recompute.items():
+            if u != self.s_goal:
+                if full:
+                    rhs[u] = self.min_successor_cost(u)
+                    if self.stats is not None:
+                        self.stats.rhs_recomputations += 1
+                elif u in lowered:
+                    rhs[u] = min(rhs[u], lowered[u])
+            self.update_vertex(u)
+        if self.stats is not None:
+            self.stats.heap_inserts += len(self.heap) - heap_size
+        return edge_changes
+
+    def apply_changes(self, changes: EdgeChanges, sensed_map: OccupancyGridMap = None,
+                      robot_position: (int, int) = None):
+        """
+        repair the plan after the robot sensed changed edge costs, see DStarLite.apply_changes
+        :param changes: changed edges and their old costs, as returned by SLAM.rescan
+        :param sensed_map: the map the changes were sensed in, as returned by SLAM.rescan
+        :param robot_position: current robot position, if the robot did not follow next_step
+        """
+        if sensed_map is not None:
+            self.sensed_map = sensed_map
+        self._sync_changes(changes)
+        moved = robot_position is not None and self.to_index(robot_position) != self.s_start
+        if moved:
+            self.s_start = self.to_index(robot_position)
+        if changes:
+            t = perf_counter()
+            edge_changes = self._apply_edge_changes(changes)
+            self.replan(edge_changes=edge_changes, edge_time=perf_counter() - t)
+        elif moved or not self.planned:
+            # replan updates k_m, keys in the queue are only lower bounds for the new start then
+            self.replan()
+
+    def next_step(self) -> (int, int):
+        """
+        move the robot one step along the current path
+        :return: the new robot position, s_goal once it is reached. the old position while a
+                 budgeted search has not reached the robot yet, see set_budget
+        """
+        if not self.planned and not self.replanned:
+            self.replan()
+        self.replanned = False
+        if self.s_start != self.s_goal:
+            if not self.planned:
+                # the budget ran out: take the best step known so far, or wait for the search
+                step = self._best_successor(self.s_start)
+                if step is not None:
+                    self.s_start = step
+                return self.to_pos(self.s_start)
+            if self.rhs[self.s_start] == float('inf'):
+                raise NoPathError("There is no known path!")
+            self.s_start = self._best_successor(self.s_start)
+        return self.to_pos(self.s_start)
+
+    def current_path(self, start: (int, int) = None):
+        """
+        generator over the current path from the robot position to the goal, extracted
+        lazily. it follows the g values, so restart it after apply_changes
+        :param start: follow the path from this vertex instead of the robot position
+        :return: vertices of the path, starting with the robot position (or start)
+        """
+        if not self.planned:
+            self.replan()
+        u = self.s_start if start is None else self.to_index(start)
+        if not self.planned and self.rhs[u] == float('inf'):
+            # a budgeted search that did not reach u yet
+            yield self.to_pos(u)
+            return
+        if self.rhs[u] == float('inf'):
+            raise NoPathError("There is no known path!")
+        yield self.to_pos(u)
+        # a path never visits a vertex twice, the bound only guards against inconsistent g
+        for _ in range(self.x_dim * self.y_dim):
+            if u == self.s_goal:
+                return
+            u = self._best_successor(u)
+            if u is None:
+                return
+            yield self.to_pos(u)
+
+    def move_and_replan(self, robot_position: (int, int)):
+        t_start = perf_counter()
+        self._sync_changes(self.new_edges_and_old_costs)
+        path = [robot_position]
+        self.s_start = self.to_index(robot_position)
+        self.s_last = self.s_start
+        self.replan(budget=False)
+
+        while self.s_start != self.s_goal:
+            if self.rhs[self.s_start] == float('inf'):
+                raise NoPathError("There is no known path!")
+
+            self.s_start = self._best_successor(self.s_start)
+            path.append(self.to_pos(self.s_start))
+            # scan graph for changed costs
+            changed_edges_with_old_cost = self.rescan()
+            # if any edge costs changed
+            if changed_edges_with_old_cost:
+                t = perf_counter()
+                edge_changes = self._apply_edge_changes(changed_edges_with_old_cost)
+                self.replan(edge_changes=edge_changes, edge_time=perf_counter() - t)
+            else:
+                self.compute_shortest_path()
+        logger.info("path found!")
+        if self.stats is not None:
+            self.stats.time['move_and_replan'] += perf_counter() - t_start
+        return path, self.grid(self.g), self.grid(self.rhs)
+
+
+class VertexValues:
+    """
+    read-only (x,y) indexed view of a flat per vertex list of FlatDStarLite, so that
+    move_and_replan can hand out g and rhs without copying them on every call.
+    np.asarray(values) gives the (x_dim, y_dim) array
+    """
+
+    def __init__(self, values: list, planner: FlatDStarLite):
+        self.values = values
+        self.planner = planner
+
+    def __getitem__(self, pos: (int, int)) -> float:
+        return self.values[self.planner.to_index(pos)]
+
+    def __array__(self, dtype=None, copy=None):
+        planner = self.planner
+        grid = np.array(self.values, dtype=dtype).reshape(planner.x_dim + 2, planner.width)
+        return grid[1:-1, 1:-1].copy()
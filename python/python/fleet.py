@@ -0,0 +1,184 @@
+"""
+plan for a fleet of robots on one floor. all robots sense into one shared SLAM map, and the
+edge changes any robot senses are fanned out to the planners of all robots, so that every
+robot replans around obstacles the others discovered. with processes > 0 the planners are
+split into shards that each live in a worker process and read the sensed map from shared
+memory, so a fleet step only ships the compact EdgeChanges to the workers
+"""
+import multiprocessing
+from typing import List, Tuple
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from utils import EdgeChanges, NoPathError
+
+PLANNERS = {
+    'dstar': DStarLite,
+    'flat': FlatDStarLite,
+}
+
+
+def _advance(planners: list, changes: EdgeChanges, active: list) -> list:
+    """
+    apply the changes to the planners of the robots that are still moving and move them one step.
+    the planners of robots that reached their goal or have no path are left alone
+    :param active: indices of the planners to advance
+    :return: the new position of every active robot, None where there is no known path
+    """
+    steps = []
+    for dstar in (planners[i] for i in active):
+        try:
+            dstar.apply_changes(changes=changes)
+            steps.append(dstar.next_step())
+        except NoPathError:
+            steps.append(None)
+    return steps
+
+
+def _shard_main(connection, shm_name: str, shape: Tuple[int, int], planner: str, robots: list):
+    """
+    worker process owning the planners of one shard. it answers every (EdgeChanges, active)
+    received on the connection with the next steps of its active robots, and stops on None
+    """
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    sensed_map = OccupancyGridMap(x_dim=shape[0], y_dim=shape[1])
+    sensed_map.set_map(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+    planners = [PLANNERS[planner](map=sensed_map, s_start=start, s_goal=goal, sensed_map=sensed_map)
+                for start, goal in robots]
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            connection.send(_advance(planners, *message))
+    finally:
+        # the planners reference the shared buffer, which can only be closed without them
+        del planners, sensed_map
+        shm.close()
+        connection.close()
+
+
+class FleetPlanner:
+    def __init__(self, map: OccupancyGridMap, robots: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+                 view_range: int = 5, planner: str = 'flat', processes: int = 0):
+        """
+        :param map: the ground truth map of the environment
+        :param robots: (start, goal) of every robot
+        :param view_range: how far every robot senses around itself
+        :param planner: one of PLANNERS
+        :param processes: number of worker processes the planners are sharded over, 0 plans
+                          in this process
+        """
+        self.slam = SLAM(map=map, view_range=view_range)
+        self.positions = [start for start, goal in robots]
+        self.goals = [goal for start, goal in robots]
+        self.paths = [[start] for start in self.positions]
+        self.status = ['reached' if start == goal else 'moving' for start, goal in robots]
+
+        self.processes = processes
+        self.planners = []
+        self._shm = None
+        self._shards = []
+        if not processes:
+            # all planners see the slam map itself
+            self.planners = [PLANNERS[planner](map=map, s_start=start, s_goal=goal, sensed_map=self.slam.slam_map)
+                             for start, goal in robots]
+            return
+
+        from multiprocessing import shared_memory  # python >= 3.8
+
+        shape = (map.x_dim, map.y_dim)
+        self._shm = shared_memory.SharedMemory(create=True, size=map.x_dim * map.y_dim)
+        shared = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf)
+        shared[...] = self.slam.slam_map.occupancy_grid_map
+        self.slam.slam_map.set_map(shared)
+
+        for indices in np.array_split(np.arange(len(robots)), processes):
+            if not len(indices):
+                continue
+            connection, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_main,
+                                             args=(child, self._shm.name, shape, planner,
+                                                   [robots[i] for i in indices]),
+                                             daemon=True)
+            worker.start()
+            child.close()
+            self._shards.append((indices.tolist(), connection, worker))
+
+    def step(self) -> List[Tuple[int, int]]:
+        """
+        let every moving robot sense into the shared map, hand all changes to every planner
+        and move every robot one step
+        :return: positions of all robots
+        """
+        moving = [i for i, status in enumerate(self.status) if status == 'moving']
+        if not moving:
+            return self.positions
+        scans = [self.slam.rescan(global_position=self.positions[i])[0] for i in moving]
+        changes = EdgeChanges.concatenate(scans)
+
+        if self.processes:
+            # only shards with moving robots are asked, for those robots
+            asked = []
+            for indices, connection, worker in self._shards:
+                active = [k for k, i in enumerate(indices) if self.status[i] == 'moving']
+                if active:
+                    connection.send((changes, active))
+                    asked.append(([indices[k] for k in active], connection))
+            steps = {}
+            for robots, connection in asked:
+                steps.update(zip(robots, connection.recv()))
+        else:
+            steps = dict(zip(moving, _advance(self.planners, changes, moving)))
+
+        for i in moving:
+            if steps[i] is None:
+                self.status[i] = 'no_path'
+                continue
+            self.positions[i] = steps[i]
+            self.paths[i].append(steps[i])
+            if steps[i] == self.goals[i]:
+                self.status[i] = 'reached'
+        return self.positions
+
+    def run(self, max_steps: int = None) -> dict:
+        """
+        step until no robot is moving anymore
+        :param max_steps: give up after this many steps, default x_dim * y_dim
+        :return: dictionary with status ('reached', 'no_path' or 'max_steps') and path of every robot
+        """
+        if max_steps is None:
+            max_steps = self.slam.slam_map.x_dim * self.slam.slam_map.y_dim
+        for _ in range(max_steps):
+            if 'moving' not in self.status:
+                break
+            self.step()
+        status = ['max_steps' if status == 'moving' else status for status in self.status]
+        return {'status': status, 'paths': self.paths}
+
+    def close(self):
+        """
+        stop the worker processes and release the shared map
+        """
+        for indices, connection, worker in self._shards:
+            connection.send(None)
+            connection.close()
+            worker.join()
+        self._shards = []
+        if self._shm is not None:
+            # the slam map keeps working on a private copy
+            self.slam.slam_map.set_map(self.slam.slam_map.occupancy_grid_map.copy())
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
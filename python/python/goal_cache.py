@@ -0,0 +1,151 @@
+"""
+reuse the search of D* Lite across planners that drive to the same goal. g and rhs are rooted
+at the goal, so the search tree one planner grew towards its start also holds the distances
+to the goal of every other vertex it reached. GoalCache keeps one root planner per goal: a new
+start moves the root there, adding the heuristic distance to k_m exactly as a moving robot
+does, so the root only expands what its tree is missing towards the new start. the new planner
+is a copy of the root and plans on from there on its own. the roots are evicted least
+recently used once their estimated memory exceeds the budget
+"""
+import copy
+from collections import OrderedDict
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap
+from instrumentation import PlannerStats
+from kernel import ArrayPriorityQueue
+from utils import EdgeChanges, SparseValues
+
+PLANNERS = {
+    'dstar': DStarLite,
+    'flat': FlatDStarLite,
+}
+
+# rough sizes of the python objects behind one entry, for the memory estimate
+QUEUE_ENTRY_BYTES = 200  # node, key and vertex tuples, the floats and the heap and index slots
+SPARSE_ENTRY_BYTES = 160  # dict slot, vertex tuple and float
+LIST_SLOT_BYTES = 8
+
+
+def clone_planner(planner, stats: PlannerStats = None):
+    """
+    copy the search state of a planner, so that both plan on independently. the maps are shared
+    :param planner: DStarLite or FlatDStarLite
+    :param stats: collect counters and timers of the copy in this PlannerStats
+    :return: the copy
+    """
+    clone = copy.copy(planner)
+    clone.stats = stats
+    clone.changed_vertices = None
+    clone.new_edges_and_old_costs = None
+    if isinstance(planner, FlatDStarLite):
+        for name in ('g', 'rhs', 'k1', 'k2', 'queued', 'heap', 'occupancy'):
+            setattr(clone, name, list(getattr(planner, name)))
+        clone._occupancy_grid = planner._occupancy_grid.copy()
+    elif isinstance(planner, DStarLite):
+        clone.g = planner.g.copy()
+        clone.rhs = planner.rhs.copy()
+        U = planner.U
+        if isinstance(U, ArrayPriorityQueue):
+            clone.U = U.copy()
+        else:
+            # the nodes are immutable tuples and can be shared
+            clone.U = type(U)()
+            clone.U.heap = list(U.heap)
+            clone.U.vertices_in_heap = dict(U.vertices_in_heap)
+    else:
+        raise TypeError("can not clone a {}".format(type(planner).__name__))
+    return clone
+
+
+def planner_bytes(planner) -> int:
+    """
+    :param planner: DStarLite or FlatDStarLite
+    :return: estimated memory of its search state, the maps are not counted
+    """
+    if isinstance(planner, FlatDStarLite):
+        # g, rhs, k1, k2, queued and occupancy, the heap holds (k1, k2, u) tuples
+        return (6 * LIST_SLOT_BYTES * planner.n + planner._occupancy_grid.nbytes
+                + QUEUE_ENTRY_BYTES * len(planner.heap))
+    if isinstance(planner.g, SparseValues):
+        state = SPARSE_ENTRY_BYTES * (len(planner.g) + len(planner.rhs))
+    else:
+        state = planner.g.nbytes + planner.rhs.nbytes
+    if isinstance(planner.U, ArrayPriorityQueue):
+        return state + planner.U.nbytes
+    return state + QUEUE_ENTRY_BYTES * len(planner.U.heap)
+
+
+class GoalCache:
+    def __init__(self, sensed_map: OccupancyGridMap, planner: str = 'dstar', memory_budget: int = 512 * 2 ** 20,
+                 **options):
+        """
+        :param sensed_map: the map all planners plan on, e.g. the shared SLAM map of a fleet or a
+                           known floor map. changes of it have to be passed to apply_changes
+        :param planner: 'dstar' or 'flat'
+        :param memory_budget: bytes of cached search state, see planner_bytes. the least recently
+                              used goals are evicted beyond it, the last one used is always kept
+        :param options: further arguments of the planner, e.g. state='sparse' or epsilon
+        """
+        self.sensed_map = sensed_map
+        self.planner = PLANNERS[planner]
+        self.memory_budget = memory_budget
+        self.options = options
+        self.roots = OrderedDict()  # goal -> root planner, least recently used first
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __contains__(self, goal: (int, int)):
+        return goal in self.roots
+
+    def planner_for(self, s_start: (int, int), s_goal: (int, int), stats: PlannerStats = None):
+        """
+        :param s_start: start location of the new planner
+        :param s_goal: end location, the search of a cached goal is reused
+        :param stats: collect counters and timers of the new planner in this PlannerStats
+        :return: a planner with its first plan computed, driven with apply_changes and next_step
+        """
+        root = self.roots.pop(s_goal, None)
+        if root is None:
+            self.misses += 1
+            root = self.planner(map=self.sensed_map, s_start=s_start, s_goal=s_goal, sensed_map=self.sensed_map,
+                                **self.options)
+        else:
+            self.hits += 1
+            self.memory -= planner_bytes(root)
+        # moving the root to the new start only continues its search up to there
+        root.apply_changes(changes=None, robot_position=s_start)
+        self.roots[s_goal] = root
+        self.memory += planner_bytes(root)
+        self._evict()
+        return clone_planner(root, stats=stats)
+
+    def apply_changes(self, changes: EdgeChanges):
+        """
+        let the cached searches account for changed edges of the sensed map. the roots only
+        queue the affected vertices, the repair is paid for by the next planner_for of a goal
+        :param changes: changed edges and their old costs, as returned by SLAM.rescan
+        """
+        if not changes:
+            return
+        for root in self.roots.values():
+            if isinstance(root, FlatDStarLite):
+                root.sync_map(changes.cells)
+            root._apply_edge_changes(changes)
+            root.planned = False
+
+    def clear(self):
+        self.roots.clear()
+        self.memory = 0
+
+    def _evict(self):
+        while self.memory > self.memory_budget and len(self.roots) > 1:
+            _, root = self.roots.popitem(last=False)
+            self.memory -= planner_bytes(root)
+            self.evictions += 1
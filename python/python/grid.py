@@ -1,13 +1,83 @@
 import numpy as np
-from utils import get_movements_4n, get_movements_8n, heuristic, Vertices, Vertex
-from typing import Dict, List
+from functools import lru_cache
+from utils import get_movements_4n, get_movements_8n, heuristic, Vertices, Vertex, EdgeChanges
+from typing import Dict, List, Tuple
 
 OBSTACLE = 255
 UNOCCUPIED = 0
 
 
+def binary_cost_table() -> np.ndarray:
+    """
+    :return: cost table of the binary map: UNOCCUPIED cells cost 1, every other value is an obstacle
+    """
+    table = np.full(256, np.inf)
+    table[UNOCCUPIED] = 1.0
+    return table
+
+
+def linear_cost_table(max_factor: float = 10.0) -> np.ndarray:
+    """
+    cost table of a cost map: UNOCCUPIED costs 1, the values 1 to 254 rise linearly up to max_factor,
+    e.g. for inflation layers or slow zones, and OBSTACLE is not traversable
+    :param max_factor: cost factor of the value 254
+    :return: cost table
+    """
+    table = 1.0 + (max_factor - 1.0) * np.arange(256) / 254.0
+    table[OBSTACLE] = np.inf
+    return table
+
+
+@lru_cache(maxsize=2)
+def neighbor_moves(exploration_setting: str = '8N') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param exploration_setting: '4N' or '8N'
+    :return: (moves, distances). moves is the (2, K, 2) array of (dx, dy) steps in the order
+             OccupancyGridMap.succ returns them, row 1 for cells with an even x + y, and distances
+             the matching (2, K) euclidean step lengths
+    """
+    if exploration_setting == '4N':
+        moves = np.array(get_movements_4n(x=0, y=0))
+    else:
+        moves = np.array(get_movements_8n(x=0, y=0))
+
+    # succ() reverses the movements of cells with an even x + y
+    moves = np.stack([moves, moves[::-1]])
+    distances = np.sqrt((moves ** 2).sum(axis=2))
+    for table in (moves, distances):
+        table.setflags(write=False)
+    return moves, distances
+
+
+@lru_cache(maxsize=8)
+def neighbor_table(x_dim: int, y_dim: int, exploration_setting: str = '8N') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    precompute the neighbors of every cell of a map, once per map size and connectivity.
+    cells are numbered row major, i.e. index = x * y_dim + y
+    :param x_dim: dimension in the x direction
+    :param y_dim: dimension in the y direction
+    :param exploration_setting: '4N' or '8N'
+    :return: (neighbors, valid, distances). neighbors is a (x_dim * y_dim, K) table, K = 4 or 8,
+             of flat neighbor indices in the order OccupancyGridMap.succ returns them, padded with 0
+             where the neighbor is out of bounds. valid is the matching boundary mask. distances is
+             the (2, K) euclidean step length per column, row 1 for cells with an even x + y
+    """
+    moves, distances = neighbor_moves(exploration_setting)
+
+    x, y = np.divmod(np.arange(x_dim * y_dim), y_dim)
+    moves = moves[(x + y + 1) % 2]
+    nx = x[:, np.newaxis] + moves[:, :, 0]
+    ny = y[:, np.newaxis] + moves[:, :, 1]
+    valid = (0 <= nx) & (nx < x_dim) & (0 <= ny) & (ny < y_dim)
+    neighbors = np.where(valid, nx * y_dim + ny, 0).astype(np.int32)
+
+    for table in (neighbors, valid, distances):
+        table.setflags(write=False)
+    return neighbors, valid, distances
+
+
 class OccupancyGridMap:
-    def __init__(self, x_dim, y_dim, exploration_setting='8N'):
+    def __init__(self, x_dim, y_dim, exploration_setting='8N', cost_table=None):
         """
         set initial values for the map occupancy grid
         |----------> y, column
@@ -17,6 +87,10 @@ class OccupancyGridMap:
         x, row
         :param x_dim: dimension in the x direction
         :param y_dim: dimension in the y direction
+        :param exploration_setting: '4N' or '8N' connectivity
+        :param cost_table: cost factor of every cell value (256 entries, >= 1, inf where the
+                           cell can not be traversed), default binary_cost_table(). the cost of
+                           an edge is its length times the mean factor of its two cells
         """
         self.x_dim = x_dim
         self.y_dim = y_dim
@@ -30,6 +104,21 @@ class OccupancyGridMap:
         # obstacles
         self.visited = {}
         self.exploration_setting = exploration_setting
+        self.set_cost_table(binary_cost_table() if cost_table is None else cost_table)
+
+    def set_cost_table(self, cost_table: np.ndarray):
+        """
+        :param cost_table: cost factor of every cell value, see __init__
+        """
+        cost_table = np.asarray(cost_table, dtype=float)
+        if cost_table.shape != (256,) or not np.all(cost_table >= 1.0):
+            # factors below 1 would make the euclidean heuristic inadmissible
+            raise ValueError("cost_table needs 256 factors >= 1")
+        self.cost_table = cost_table
+        self.weighted = not np.array_equal(cost_table, binary_cost_table())
+        # lists, looked up per edge by c() and is_unoccupied()
+        self._cost = cost_table.tolist()
+        self._traversable = np.isfinite(cost_table).tolist()
 
     def get_map(self):
         """
@@ -44,10 +133,17 @@ class OccupancyGridMap:
         """
         self.occupancy_grid_map = new_ogrid
 
+    def empty_like(self) -> 'OccupancyGridMap':
+        """
+        :return: a map of the same size and kind without obstacles, e.g. for SLAM to sense into
+        """
+        return OccupancyGridMap(x_dim=self.x_dim, y_dim=self.y_dim, exploration_setting=self.exploration_setting,
+                                cost_table=self.cost_table)
+
     def is_unoccupied(self, pos: (int, int)) -> bool:
         """
         :param pos: cell position we wish to check
-        :return: True if cell is occupied with obstacle, False else
+        :return: True if cell can be traversed, i.e. its cost is finite, False else
         """
         (x, y) = (round(pos[0]), round(pos[1]))  # make sure pos is int
         (row, col) = (x, y)
@@ -55,7 +151,18 @@ class OccupancyGridMap:
         # if not self.in_bounds(cell=(x, y)):
         #    raise IndexError("Map index out of bounds")
 
-        return self.occupancy_grid_map[row][col] == UNOCCUPIED
+        return self._traversable[self.occupancy_grid_map[row][col]]
+
+    def c(self, u: (int, int), v: (int, int)) -> float:
+        """
+        :param u: from vertex
+        :param v: to vertex
+        :return: euclidean distance times the mean cost factor of u and v, inf if either
+                 can not be traversed
+        """
+        grid = self.occupancy_grid_map
+        cost = self._cost
+        return heuristic(u, v) * (cost[grid[u]] + cost[grid[v]]) * 0.5
 
     def in_bounds(self, cell: (int, int)) -> bool:
         """
@@ -96,6 +203,46 @@ class OccupancyGridMap:
         filtered_movements = self.filter(neighbors=movements, avoid_obstacles=avoid_obstacles)
         return list(filtered_movements)
 
+    def neighbor_table(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: (neighbors, valid, distances) table of this map size and connectivity, see neighbor_table()
+        """
+        return neighbor_table(self.x_dim, self.y_dim, self.exploration_setting)
+
+    def succ_batch(self, vertices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        successors of many vertices at once
+        :param vertices: (M, 2) array of cell positions (x,y)
+        :return: (successors, costs, valid)
+                 successors: (M, K, 2) neighbor positions, in the order succ() returns them
+                 costs: (M, K) edge costs c(vertex, successor), inf if either cell is an obstacle
+                        or the successor is out of bounds
+                 valid: (M, K) False where the successor is out of bounds
+        """
+        # computed for the given vertices only, a table of the whole map would cost
+        # 40 bytes per cell on large maps
+        moves, distances = neighbor_moves(self.exploration_setting)
+        vertices = np.asarray(vertices, dtype=np.int64).reshape(-1, 2)
+        parity = (vertices.sum(axis=1) + 1) % 2
+
+        successors = vertices[:, np.newaxis, :] + moves[parity]
+        (nx, ny) = (successors[..., 0], successors[..., 1])
+        valid = (0 <= nx) & (nx < self.x_dim) & (0 <= ny) & (ny < self.y_dim)
+
+        table = self.cost_table
+        factors = table[self.occupancy_at(np.where(valid, nx, 0), np.where(valid, ny, 0))]
+        factors = (factors + table[self.occupancy_at(vertices[:, 0], vertices[:, 1])][:, np.newaxis]) * 0.5
+        costs = np.where(valid, distances[parity] * factors, np.inf)
+        return successors, costs, valid
+
+    def occupancy_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        :param x: x positions of cells
+        :param y: y positions of cells, same shape as x
+        :return: the occupancy values of the cells
+        """
+        return self.occupancy_grid_map[x, y]
+
     def set_obstacle(self, pos: (int, int)):
         """
         :param pos: cell position we wish to set obstacle
@@ -126,12 +273,64 @@ class OccupancyGridMap:
                  if self.in_bounds((x, y))]
         return {node: UNOCCUPIED if self.is_unoccupied(pos=node) else OBSTACLE for node in nodes}
 
+    def local_window(self, global_position: (int, int), view_range: int = 2) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        :param global_position: position of robot in the global map frame
+        :param view_range: how far ahead we should look
+        :return: view of the occupancy grid covering the cells within view range, clipped to the
+                 map, and the (x,y) position of its first cell
+        """
+        (px, py) = global_position
+        x_min, y_min = max(px - view_range, 0), max(py - view_range, 0)
+        x_max, y_max = min(px + view_range + 1, self.x_dim), min(py + view_range + 1, self.y_dim)
+        return self.occupancy_grid_map[x_min:x_max, y_min:y_max], (x_min, y_min)
+
+    def window(self, origin: Tuple[int, int], shape: Tuple[int, int]) -> np.ndarray:
+        """
+        :param origin: (x,y) position of the first cell
+        :param shape: size of the window, it has to lie inside the map
+        :return: view of the cells of the window
+        """
+        (x, y) = origin
+        return self.occupancy_grid_map[x:x + shape[0], y:y + shape[1]]
+
+    def set_window(self, origin: Tuple[int, int], window: np.ndarray):
+        """
+        write a window as returned by local_window back into the map
+        :param origin: (x,y) position of the first cell of the window
+        :param window: the cell values
+        """
+        (x, y) = origin
+        self.occupancy_grid_map[x:x + window.shape[0], y:y + window.shape[1]] = window
+
+    def observe(self, origin: Tuple[int, int], observed: np.ndarray) -> EdgeChanges:
+        """
+        copy observed cell values into the map, e.g. the ground truth within view range of a
+        robot or what its sensor saw. only the cells whose cost factor differs change edge costs
+        :param origin: (x,y) position of the first observed cell, inside the map
+        :param observed: the observed cell values, clipped to the map
+        :return: the changed cells with the edge costs before the observation
+        """
+        if not self.in_bounds(origin):
+            raise ValueError("the observation has to start inside the map, got origin {}".format(origin))
+        (x, y) = origin
+        observed = observed[:self.x_dim - x, :self.y_dim - y]
+        known = self.window(origin, observed.shape)
+
+        cost_table = self.cost_table
+        changed = cost_table[observed] != cost_table[known]
+        cells = np.argwhere(changed) + origin
+        successors, old_costs, valid = self.succ_batch(cells)
+        if len(cells):
+            known[changed] = observed[changed]
+            self.set_window(origin, known)  # known is a view of dense maps already
+        return EdgeChanges(cells=cells, successors=successors, old_costs=old_costs, valid=valid)
+
 
 class SLAM:
     def __init__(self, map: OccupancyGridMap, view_range: int):
         self.ground_truth_map = map
-        self.slam_map = OccupancyGridMap(x_dim=map.x_dim,
-                                         y_dim=map.y_dim)
+        self.slam_map = map.empty_like()
         self.view_range = view_range
 
     def set_ground_truth_map(self, gt_map: OccupancyGridMap):
@@ -142,21 +341,20 @@ class SLAM:
         calcuclate the cost between nodes
         :param u: from vertex
         :param v: to vertex
-        :return: euclidean distance to traverse. inf if obstacle in path
+        :return: euclidean distance to traverse, weighted by the cost map. inf if obstacle in path
         """
-        if not self.slam_map.is_unoccupied(u) or not self.slam_map.is_unoccupied(v):
-            return float('inf')
-        else:
-            return heuristic(u, v)
-
-    def rescan(self, global_position: (int, int)):
-
-        # rescan local area
-        local_observation = self.ground_truth_map.local_observation(global_position=global_position,
-                                                                    view_range=self.view_range)
+        return self.slam_map.c(u, v)
 
-        vertices = self.update_changed_edge_costs(local_grid=local_observation)
-        return vertices, self.slam_map
+    def rescan(self, global_position: (int, int)) -> Tuple[EdgeChanges, OccupancyGridMap]:
+        """
+        compare the ground truth and the slam map within view range of the robot and copy the
+        cells that differ into the slam map
+        :param global_position: position of robot in the global map frame
+        :return: the changed cells with the edge costs before the scan, and the slam map
+        """
+        observed, origin = self.ground_truth_map.local_window(global_position=global_position,
+                                                              view_range=self.view_range)
+        return self.slam_map.observe(origin, observed), self.slam_map
 
     def update_changed_edge_costs(self, local_grid: Dict) -> Vertices:
         vertices = Vertices()
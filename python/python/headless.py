@@ -0,0 +1,149 @@
+"""
+plan a route without pygame: load a map, drive the robot from start to goal with SLAM
+rescans after every step and write the path and timing statistics as JSON
+
+usage: python headless.py MAP --start X Y --goal X Y [--view-range 5] [--planner dstar]
+                          [--output result.json] [--visualize]
+
+MAP is a .npy, .npz or .rle grid, a ROS map_server .yaml or .pgm map or a whitespace separated
+text grid, non-zero cells are obstacles. see map_io
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from map_io import load_map
+from utils import heuristic, NoPathError
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+PLANNERS = {
+    'dstar': DStarLite,
+    'flat': FlatDStarLite,
+}
+
+
+def plan(world: OccupancyGridMap, start: (int, int), goal: (int, int), view_range: int = 5,
+         planner: str = 'dstar', max_steps: int = None) -> dict:
+    """
+    drive from start to goal over a map that is only known within view range of the robot
+    :param world: ground truth map
+    :param start: start location
+    :param goal: end location
+    :param view_range: how far the robot senses around itself
+    :param planner: one of PLANNERS
+    :param max_steps: give up after this many steps, default x_dim * y_dim
+    :return: dictionary with status ('reached', 'no_path' or 'max_steps'), path and stats
+    """
+    if max_steps is None:
+        max_steps = world.x_dim * world.y_dim
+
+    t_start = time.perf_counter()
+    dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal)
+    slam = SLAM(map=world, view_range=view_range)
+
+    position = start
+    path = [start]
+    replan_times = []
+    scan_times = []
+    status = 'reached'
+    while position != goal:
+        if len(path) > max_steps:
+            status = 'max_steps'
+            break
+
+        t = time.perf_counter()
+        changes, slam_map = slam.rescan(global_position=position)
+        scan_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        try:
+            dstar.apply_changes(changes=changes, sensed_map=slam_map, robot_position=position)
+            position = dstar.next_step()
+        except NoPathError:
+            status = 'no_path'
+            break
+        finally:
+            replan_times.append(time.perf_counter() - t)
+
+        path.append(position)
+
+    return {
+        'status': status,
+        'start': list(start),
+        'goal': list(goal),
+        'planner': planner,
+        'view_range': view_range,
+        'path': [list(p) for p in path],
+        'stats': {
+            'steps': len(path) - 1,
+            'path_cost': sum(heuristic(p, q) for p, q in zip(path, path[1:])),
+            'total_time': time.perf_counter() - t_start,
+            'first_plan_time': replan_times[0] if replan_times else 0.0,
+            'replans': len(replan_times),
+            'replan_time_mean': float(np.mean(replan_times)) if replan_times else 0.0,
+            'replan_time_max': max(replan_times, default=0.0),
+            'scan_time_mean': float(np.mean(scan_times)) if scan_times else 0.0,
+        },
+    }
+
+
+def visualize(world: OccupancyGridMap, result: dict, view_range: int):
+    """
+    replay a planned route in the pygame window, [space] steps the robot
+    """
+    from gui import Animation  # pygame is only needed here
+
+    path = [tuple(p) for p in result['path']]
+    gui = Animation(x_dim=world.x_dim,
+                    y_dim=world.y_dim,
+                    start=tuple(result['start']),
+                    goal=tuple(result['goal']),
+                    viewing_range=view_range)
+    gui.world = world
+    while not gui.done:
+        step = path.index(gui.current)
+        gui.run_game(path=path[step:] if step + 1 < len(path) else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('map', help='map file, see map_io')
+    parser.add_argument('--start', type=int, nargs=2, required=True, metavar=('X', 'Y'))
+    parser.add_argument('--goal', type=int, nargs=2, required=True, metavar=('X', 'Y'))
+    parser.add_argument('--view-range', type=int, default=5)
+    parser.add_argument('--planner', choices=sorted(PLANNERS), default='dstar')
+    parser.add_argument('--max-steps', type=int, default=None)
+    parser.add_argument('--output', default='-', help='JSON result file, - for stdout')
+    parser.add_argument('--visualize', action='store_true', help='replay the route with pygame')
+    args = parser.parse_args(argv)
+
+    world = load_map(args.map)
+    result = plan(world=world,
+                  start=tuple(args.start),
+                  goal=tuple(args.goal),
+                  view_range=args.view_range,
+                  planner=args.planner,
+                  max_steps=args.max_steps)
+
+    if args.output == '-':
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.visualize:
+        visualize(world=world, result=result, view_range=args.view_range)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+"""
+hierarchical planning for long routes on large maps (HPA*). the map is cut into square clusters,
+and where two neighboring clusters have free cells facing each other across their border there
+is an entrance: one pair of cells in the middle of every such run, or one pair at each end of a
+long run. the entrance cells are the nodes of an abstract graph whose edges are the crossings
+of the entrances and the shortest paths within a cluster between its nodes. DStarLite searches
+the abstract graph, whose nodes are cells and whose edges are never shorter than the euclidean
+distance, so its heuristic stays admissible. only the segment up to the next abstract node is
+refined at full resolution.
+
+the distances within a cluster are computed lazily, when the search first reaches one of its
+nodes, and the abstract search inflates its heuristic a little, so a first plan only pays for
+the clusters along the route. when SLAM reports changed cells, only their clusters and the
+entrances on their borders are recomputed, and the abstract nodes whose edges changed are
+handed to the abstract DStarLite
+"""
+import math
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap
+from instrumentation import PlannerStats
+from utils import EdgeChanges, NoPathError
+
+# runs of facing free cells at least this long get an entrance at each end instead of one in the middle
+LONG_ENTRANCE = 6
+# most clusters computed in one batch
+LOAD_BATCH = 64
+
+DIRECTIONS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+def _sweep(costs: np.ndarray, padded: np.ndarray):
+    """
+    relax the costs row by row along the first axis, forward and then backward
+    :param costs: (w + 2, h + 2, n, k) costs of k sources in n windows, padded with inf
+    :param padded: (w + 2, h + 2, n, 1) cost factors of the windows, padded with inf
+    """
+    h = costs.shape[1] - 2
+    # edges between (x, y) and (x - 1, y + d), and between (x, y) and (x + 1, y + d)
+    backward = {d: math.hypot(1, d) * 0.5 * (padded[1:, 1:-1] + padded[:-1, 1 + d:h + 1 + d]) for d in (-1, 0, 1)}
+    forward = {d: math.hypot(1, d) * 0.5 * (padded[:-1, 1:-1] + padded[1:, 1 + d:h + 1 + d]) for d in (-1, 0, 1)}
+    for x in range(2, costs.shape[0] - 1):
+        row = costs[x, 1:-1]
+        for d in (-1, 0, 1):
+            np.minimum(row, costs[x - 1, 1 + d:h + 1 + d] + backward[d][x - 1], out=row)
+    for x in range(costs.shape[0] - 3, 0, -1):
+        row = costs[x, 1:-1]
+        for d in (-1, 0, 1):
+            np.minimum(row, costs[x + 1, 1 + d:h + 1 + d] + forward[d][x], out=row)
+
+
+def distance_fields(factors: np.ndarray, sources: List[List[Tuple[int, int]]]) -> np.ndarray:
+    """
+    shortest path costs within windows of cells to every source of the window, for all windows
+    and sources at once. edges connect the 8 neighbors of a cell and cost their length times the
+    mean cost factor of both cells, as OccupancyGridMap.c. the windows are swept row by row in
+    all four directions until no cost changes, which takes a few rounds, one more for every turn
+    a shortest path has to take around obstacles
+    :param factors: (n, w, h) cost factors of the cells of n windows, inf where they can not be traversed
+    :param sources: for every window the positions of its sources within the window
+    :return: (n, k, w, h) costs, k the most sources of a window, inf where a source can not be
+             reached and for the missing sources of windows with fewer
+    """
+    (n, w, h) = factors.shape
+    # the sources are the last axis, so that a row of cells is one contiguous block
+    padded = np.full((w + 2, h + 2, n, 1), np.inf)
+    padded[1:-1, 1:-1, :, 0] = factors.transpose(1, 2, 0)
+    costs = np.full((w + 2, h + 2, n, max(map(len, sources), default=0)), np.inf)
+    for i, window in enumerate(sources):
+        for j, (x, y) in enumerate(window):
+            costs[x + 1, y + 1, i, j] = 0.0
+    while True:
+        before = costs.copy()
+        _sweep(costs, padded)
+        _sweep(costs.swapaxes(0, 1), padded.swapaxes(0, 1))
+        if np.array_equal(before, costs):
+            return costs[1:-1, 1:-1].transpose(2, 3, 0, 1)
+
+
+class ClusterGraph:
+    def __init__(self, map: OccupancyGridMap, cluster_size: int = 32):
+        """
+        :param map: the map to abstract, changes to it are picked up by update()
+        :param cluster_size: side length of a cluster in cells
+        """
+        self.map = map
+        self.cluster_size = cluster_size
+        self.x_dim = map.x_dim
+        self.y_dim = map.y_dim
+        self.clusters_shape = (-(-map.x_dim // cluster_size), -(-map.y_dim // cluster_size))
+        self.inter = {}  # node -> {node across the border: cost}
+        self.pinned = set()  # nodes besides the entrances, e.g. start and goal
+        self.nodes = {}  # cluster -> set of its nodes
+        self._borders = {}  # border -> entrances [(cell, cell across)]
+        self._intra = {}  # cluster -> {node: {node: cost}} of the clusters computed so far
+
+        for axis, i in self._lines():
+            for j, entrances in self._entrances(axis, i).items():
+                self._set_border((axis, i, j), entrances)
+
+    def cluster_of(self, cell: (int, int)) -> (int, int):
+        return cell[0] // self.cluster_size, cell[1] // self.cluster_size
+
+    def _window(self, cluster: (int, int)) -> Tuple[int, int, int, int]:
+        """
+        :return: (x_min, y_min, x_max, y_max) of the cells in the cluster
+        """
+        cs = self.cluster_size
+        (cx, cy) = cluster
+        return cx * cs, cy * cs, min((cx + 1) * cs, self.x_dim), min((cy + 1) * cs, self.y_dim)
+
+    # a border is (axis, i, j): the cells i * cluster_size - 1 and i * cluster_size along the axis
+    # face each other across it, and j is the index of the clusters along the border
+
+    def _lines(self):
+        """
+        :return: the (axis, i) of all lines of borders
+        """
+        return [('x', i) for i in range(1, self.clusters_shape[0])] + \
+               [('y', i) for i in range(1, self.clusters_shape[1])]
+
+    @staticmethod
+    def _clusters_of(border: Tuple[str, int, int]) -> List[Tuple[int, int]]:
+        """
+        :return: the two clusters on both sides of the border
+        """
+        (axis, i, j) = border
+        return [(i - 1, j), (i, j)] if axis == 'x' else [(j, i - 1), (j, i)]
+
+    def _borders_of(self, cell: (int, int)) -> List[Tuple[str, int, int]]:
+        """
+        :return: the borders whose entrances depend on the cell
+        """
+        cs = self.cluster_size
+        (x, y) = cell
+        borders = []
+        if x % cs == 0 and x > 0:
+            borders.append(('x', x // cs, y // cs))
+        if x % cs == cs - 1 and x + 1 < self.x_dim:
+            borders.append(('x', x // cs + 1, y // cs))
+        if y % cs == 0 and y > 0:
+            borders.append(('y', y // cs, x // cs))
+        if y % cs == cs - 1 and y + 1 < self.y_dim:
+            borders.append(('y', y // cs + 1, x // cs))
+        return borders
+
+    def _entrances(self, axis: str, i: int) -> Dict[int, List[Tuple[Tuple[int, int], Tuple[int, int], float]]]:
+        """
+        :return: j -> the entrances of the border (axis, i, j) as pairs of facing cells and their
+                 cost, for all borders along the line
+        """
+        cs = self.cluster_size
+        along = np.arange(self.y_dim if axis == 'x' else self.x_dim)
+        across = np.full(len(along), i * cs)
+        if axis == 'x':
+            (near, far) = ((across - 1, along), (across, along))
+        else:
+            (near, far) = ((along, across - 1), (along, across))
+        table = self.map.cost_table
+        costs = (table[self.map.occupancy_at(*near)] + table[self.map.occupancy_at(*far)]) * 0.5
+        free = np.isfinite(costs)
+
+        # runs of facing free cells, cut where the next border along the line begins
+        joined = free[:-1] & free[1:] & (along[1:] % cs != 0)
+        starts = np.flatnonzero(free & ~np.concatenate([[False], joined]))
+        ends = np.flatnonzero(free & ~np.concatenate([joined, [False]])) + 1
+        long = ends - starts >= LONG_ENTRANCE
+        picks = np.sort(np.concatenate([np.where(long, starts, (starts + ends - 1) // 2), ends[long] - 1]))
+
+        entrances = {j: [] for j in range(-(-len(along) // cs))}
+        for k, a_x, a_y, b_x, b_y, cost in zip(picks.tolist(), near[0][picks].tolist(), near[1][picks].tolist(),
+                                               far[0][picks].tolist(), far[1][picks].tolist(),
+                                               costs[picks].tolist()):
+            entrances[k // cs].append(((a_x, a_y), (b_x, b_y), cost))
+        return entrances
+
+    def _set_border(self, border: Tuple[str, int, int], entrances: list):
+        for a, b, _ in self._borders.get(border, ()):
+            for u, v in ((a, b), (b, a)):
+                del self.inter[u][v]
+                if not self.inter[u]:
+                    del self.inter[u]
+                    if u not in self.pinned:
+                        self.nodes[self.cluster_of(u)].discard(u)
+        self._borders[border] = entrances
+        for a, b, cost in entrances:
+            for u, v in ((a, b), (b, a)):
+                self.inter.setdefault(u, {})[v] = cost
+                self.nodes.setdefault(self.cluster_of(u), set()).add(u)
+
+    def _factors(self, cluster: (int, int)) -> np.ndarray:
+        """
+        :return: (cluster_size, cluster_size) cost factors of the cells of the cluster, inf
+                 beyond the map
+        """
+        (x_min, y_min, x_max, y_max) = self._window(cluster)
+        x, y = np.meshgrid(np.arange(x_min, x_max), np.arange(y_min, y_max), indexing='ij')
+        factors = np.full((self.cluster_size, self.cluster_size), np.inf)
+        factors[:x_max - x_min, :y_max - y_min] = self.map.cost_table[self.map.occupancy_at(x, y)]
+        return factors
+
+    def _load(self, clusters: List[Tuple[int, int]]):
+        """
+        compute the shortest paths within the clusters between all their nodes, LOAD_BATCH
+        clusters at a time
+        """
+        for i in range(0, len(clusters), LOAD_BATCH):
+            batch = clusters[i:i + LOAD_BATCH]
+            nodes = [sorted(self.nodes.get(cluster, ())) for cluster in batch]
+            origins = [self._window(cluster)[:2] for cluster in batch]
+            fields = distance_fields(np.stack([self._factors(cluster) for cluster in batch]),
+                                     [[(u[0] - x0, u[1] - y0) for u in window]
+                                      for window, (x0, y0) in zip(nodes, origins)])
+            for cluster, window, (x0, y0), field in zip(batch, nodes, origins, fields):
+                intra = {}
+                for u in window:
+                    costs = field[:len(window), u[0] - x0, u[1] - y0].tolist()
+                    intra[u] = {v: cost for v, cost in zip(window, costs) if v != u and cost != math.inf}
+                self._intra[cluster] = intra
+
+    def _intra_edges(self, u: (int, int)) -> Dict[Tuple[int, int], float]:
+        cluster = self.cluster_of(u)
+        if cluster not in self._intra:
+            self._load([cluster])
+        return self._intra[cluster].get(u, {})
+
+    def succ(self, vertex: (int, int), avoid_obstacles: bool = False) -> List[Tuple[int, int]]:
+        """
+        :param vertex: abstract node
+        :param avoid_obstacles: unused, the abstract graph only has passable edges
+        :return: the nodes connected to the node
+        """
+        return list(self._intra_edges(vertex)) + list(self.inter.get(vertex, ()))
+
+    def c(self, u: (int, int), v: (int, int)) -> float:
+        """
+        :return: cost of the abstract edge (u, v), inf if there is none
+        """
+        cost = self.inter.get(u, {}).get(v)
+        if cost is None:
+            cost = self._intra_edges(u).get(v, math.inf)
+        return cost
+
+    def _edges(self, u: (int, int)) -> dict:
+        """
+        :return: the known edges of u, without computing its cluster
+        """
+        edges = dict(self.inter.get(u, {}))
+        cluster = self.cluster_of(u)
+        if cluster in self._intra:
+            edges.update(self._intra[cluster].get(u, {}))
+        return edges
+
+    def _track(self, clusters: Set[Tuple[int, int]], change):
+        """
+        apply change() and report the nodes of the clusters whose edges changed
+        :return: set of changed nodes
+        """
+        before = {u: self._edges(u) for cluster in clusters for u in self.nodes.get(cluster, ())}
+        change()
+        after = {u: self._edges(u) for cluster in clusters for u in self.nodes.get(cluster, ())}
+        return {u for u in before.keys() | after.keys() if before.get(u) != after.get(u)}
+
+    def update(self, cells: np.ndarray) -> Set[Tuple[int, int]]:
+        """
+        recompute the entrances and paths around cells of the map that changed
+        :param cells: (M, 2) positions of changed cells, e.g. changes.cells of SLAM.rescan
+        :return: nodes whose edges changed
+        """
+        cells = [tuple(cell) for cell in np.asarray(cells).reshape(-1, 2).tolist()]
+        borders = {border for cell in cells for border in self._borders_of(cell)}
+        clusters = {self.cluster_of(cell) for cell in cells}
+        for border in borders:
+            clusters.update(self._clusters_of(border))
+
+        def change():
+            for axis, i in {border[:2] for border in borders}:
+                entrances = self._entrances(axis, i)
+                for border in borders:
+                    if border[:2] == (axis, i):
+                        self._set_border(border, entrances[border[2]])
+            self._load(sorted(cluster for cluster in clusters if cluster in self._intra))
+
+        return self._track(clusters, change)
+
+    def pin(self, cell: (int, int)) -> Set[Tuple[int, int]]:
+        """
+        make a cell a node of its cluster, e.g. the start or goal
+        :return: nodes whose edges changed
+        """
+        return self._pinning(cell, True)
+
+    def unpin(self, cell: (int, int)) -> Set[Tuple[int, int]]:
+        """
+        :return: nodes whose edges changed
+        """
+        return self._pinning(cell, False)
+
+    def _pinning(self, cell: (int, int), pin: bool) -> Set[Tuple[int, int]]:
+        cluster = self.cluster_of(cell)
+
+        def change():
+            if pin:
+                self.pinned.add(cell)
+                self.nodes.setdefault(cluster, set()).add(cell)
+            else:
+                self.pinned.discard(cell)
+                if cell not in self.inter:
+                    self.nodes[cluster].discard(cell)
+            if cluster in self._intra:
+                self._load([cluster])
+
+        return self._track({cluster}, change)
+
+    def refine(self, u: (int, int), v: (int, int)) -> List[Tuple[int, int]]:
+        """
+        :param u: cell of the cluster of v, or a node across the border from v
+        :param v: node
+        :return: the cells of the shortest path from u to v within the cluster, without u
+        """
+        cluster = self.cluster_of(v)
+        if self.cluster_of(u) != cluster:
+            return [v]
+        (x_min, y_min, x_max, y_max) = self._window(cluster)
+        field = distance_fields(self._factors(cluster)[np.newaxis], [[(v[0] - x_min, v[1] - y_min)]])[0, 0]
+        path = []
+        for _ in range(field.size):
+            if u == v:
+                break
+            best, best_cost = None, math.inf
+            for dx, dy in DIRECTIONS:
+                s = (u[0] + dx, u[1] + dy)
+                if x_min <= s[0] < x_max and y_min <= s[1] < y_max:
+                    cost = self.map.c(u, s) + field[s[0] - x_min, s[1] - y_min]
+                    if cost < best_cost:
+                        best, best_cost = s, cost
+            if best is None:
+                break
+            u = best
+            path.append(u)
+        return path
+
+
+class HierarchicalPlanner:
+    def __init__(self, map: OccupancyGridMap, s_start: (int, int), s_goal: (int, int), cluster_size: int = 32,
+                 stats: PlannerStats = None, sensed_map: OccupancyGridMap = None, epsilon: float = 1.2):
+        """
+        :param map: the ground truth map of the environment
+        :param s_start: start location
+        :param s_goal: end location
+        :param cluster_size: side length of a cluster in cells
+        :param stats: collect the counters of the abstract search in this PlannerStats
+        :param sensed_map: plan on this map instead of an own empty one, e.g. a known floor map
+        :param epsilon: inflation factor >= 1 of the heuristic of the abstract search, see DStarLite.
+                        the entrances make the abstract paths a little longer than optimal anyway,
+                        the inflation keeps the search from computing most clusters off the route
+        """
+        if sensed_map is None:
+            sensed_map = map.empty_like()
+        self.sensed_map = sensed_map
+        self.s_start = s_start
+        self.s_goal = s_goal
+        self.stats = stats
+        self.graph = ClusterGraph(sensed_map, cluster_size=cluster_size)
+        self.graph.pin(s_goal)
+        self.graph.pin(s_start)
+        self._pinned_start = s_start
+        self.dstar = DStarLite(map=self.graph, s_start=s_start, s_goal=s_goal, stats=stats,
+                               sensed_map=self.graph, state='sparse', epsilon=epsilon)
+        self._segment = []  # refined cells up to the next abstract node
+
+    @property
+    def planned(self) -> bool:
+        return self.dstar.planned
+
+    def replan(self):
+        self.dstar.replan()
+
+    def _pin_start(self) -> Set[Tuple[int, int]]:
+        """
+        make the robot position a node of the abstract graph, so the abstract search can start there
+        :return: nodes whose edges changed
+        """
+        changed = set()
+        old = self._pinned_start
+        if old != self.s_start and old != self.s_goal:
+            changed |= self.graph.unpin(old)
+        if self.s_start not in self.graph.nodes.get(self.graph.cluster_of(self.s_start), ()):
+            changed |= self.graph.pin(self.s_start)
+        self._pinned_start = self.s_start
+        return changed
+
+    @staticmethod
+    def _node_changes(nodes: Set[Tuple[int, int]]) -> EdgeChanges:
+        """
+        :return: the changed nodes as EdgeChanges. all their edges are looked at again, so no
+                 single edges are listed
+        """
+        cells = np.array(sorted(nodes), dtype=int).reshape(-1, 2)
+        return EdgeChanges(cells=cells, successors=np.zeros((len(cells), 0, 2), dtype=int),
+                           old_costs=np.zeros((len(cells), 0)), valid=np.zeros((len(cells), 0), dtype=bool))
+
+    def apply_changes(self, changes: EdgeChanges, sensed_map: OccupancyGridMap = None,
+                      robot_position: (int, int) = None):
+        """
+        update the abstraction around the changed cells and repair the abstract plan, see
+        DStarLite.apply_changes
+        :param changes: changed cells of the sensed map, as returned by SLAM.rescan, None for none
+        :param sensed_map: the map the changes were sensed in, as returned by SLAM.rescan
+        :param robot_position: current robot position, if the robot did not follow next_step
+        """
+        if sensed_map is not None:
+            self.sensed_map = self.graph.map = sensed_map
+        moved = robot_position is not None and robot_position != self.s_start
+        if moved:
+            self.s_start = robot_position
+        changed = set()
+        if changes:
+            changed |= self.graph.update(changes.cells)
+        if changes or moved:
+            # the refined segment may be blocked, continue from the robot position
+            self._segment = []
+            changed |= self._pin_start()
+        self.dstar.apply_changes(changes=self._node_changes(changed), robot_position=self.s_start)
+
+    def next_step(self) -> (int, int):
+        """
+        move the robot one step along the current path
+        :return: the new robot position, s_goal once it is reached
+        """
+        if self.s_start == self.s_goal:
+            return self.s_start
+        if not self._segment:
+            # the robot is at an abstract node
+            self.dstar.apply_changes(changes=self._node_changes(set()), robot_position=self.s_start)
+            path = self.dstar.current_path()
+            next(path)
+            node = next(path, None)
+            if node is None:
+                raise NoPathError("There is no known path!")
+            self._segment = self.graph.refine(self.s_start, node)
+            if not self._segment:
+                raise NoPathError("There is no known path!")
+        self.s_start = self._segment.pop(0)
+        return self.s_start
+
+    def current_path(self):
+        """
+        generator over the current path from the robot position to the goal, refined lazily
+        :return: cells of the path, starting with the robot position
+        """
+        yield self.s_start
+        node = self.s_start
+        for node in self._segment:
+            yield node
+        if not self.dstar.planned:
+            self.dstar.replan()
+        nodes = self.dstar.current_path(start=node)
+        next(nodes)
+        for v in nodes:
+            for cell in self.graph.refine(node, v):
+                yield cell
+            node = v
@@ -0,0 +1,130 @@
+"""
+inflation layer for robots with a footprint. it keeps the distance of every cell to the
+nearest sensed obstacle, up to the inflation radius, and turns it into a cost map: cells
+within the robot radius of an obstacle can not be traversed, the cost of the cells up to
+the inflation radius falls off linearly with the distance. when a scan sets or removes
+obstacles only the neighborhood within the inflation radius of the changed cells is
+recomputed, and the cells whose cost changed are reported as one EdgeChanges
+"""
+import math
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from grid import OccupancyGridMap, SLAM, linear_cost_table
+from utils import EdgeChanges
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+
+@lru_cache(maxsize=4)
+def disk_offsets(radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param radius: disk radius in cells
+    :return: (N, 2) offsets of all cells within the disk, sorted by distance, and their distances
+    """
+    r = int(math.floor(radius))
+    dx, dy = np.mgrid[-r:r + 1, -r:r + 1]
+    offsets = np.stack([dx.ravel(), dy.ravel()], axis=1)
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    order = np.argsort(distances, kind='stable')
+    inside = distances[order] <= radius
+    return offsets[order][inside], distances[order][inside]
+
+
+class InflationLayer:
+    def __init__(self, slam: SLAM, robot_radius: float = 0.0, inflation_radius: float = 3.0,
+                 max_factor: float = 10.0):
+        """
+        :param slam: the slam whose (binary) sensed map is inflated
+        :param robot_radius: cells within this distance of an obstacle are not traversable
+        :param inflation_radius: cells up to this distance of an obstacle cost more
+        :param max_factor: cost factor of a cell just outside the robot radius
+        """
+        if slam.slam_map.weighted:
+            raise ValueError("the inflation layer needs a binary sensed map")
+        if not 0.0 <= robot_radius < inflation_radius:
+            raise ValueError("need 0 <= robot_radius < inflation_radius")
+        self.slam = slam
+        self.robot_radius = robot_radius
+        self.inflation_radius = inflation_radius
+        sensed = slam.slam_map
+        self.costmap = sensed.empty_like()
+        self.costmap.set_cost_table(linear_cost_table(max_factor))
+        # distance to the nearest obstacle, inf beyond the inflation radius
+        self.distance = np.full((sensed.x_dim, sensed.y_dim), np.inf, dtype=np.float32)
+        self.rebuild()
+
+    def rescan(self, global_position: (int, int)) -> Tuple[EdgeChanges, OccupancyGridMap]:
+        """
+        let slam sense at the position and inflate the changed cells
+        :param global_position: position of robot in the global map frame
+        :return: the cost changes of the cost map, and the cost map to plan on
+        """
+        changes, _ = self.slam.rescan(global_position=global_position)
+        return self.update(changes.cells), self.costmap
+
+    def update(self, cells: np.ndarray) -> EdgeChanges:
+        """
+        recompute the neighborhood of cells of the sensed map that changed, e.g. changes.cells
+        of SLAM.rescan or the positions of the vertices from SLAM.update_changed_edge_costs
+        :param cells: (M, 2) positions of the changed cells
+        :return: the changed cells of the cost map with their edge costs before the update
+        """
+        cells = np.asarray(cells, dtype=int).reshape(-1, 2)
+        if not len(cells):
+            return self._recompute(0, 0, 0, 0)
+        r = int(math.ceil(self.inflation_radius))
+        (x_min, y_min) = np.maximum(cells.min(axis=0) - r, 0).tolist()
+        (x_max, y_max) = np.minimum(cells.max(axis=0) + r + 1, self.distance.shape).tolist()
+        return self._recompute(x_min, y_min, x_max, y_max)
+
+    def rebuild(self) -> EdgeChanges:
+        """
+        recompute the whole cost map
+        :return: the changed cells of the cost map with their edge costs before the rebuild
+        """
+        return self._recompute(0, 0, *self.distance.shape)
+
+    def _obstacles(self, x_min: int, y_min: int, x_max: int, y_max: int) -> np.ndarray:
+        """
+        :return: obstacle mask of the sensed map in the window, False outside of the map
+        """
+        x, y = np.arange(x_min, x_max), np.arange(y_min, y_max)
+        inside = ((0 <= x) & (x < self.distance.shape[0]))[:, np.newaxis] & \
+                 ((0 <= y) & (y < self.distance.shape[1]))[np.newaxis, :]
+        xx, yy = np.meshgrid(np.clip(x, 0, self.distance.shape[0] - 1),
+                             np.clip(y, 0, self.distance.shape[1] - 1), indexing='ij')
+        sensed = self.slam.slam_map
+        return inside & ~np.isfinite(sensed.cost_table[sensed.occupancy_at(xx, yy)])
+
+    def _recompute(self, x_min: int, y_min: int, x_max: int, y_max: int) -> EdgeChanges:
+        """
+        recompute distances and costs of the window [x_min, x_max) x [y_min, y_max)
+        """
+        r = int(math.ceil(self.inflation_radius))
+        (width, height) = (x_max - x_min, y_max - y_min)
+        obstacles = self._obstacles(x_min - r, y_min - r, x_max + r, y_max + r)
+
+        # offsets come sorted by distance, so the first obstacle found for a cell is the nearest
+        distance = np.full((width, height), np.inf, dtype=np.float32)
+        for (dx, dy), d in zip(*disk_offsets(self.inflation_radius)):
+            hit = obstacles[r + dx:r + dx + width, r + dy:r + dy + height]
+            distance[hit & np.isinf(distance)] = d
+        self.distance[x_min:x_max, y_min:y_max] = distance
+
+        values = np.full((width, height), UNOCCUPIED, dtype=np.uint8)
+        ramp = (self.inflation_radius - distance) / (self.inflation_radius - self.robot_radius)
+        inflated = np.isfinite(distance)
+        values[inflated] = np.clip(np.round(254 * ramp[inflated]), 1, 254)
+        values[distance <= self.robot_radius] = OBSTACLE
+
+        x, y = np.meshgrid(np.arange(x_min, x_max), np.arange(y_min, y_max), indexing='ij')
+        changed = values != self.costmap.occupancy_at(x, y)
+        cells = np.argwhere(changed) + (x_min, y_min)
+        successors, old_costs, valid = self.costmap.succ_batch(cells)
+        if np.any(changed):
+            self.costmap.set_window((x_min, y_min), values)
+        return EdgeChanges(cells=cells, successors=successors, old_costs=old_costs, valid=valid)
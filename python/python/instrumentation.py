@@ -0,0 +1,60 @@
+from typing import Callable
+
+
+class PlannerStats:
+    """
+    opt-in counters and timers of a D* Lite planner, pass an instance as stats=... to the
+    planner. counters and phase timers accumulate over the life of the planner, on_replan
+    is called after every replan with what that replan alone did
+    """
+    COUNTERS = ('replans',                # compute_shortest_path runs on a new start or changed edges
+                'edge_changes',           # changed directed edges handed to move_and_replan
+                'expansions',             # iterations of the compute_shortest_path loop
+                'rekeys',                 # expansions that only moved a vertex to its up to date key
+                'overconsistent',         # expansions with g > rhs
+                'underconsistent',        # expansions with g < rhs
+                'rhs_recomputations',     # rhs recomputed as the min over all successors
+                'heap_inserts',
+                'heap_updates',
+                'heap_removes',
+                'interrupted')            # compute_shortest_path runs stopped by their budget
+    PHASES = ('compute_shortest_path',
+              'edge_updates',
+              'move_and_replan')
+
+    def __init__(self, on_replan: Callable[[dict], None] = None):
+        """
+        :param on_replan: called after every replan with a dictionary of the counters and
+                          timers of that replan, the new start, k_m and the queue size
+        """
+        self.on_replan = on_replan
+        self.reset()
+
+    def reset(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.time = dict.fromkeys(self.PHASES, 0.0)
+
+    def as_dict(self) -> dict:
+        """
+        :return: counters, and the phase timers as time_<phase> in seconds
+        """
+        values = {name: getattr(self, name) for name in self.COUNTERS}
+        for phase, seconds in self.time.items():
+            values['time_' + phase] = seconds
+        return values
+
+    def replanned(self, before: dict, **context):
+        """
+        fire on_replan with the difference to the as_dict() taken before the replan
+        :param before: as_dict() before the replan
+        :param context: extra items for the record
+        """
+        if self.on_replan is None:
+            return
+        record = {name: value - before[name] for name, value in self.as_dict().items()}
+        record.update(context)
+        self.on_replan(record)
+
+    def __repr__(self):
+        return "PlannerStats({})".format(", ".join("{}={}".format(k, v) for k, v in self.as_dict().items()))
@@ -0,0 +1,378 @@
+"""
+compiled inner loop of DStarLite.compute_shortest_path, see DStarLite(kernel=True). the search
+runs on flat arrays: g and rhs of the planner viewed as one row major array (index = x * y_dim + y),
+the cell values of the sensed map with its cost table, the neighbor table of the map and an
+indexed binary heap of flat vertex indices. it expands the vertices in the same order and
+computes the same g and rhs values as the interpreted loop, bit for bit
+
+numba compiles the kernel if it is installed (pip install numba). otherwise the very same
+functions run as plain python on the arrays, which gives the same results but is slower than the
+interpreted loop of DStarLite, see NUMBA
+"""
+from time import perf_counter
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# True if the kernel is compiled
+NUMBA = njit is not None
+
+# expansions per kernel call while a deadline is set, the clock is read between the calls. the
+# interpreted kernel takes tens of microseconds per expansion, so it reads the clock much more often
+# to overrun a time budget by a few milliseconds at most
+DEADLINE_CHUNK = 1000 if NUMBA else 10
+
+# counters of a kernel call, in the order of the counters array
+COUNTERS = ('expansions', 'rekeys', 'overconsistent', 'rhs_recomputations', 'heap_inserts', 'heap_updates',
+            'heap_removes')
+
+
+def jit(function):
+    """
+    compile function with numba if it is installed, else leave it as it is
+    """
+    if NUMBA:
+        return njit(cache=True, nogil=True)(function)
+    return function
+
+
+# the heap: heap[:size[0]] holds the queued vertices, position[u] is the slot of u in heap, -1 if
+# u is not queued, and key1[u], key2[u] its key. vertices are ordered by (k1, k2) and ties by the
+# vertex index, which is the order of the (x,y) tuples in PriorityQueue
+
+
+@jit
+def _less(u, v, key1, key2):
+    if key1[u] != key1[v]:
+        return key1[u] < key1[v]
+    if key2[u] != key2[v]:
+        return key2[u] < key2[v]
+    return u < v
+
+
+@jit
+def _sift_up(heap, position, key1, key2, pos):
+    u = heap[pos]
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        v = heap[parent]
+        if not _less(u, v, key1, key2):
+            break
+        heap[pos] = v
+        position[v] = pos
+        pos = parent
+    heap[pos] = u
+    position[u] = pos
+
+
+@jit
+def _sift_down(heap, position, key1, key2, size, pos):
+    n = size[0]
+    u = heap[pos]
+    child = 2 * pos + 1
+    while child < n:
+        if child + 1 < n and _less(heap[child + 1], heap[child], key1, key2):
+            child += 1
+        v = heap[child]
+        if not _less(v, u, key1, key2):
+            break
+        heap[pos] = v
+        position[v] = pos
+        pos = child
+        child = 2 * pos + 1
+    heap[pos] = u
+    position[u] = pos
+
+
+@jit
+def heap_insert(heap, position, key1, key2, size, u, k1, k2):
+    key1[u] = k1
+    key2[u] = k2
+    pos = size[0]
+    size[0] += 1
+    heap[pos] = u
+    position[u] = pos
+    _sift_up(heap, position, key1, key2, pos)
+
+
+@jit
+def heap_update(heap, position, key1, key2, size, u, k1, k2):
+    key1[u] = k1
+    key2[u] = k2
+    pos = position[u]
+    _sift_up(heap, position, key1, key2, pos)
+    _sift_down(heap, position, key1, key2, size, position[u])
+
+
+@jit
+def heap_remove(heap, position, key1, key2, size, u):
+    pos = position[u]
+    position[u] = -1
+    size[0] -= 1
+    last = heap[size[0]]
+    if pos < size[0]:
+        # move the last leaf into the hole and restore the invariant from there
+        heap[pos] = last
+        position[last] = pos
+        _sift_up(heap, position, key1, key2, pos)
+        _sift_down(heap, position, key1, key2, size, position[last])
+
+
+@jit
+def _calculate_key(g, rhs, u, y_dim, start_x, start_y, k_m, epsilon):
+    """
+    DStarLite.calculate_key of the flat vertex u
+    """
+    dx = u // y_dim - start_x
+    dy = u % y_dim - start_y
+    h = np.sqrt(float(dx * dx + dy * dy))
+    if g[u] > rhs[u] and epsilon != 1.0:
+        return rhs[u] + epsilon * h + epsilon * k_m, rhs[u]
+    k2 = min(g[u], rhs[u])
+    return k2 + h + k_m, k2
+
+
+@jit
+def _update_vertex(g, rhs, u, y_dim, start_x, start_y, k_m, epsilon, heap, position, key1, key2, size,
+                   counters):
+    if g[u] != rhs[u]:
+        (k1, k2) = _calculate_key(g, rhs, u, y_dim, start_x, start_y, k_m, epsilon)
+        if position[u] >= 0:
+            heap_update(heap, position, key1, key2, size, u, k1, k2)
+            counters[5] += 1
+        else:
+            heap_insert(heap, position, key1, key2, size, u, k1, k2)
+            counters[4] += 1
+    elif position[u] >= 0:
+        heap_remove(heap, position, key1, key2, size, u)
+        counters[6] += 1
+
+
+@jit
+def _min_successor_cost(g, grid, cost, neighbors, valid, distances, parity, u):
+    min_s = np.inf
+    for k in range(neighbors.shape[1]):
+        if valid[u, k]:
+            s_ = neighbors[u, k]
+            temp = distances[parity, k] * (cost[grid[u]] + cost[grid[s_]]) * 0.5 + g[s_]
+            if min_s > temp:
+                min_s = temp
+    return min_s
+
+
+@jit
+def search(g, rhs, grid, cost, neighbors, valid, distances, y_dim, heap, position, key1, key2, size,
+           s_start, s_goal, k_m, epsilon, max_expansions, changed, counters):
+    """
+    the loop of DStarLite.compute_shortest_path on flat arrays
+    :param g: flat g values, updated in place
+    :param rhs: flat rhs values, updated in place
+    :param grid: flat cell values of the sensed map
+    :param cost: cost table of the sensed map
+    :param neighbors: neighbor table of the map, see grid.neighbor_table
+    :param valid: its boundary mask
+    :param distances: its step lengths, row 1 for cells with an even x + y
+    :param heap: see the heap functions, updated in place
+    :param s_start: flat index of the robot position
+    :param s_goal: flat index of the goal
+    :param max_expansions: stop after this many expansions
+    :param changed: flags the vertices whose g value changed, if it is not empty
+    :param counters: incremented by what the search did, see COUNTERS
+    :return: True if the search finished, False if it ran out of expansions
+    """
+    start_x = s_start // y_dim
+    start_y = s_start % y_dim
+    record = changed.shape[0] > 0
+    expansions = 0
+    while True:
+        (start_k1, start_k2) = _calculate_key(g, rhs, s_start, y_dim, start_x, start_y, k_m, epsilon)
+        if size[0] > 0:
+            u = heap[0]
+            (top_k1, top_k2) = (key1[u], key2[u])
+        else:
+            u = -1
+            (top_k1, top_k2) = (np.inf, np.inf)
+        top_lower = top_k1 < start_k1 or (top_k1 == start_k1 and top_k2 < start_k2)
+        if not (top_lower or rhs[s_start] > g[s_start]) or u < 0:
+            return True
+        if expansions >= max_expansions:
+            return False
+        expansions += 1
+        counters[0] += 1
+
+        (new_k1, new_k2) = _calculate_key(g, rhs, u, y_dim, start_x, start_y, k_m, epsilon)
+        parity = (u // y_dim + u % y_dim + 1) % 2
+        if top_k1 < new_k1 or (top_k1 == new_k1 and top_k2 < new_k2):
+            heap_update(heap, position, key1, key2, size, u, new_k1, new_k2)
+            counters[1] += 1
+        elif g[u] > rhs[u]:
+            counters[2] += 1
+            g[u] = rhs[u]
+            if record:
+                changed[u] = 1
+            heap_remove(heap, position, key1, key2, size, u)
+            for k in range(neighbors.shape[1]):
+                if not valid[u, k]:
+                    continue
+                s = neighbors[u, k]
+                if s != s_goal:
+                    temp = distances[parity, k] * (cost[grid[s]] + cost[grid[u]]) * 0.5 + g[u]
+                    if temp < rhs[s]:
+                        rhs[s] = temp
+                _update_vertex(g, rhs, s, y_dim, start_x, start_y, k_m, epsilon, heap, position, key1, key2,
+                               size, counters)
+        else:
+            g_old = g[u]
+            g[u] = np.inf
+            if record:
+                changed[u] = 1
+            # Pred(u) + {u}, c(u, u) is 0 or nan if u is an obstacle, as in DStarLite.c
+            for k in range(neighbors.shape[1] + 1):
+                if k < neighbors.shape[1]:
+                    if not valid[u, k]:
+                        continue
+                    s = neighbors[u, k]
+                    c = distances[parity, k] * (cost[grid[s]] + cost[grid[u]]) * 0.5
+                else:
+                    s = u
+                    c = 0.0 if cost[grid[u]] < np.inf else np.nan
+                if rhs[s] == c + g_old and s != s_goal:
+                    rhs[s] = _min_successor_cost(g, grid, cost, neighbors, valid, distances,
+                                                 (s // y_dim + s % y_dim + 1) % 2, s)
+                    counters[3] += 1
+                _update_vertex(g, rhs, s, y_dim, start_x, start_y, k_m, epsilon, heap, position, key1, key2,
+                               size, counters)
+
+
+class ArrayPriorityQueue:
+    """
+    the queue of DStarLite(kernel=True): an indexed binary min-heap of flat vertex indices in
+    numpy arrays, which the kernel works on directly. it takes and returns (x,y) vertices and
+    (k1, k2) keys like PriorityQueue, in the same order
+    """
+
+    def __init__(self, x_dim: int, y_dim: int):
+        self.y_dim = y_dim
+        n = x_dim * y_dim
+        self.heap = np.zeros(n, dtype=np.int64)
+        self.position = np.full(n, -1, dtype=np.int64)
+        self.key1 = np.full(n, np.inf)
+        self.key2 = np.full(n, np.inf)
+        self.size = np.zeros(1, dtype=np.int64)
+
+    def _arrays(self):
+        return self.heap, self.position, self.key1, self.key2, self.size
+
+    def __contains__(self, vertex):
+        return self.position[vertex[0] * self.y_dim + vertex[1]] >= 0
+
+    def __len__(self):
+        return int(self.size[0])
+
+    @property
+    def vertices_in_heap(self) -> list:
+        """
+        :return: the queued vertices
+        """
+        return [divmod(u, self.y_dim) for u in self.heap[:self.size[0]].tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays())
+
+    def nodes(self) -> list:
+        """
+        :return: the (key, vertex) nodes in heap order, inserting them in this order restores the heap
+        """
+        queued = self.heap[:self.size[0]]
+        return [((k1, k2), divmod(u, self.y_dim)) for u, k1, k2 in
+                zip(queued.tolist(), self.key1[queued].tolist(), self.key2[queued].tolist())]
+
+    def copy(self) -> 'ArrayPriorityQueue':
+        queue = ArrayPriorityQueue.__new__(ArrayPriorityQueue)
+        queue.y_dim = self.y_dim
+        (queue.heap, queue.position, queue.key1, queue.key2, queue.size) = (array.copy() for array in self._arrays())
+        return queue
+
+    def top(self):
+        return divmod(int(self.heap[0]), self.y_dim)
+
+    def top_key(self):
+        if self.size[0] == 0: return (float('inf'), float('inf'))
+        u = self.heap[0]
+        return float(self.key1[u]), float(self.key2[u])
+
+    def pop(self):
+        node = (self.top_key(), self.top())
+        heap_remove(*self._arrays(), int(self.heap[0]))
+        return node
+
+    def insert(self, vertex, priority):
+        heap_insert(*self._arrays(), vertex[0] * self.y_dim + vertex[1], priority[0], priority[1])
+
+    def remove(self, vertex):
+        heap_remove(*self._arrays(), vertex[0] * self.y_dim + vertex[1])
+
+    def update(self, vertex, priority):
+        heap_update(*self._arrays(), vertex[0] * self.y_dim + vertex[1], priority[0], priority[1])
+
+
+def compute_shortest_path(planner, max_expansions: int = None, deadline: float = None) -> bool:
+    """
+    run DStarLite.compute_shortest_path of a planner in the kernel
+    :param planner: DStarLite with kernel=True
+    :param max_expansions: stop after this many expansions
+    :param deadline: stop once perf_counter() passes this time, checked every DEADLINE_CHUNK expansions
+    :return: True if the search finished, False if it stopped early
+    """
+    sensed_map = planner.sensed_map
+    y_dim = sensed_map.y_dim
+    neighbors, valid, distances = sensed_map.neighbor_table()
+    grid = sensed_map.get_map()
+    if grid.dtype != np.uint8 or not grid.flags.c_contiguous:
+        # e.g. a map set from another dtype. dense uint8 maps are passed on as they are, only
+        # tiled maps still assemble a dense copy for every call
+        grid = np.ascontiguousarray(grid, dtype=np.uint8)
+    grid = grid.reshape(-1)
+    if not (planner.g.flags.c_contiguous and planner.rhs.flags.c_contiguous):
+        raise ValueError("the kernel updates g and rhs through flat views, they have to be C contiguous")
+    g = planner.g.reshape(-1)
+    rhs = planner.rhs.reshape(-1)
+    if planner.changed_vertices is not None:
+        changed = np.zeros(g.shape[0], dtype=np.uint8)
+    else:
+        changed = np.zeros(0, dtype=np.uint8)
+    counters = np.zeros(len(COUNTERS), dtype=np.int64)
+    s_start = planner.s_start[0] * y_dim + planner.s_start[1]
+    s_goal = planner.s_goal[0] * y_dim + planner.s_goal[1]
+
+    left = np.iinfo(np.int64).max if max_expansions is None else max_expansions
+    while True:
+        chunk = left if deadline is None else min(left, DEADLINE_CHUNK)
+        before = counters[0]
+        finished = search(g, rhs, grid, sensed_map.cost_table, neighbors, valid, distances, y_dim,
+                          *planner.U._arrays(), s_start, s_goal, float(planner.k_m), float(planner.epsilon), chunk,
+                          changed, counters)
+        left -= counters[0] - before
+        if finished or left <= 0 or (deadline is not None and perf_counter() >= deadline):
+            break
+
+    if planner.changed_vertices is not None:
+        planner.changed_vertices.update(divmod(u, y_dim) for u in np.flatnonzero(changed).tolist())
+    stats = planner.stats
+    if stats is not None:
+        (expansions, rekeys, overconsistent, rhs_recomputations, inserts, updates, removes) = counters.tolist()
+        stats.expansions += expansions
+        stats.rekeys += rekeys
+        stats.overconsistent += overconsistent
+        stats.underconsistent += expansions - rekeys - overconsistent
+        stats.rhs_recomputations += rhs_recomputations
+        stats.heap_inserts += inserts
+        stats.heap_updates += updates + rekeys
+        stats.heap_removes += removes + overconsistent
+        stats.interrupted += not finished
+    return bool(finished)
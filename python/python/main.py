@@ -1,11 +1,15 @@
+import logging
+
 from gui import Animation
 from d_star_lite import DStarLite
 from grid import OccupancyGridMap, SLAM
+from path import PathExtractor
 
 OBSTACLE = 255
 UNOCCUPIED = 0
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     """
     set initial values for the map occupancy grid
@@ -49,8 +53,9 @@ if __name__ == '__main__':
     slam = SLAM(map=new_map,
                 view_range=view_range)
 
-    # move and compute path
-    path, g, rhs = dstar.move_and_replan(robot_position=new_position)
+    # compute the initial path, the extractor only re-extracts the part of it that changed
+    extractor = PathExtractor(dstar)
+    path = extractor.path()
 
     while not gui.done:
         # update the map
@@ -80,8 +85,8 @@ if __name__ == '__main__':
             # slam
             new_edges_and_old_costs, slam_map = slam.rescan(global_position=new_position)
 
-            dstar.new_edges_and_old_costs = new_edges_and_old_costs
-            dstar.sensed_map = slam_map
-
-            # d star
-            path, g, rhs = dstar.move_and_replan(robot_position=new_position)
+            # d star, only repairs the plan where the sensed edges changed
+            dstar.apply_changes(changes=new_edges_and_old_costs,
+                                sensed_map=slam_map,
+                                robot_position=new_position)
+            path = extractor.path()
@@ -0,0 +1,237 @@
+"""
+saving and loading occupancy grids. the format follows from the file extension:
+
+    .npy    the raw uint8 grid, loaded memory mapped and copy on write, so loading takes the
+            same time for every map size and only the pages that are read are touched
+    .npz    the grid and the cost table, zlib compressed
+    .rle    the grid run length encoded along the rows, small for floor maps with large free
+            or unknown areas and decoded with a single np.repeat
+    .yaml   a ROS map_server map: the yaml file and the PGM image it points to
+    .pgm    a PGM image alone, read with the map_server defaults
+
+any other extension is read as whitespace separated text grid. cell values other than
+UNOCCUPIED are obstacles with the default binary cost table
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+
+from grid import OccupancyGridMap
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+RLE_MAGIC = b'DSLRLE01'
+RLE_MAX_RUN = 2 ** 16 - 1
+
+# the defaults of ROS map_server
+ROS_DEFAULTS = {'negate': 0, 'occupied_thresh': 0.65, 'free_thresh': 0.196, 'mode': 'trinary'}
+
+
+def save_map(map: OccupancyGridMap, path: str):
+    """
+    :param map: the map to save, its values and, for .npz, its cost table
+    :param path: file to write, the format follows from the extension: .npy, .npz or .rle
+    """
+    grid = np.ascontiguousarray(map.get_map(), dtype=np.uint8)
+    extension = os.path.splitext(path)[1]
+    if extension == '.npy':
+        np.save(path, grid)
+    elif extension == '.npz':
+        np.savez_compressed(path, grid=grid, cost_table=map.cost_table)
+    elif extension == '.rle':
+        values, runs = rle_encode(grid)
+        with open(path, 'wb') as f:
+            f.write(RLE_MAGIC)
+            f.write(np.array([grid.shape[0], grid.shape[1], len(values)], dtype='<u4').tobytes())
+            f.write(values.tobytes())
+            f.write(runs.astype('<u2').tobytes())
+    else:
+        raise ValueError("can not save maps as '{}', use .npy, .npz or .rle".format(extension))
+
+
+def load_map(path: str, cost_table: np.ndarray = None, mmap_mode: str = 'c') -> OccupancyGridMap:
+    """
+    :param path: file to read, the format follows from the extension, see the module docstring
+    :param cost_table: cost factor of every cell value, see OccupancyGridMap. default the cost
+                       table saved in a .npz file, or binary_cost_table()
+    :param mmap_mode: how a .npy file is memory mapped, see np.load: 'c' copy on write, 'r'
+                      read only, 'r+' write through to the file, None reads it into memory
+    :return: the map
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.npy':
+        grid = np.load(path, mmap_mode=mmap_mode)
+    elif extension == '.npz':
+        with np.load(path) as data:
+            grid = data['grid']
+            if cost_table is None and 'cost_table' in data:
+                cost_table = data['cost_table']
+    elif extension == '.rle':
+        grid = read_rle(path)
+    elif extension == '.yaml':
+        return load_ros_map(path, cost_table=cost_table)[0]
+    elif extension == '.pgm':
+        grid = ros_values(read_pgm(path), **ROS_DEFAULTS)
+    else:
+        grid = np.loadtxt(path, ndmin=2)
+    return _make_map(grid, cost_table)
+
+
+def _make_map(grid: np.ndarray, cost_table: np.ndarray = None) -> OccupancyGridMap:
+    """
+    :param grid: cell values, anything but a uint8 grid is read as obstacle wherever it is not zero
+    """
+    if grid.ndim != 2:
+        raise ValueError("a map needs a 2d grid, got shape {}".format(grid.shape))
+    if grid.dtype != np.uint8:
+        grid = np.where(grid != UNOCCUPIED, OBSTACLE, UNOCCUPIED).astype(np.uint8)
+    world = OccupancyGridMap(x_dim=grid.shape[0], y_dim=grid.shape[1], cost_table=cost_table)
+    world.set_map(grid)
+    return world
+
+
+def rle_encode(grid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param grid: cell values
+    :return: (values, runs): the value of every run of equal cells in row major order and its
+             uint16 length. longer runs are split into several
+    """
+    flat = grid.ravel()
+    starts = np.flatnonzero(np.concatenate([[True], flat[1:] != flat[:-1]]))
+    lengths = np.diff(np.append(starts, flat.size))
+    pieces = -(-lengths // RLE_MAX_RUN)
+    run = np.repeat(np.arange(len(lengths)), pieces)
+    piece = np.arange(len(run)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    runs = np.minimum(lengths[run] - piece * RLE_MAX_RUN, RLE_MAX_RUN).astype(np.uint16)
+    return flat[starts][run], runs
+
+
+def read_rle(path: str) -> np.ndarray:
+    """
+    :param path: .rle file written by save_map
+    :return: the decoded (x_dim, y_dim) uint8 grid
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(RLE_MAGIC)] != RLE_MAGIC:
+        raise ValueError("{} is not a run length encoded map".format(path))
+    header = np.frombuffer(data, dtype='<u4', count=3, offset=len(RLE_MAGIC))
+    (x_dim, y_dim, n) = header.tolist()
+    offset = len(RLE_MAGIC) + header.nbytes
+    values = np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)
+    runs = np.frombuffer(data, dtype='<u2', count=n, offset=offset + n)
+    if runs.sum(dtype=np.int64) != x_dim * y_dim:
+        raise ValueError("{} is truncated or corrupt".format(path))
+    return np.repeat(values, runs).reshape(x_dim, y_dim)
+
+
+def read_pgm(path: str) -> np.ndarray:
+    """
+    :param path: binary (P5) or plain (P2) PGM image with 8 bit pixels
+    :return: (height, width) pixel values, row 0 at the top of the image
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    # the header is magic, width, height and maxval, separated by whitespace and comments
+    fields, position = [], 0
+    while len(fields) < 4:
+        while data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b'#':
+            position = data.index(b'\n', position)
+            continue
+        end = position
+        while end < len(data) and not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[position:end])
+        position = end
+    (magic, width, height, maxval) = (fields[0], int(fields[1]), int(fields[2]), int(fields[3]))
+    if maxval > 255:
+        raise ValueError("{}: only 8 bit PGM images are supported".format(path))
+    if magic == b'P5':
+        # a single whitespace byte ends the header
+        pixels = np.frombuffer(data, dtype=np.uint8, count=width * height, offset=position + 1)
+    elif magic == b'P2':
+        pixels = np.array(data[position:].split()[:width * height], dtype=np.uint8)
+    else:
+        raise ValueError("{} is not a PGM image".format(path))
+    return pixels.reshape(height, width)
+
+
+def read_ros_yaml(path: str) -> dict:
+    """
+    read the flat 'key: value' yaml file of a ROS map_server map, without a yaml dependency
+    :param path: the yaml file
+    :return: its keys, with the map_server defaults for the missing optional ones
+    """
+    meta = dict(ROS_DEFAULTS)
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            key, value = (part.strip() for part in line.split(':', 1))
+            value = value.strip('\'"')
+            if value.startswith('['):
+                value = [float(v) for v in value.strip('[]').split(',')]
+            else:
+                try:
+                    value = float(value) if '.' in value or 'e' in value.lower() else int(value)
+                except ValueError:
+                    pass
+            meta[key] = value
+    for key in ('image', 'resolution', 'origin'):
+        if key not in meta:
+            raise ValueError("{} has no '{}'".format(path, key))
+    return meta
+
+
+def ros_values(pixels: np.ndarray, negate: int, occupied_thresh: float, free_thresh: float, mode: str,
+               unknown: int = UNOCCUPIED) -> np.ndarray:
+    """
+    turn map_server image pixels into the cells of a map, as map_server does: a pixel is
+    occupied with probability (255 - p) / 255, or p / 255 if negate is set
+    :param pixels: (height, width) image, row 0 at the top
+    :param negate: swap black and white
+    :param occupied_thresh: cells more likely occupied are OBSTACLE
+    :param free_thresh: cells less likely occupied are UNOCCUPIED
+    :param mode: 'trinary' makes the cells between both thresholds unknown, 'scale' scales them
+                 to the values 1 to 254 of a cost map, 'raw' keeps the pixel values
+    :param unknown: value of unknown cells, default UNOCCUPIED: D* Lite assumes unknown space is free
+    :return: (x_dim, y_dim) cells, x along the image columns and y upwards along the image rows
+             as in the map frame of ROS
+    """
+    if mode == 'raw':
+        values = pixels.astype(np.uint8)
+    else:
+        occupancy = (pixels.astype(float) if negate else 255.0 - pixels) / 255.0
+        values = np.full(pixels.shape, unknown, dtype=np.uint8)
+        if mode == 'scale':
+            between = (free_thresh <= occupancy) & (occupancy <= occupied_thresh)
+            ramp = (occupancy - free_thresh) / (occupied_thresh - free_thresh)
+            values[between] = np.clip(np.round(1 + 253 * ramp[between]), 1, 254)
+        elif mode != 'trinary':
+            raise ValueError("unknown map_server mode '{}'".format(mode))
+        values[occupancy > occupied_thresh] = OBSTACLE
+        values[occupancy < free_thresh] = UNOCCUPIED
+    return values[::-1].T
+
+
+def load_ros_map(path: str, cost_table: np.ndarray = None, unknown: int = UNOCCUPIED) -> Tuple[OccupancyGridMap, dict]:
+    """
+    :param path: yaml file of a ROS map_server map, its image has to be a PGM
+    :param cost_table: cost factor of every cell value, see OccupancyGridMap. 'scale' maps
+                       should use a cost map table, e.g. linear_cost_table()
+    :param unknown: value of unknown cells, see ros_values
+    :return: the map and the yaml keys: cell (x, y) has its lower left corner at
+             origin + (x, y) * resolution in the ROS map frame
+    """
+    meta = read_ros_yaml(path)
+    image = os.path.join(os.path.dirname(path), meta['image'])
+    if os.path.splitext(image)[1] != '.pgm':
+        raise ValueError("{}: only PGM images are supported, got {}".format(path, meta['image']))
+    grid = ros_values(read_pgm(image), negate=meta['negate'], occupied_thresh=meta['occupied_thresh'],
+                      free_thresh=meta['free_thresh'], mode=meta['mode'], unknown=unknown)
+    return _make_map(np.ascontiguousarray(grid), cost_table), meta
@@ -0,0 +1,148 @@
+"""
+path extraction for a controller. PathExtractor caches the path that the g values of a planner
+describe. after a replan it keeps the part of the cached path before the first vertex next to a
+vertex whose g value or edge costs changed, and only extracts the rest again. optionally the
+path is smoothed into any-angle waypoints by line of sight over the sensed map, so that the
+controller receives fewer, longer segments
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from grid import OccupancyGridMap
+
+# a vertex, itself included, and its 8 neighbors
+NEIGHBORHOOD = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def supercover(p: (int, int), q: (int, int)) -> List[Tuple[int, int]]:
+    """
+    the cells the straight segment between the cell centers of p and q passes, traversed as in
+    Amanatides and Woo. the crossings of the cell borders are compared in integers, so that the
+    traversal is exact. where the segment passes exactly through a corner, the two cells that only
+    touch the segment at the corner are included as well
+    :param p: from cell
+    :param q: to cell
+    :return: the cells from p to q
+    """
+    (x, y) = p
+    (dx, dy) = (abs(q[0] - p[0]), abs(q[1] - p[1]))
+    (sx, sy) = (1 if q[0] > p[0] else -1, 1 if q[1] > p[1] else -1)
+    cells = [p]
+    # the segment crosses the (i + 1)th x border at t = (2i + 1) / 2dx, the jth y border at (2j + 1) / 2dy
+    (i, j) = (0, 0)
+    while (x, y) != q:
+        x_border = (2 * i + 1) * dy
+        y_border = (2 * j + 1) * dx
+        if x_border < y_border:
+            x += sx
+            i += 1
+        elif x_border > y_border:
+            y += sy
+            j += 1
+        else:
+            cells.append((x + sx, y))
+            cells.append((x, y + sy))
+            (x, y) = (x + sx, y + sy)
+            (i, j) = (i + 1, j + 1)
+        cells.append((x, y))
+    return cells
+
+
+def line_of_sight(map: OccupancyGridMap, p: (int, int), q: (int, int), max_factor: float = 1.0) -> bool:
+    """
+    :param map: the map to check
+    :param p: from cell
+    :param q: to cell
+    :param max_factor: highest cost factor a cell on the segment may have
+    :return: True if every cell the straight segment between the cell centers of p and q passes
+             has a cost factor of at most max_factor, see supercover
+    """
+    (xs, ys) = zip(*supercover(p, q))
+    return bool(np.all(map.cost_table[map.occupancy_at(np.array(xs), np.array(ys))] <= max_factor))
+
+
+def smooth_path(map: OccupancyGridMap, path: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    shorten the path greedily: from every waypoint, go straight to the farthest following path
+    vertex in line of sight. on cost maps a shortcut may not pass cells that are more expensive
+    than the most expensive cell of the path section it replaces
+    :param map: the map the path was planned on
+    :param path: vertices of a path
+    :return: the waypoints, starting and ending with those of the path
+    """
+    if len(path) < 3:
+        return list(path)
+    cells = np.array(path)
+    factors = map.cost_table[map.occupancy_at(cells[:, 0], cells[:, 1])]
+    waypoints = [path[0]]
+    anchor = 0
+    for i in range(1, len(path) - 1):
+        if not line_of_sight(map, path[anchor], path[i + 1], max_factor=factors[anchor:i + 2].max()):
+            waypoints.append(path[i])
+            anchor = i
+    waypoints.append(path[-1])
+    return waypoints
+
+
+class PathExtractor:
+    def __init__(self, planner, smooth: bool = False):
+        """
+        :param planner: DStarLite or FlatDStarLite, its changed vertices are recorded from now on
+        :param smooth: let waypoints() smooth the path by line of sight
+        """
+        self.planner = planner
+        self.smooth = smooth
+        planner.changed_vertices = set()
+        self._to_pos = getattr(planner, 'to_pos', None)  # FlatDStarLite works with vertex indices
+        self._path = []
+        self._waypoints = None
+        self.extracted = 0  # vertices extracted from the g values so far
+
+    def _position(self, u) -> (int, int):
+        return u if self._to_pos is None else self._to_pos(u)
+
+    def path(self) -> List[Tuple[int, int]]:
+        """
+        :return: the current path from the robot position to the goal
+        """
+        planner = self.planner
+        if not planner.planned:
+            planner.replan()
+        dirty = {self._position(u) for u in planner.changed_vertices}
+        planner.changed_vertices.clear()
+        position = self._position(planner.s_start)
+
+        path = self._path
+        if position in path:
+            # the robot followed the path, the vertices behind it are dropped
+            path = path[path.index(position):]
+        else:
+            path = []
+        # the successor chosen at a vertex only depends on the g values and edge costs of the
+        # vertex and its neighbors
+        valid = len(path)
+        if dirty:
+            for i, (x, y) in enumerate(path):
+                if any((x + dx, y + dy) in dirty for dx, dy in NEIGHBORHOOD):
+                    valid = i
+                    break
+        if valid < len(path) or not path:
+            suffix = list(planner.current_path(start=path[valid] if valid else None))
+            self.extracted += len(suffix)
+            path = path[:valid] + suffix
+        if path != self._path or dirty:
+            self._waypoints = None  # a changed cell may also block a shortcut
+        self._path = path
+        return list(path)
+
+    def waypoints(self) -> List[Tuple[int, int]]:
+        """
+        :return: the current path, smoothed by line of sight if the extractor smooths
+        """
+        path = self.path()
+        if not self.smooth:
+            return path
+        if self._waypoints is None:
+            self._waypoints = smooth_path(self.planner.sensed_map, path)
+        return list(self._waypoints)
@@ -1,114 +1,89 @@
-class Priority:
-    """
-    handle lexicographic order of keys
-    """
+import heapq
 
-    def __init__(self, k1, k2):
-        """
-        :param k1: key value
-        :param k2: key value
-        """
-        self.k1 = k1
-        self.k2 = k2
 
-    def __lt__(self, other):
-        """
-        lexicographic 'lower than'
-        :param other: comparable keys
-        :return: lexicographic order
-        """
-        return self.k1 < other.k1 or (self.k1 == other.k1 and self.k2 < other.k2)
+# keys are (k1, k2) tuples and heap nodes (key, vertex) tuples. tuples are compared natively in
+# lexicographic order, so ties on both keys are broken on the vertex and the expansion order does
+# not depend on the history of the heap. a key or a node is a single allocation
 
-    def __le__(self, other):
-        """
-        lexicographic 'lower than or equal'
-        :param other: comparable keys
-        :return: lexicographic order
-        """
-        return self.k1 < other.k1 or (self.k1 == other.k1 and self.k2 <= other.k2)
+# top_key of an empty queue
+INFINITE = (float('inf'), float('inf'))
 
 
-class PriorityNode:
+class PriorityQueue:
     """
-    handle lexicographic order of vertices
+    indexed binary min-heap. every vertex in the heap is mapped to its position,
+    which gives O(1) membership tests and O(log n) update/remove
     """
 
-    def __init__(self, priority, vertex):
-        """
-        :param priority: the priority of a
-        :param vertex:
-        """
-        self.priority = priority
-        self.vertex = vertex
-
-    def __le__(self, other):
-        """
-        :param other: comparable node
-        :return: lexicographic order
-        """
-        return self.priority <= other.priority
-
-    def __lt__(self, other):
-        """
-        :param other: comparable node
-        :return: lexicographic order
-        """
-        return self.priority < other.priority
-
-
-class PriorityQueue:
     def __init__(self):
         self.heap = []
-        self.vertices_in_heap = []
+        self.vertices_in_heap = {}  # vertex -> position in self.heap
+
+    def __contains__(self, vertex):
+        return vertex in self.vertices_in_heap
+
+    def __len__(self):
+        return len(self.heap)
 
     def top(self):
-        return self.heap[0].vertex
+        return self.heap[0][1]
 
     def top_key(self):
-        if len(self.heap) == 0: return Priority(float('inf'), float('inf'))
-        return self.heap[0].priority
+        if len(self.heap) == 0: return INFINITE
+        return self.heap[0][0]
 
     def pop(self):
         """!!!THIS CODE WAS COPIED AND MODIFIED!!! Source: Lib/heapq.py"""
         """Pop the smallest item off the heap, maintaining the heap invariant."""
         lastelt = self.heap.pop()  # raises appropriate IndexError if heap is empty
-        self.vertices_in_heap.remove(lastelt)
         if self.heap:
             returnitem = self.heap[0]
             self.heap[0] = lastelt
+            self.vertices_in_heap[lastelt[1]] = 0
             self._siftup(0)
         else:
             returnitem = lastelt
+        del self.vertices_in_heap[returnitem[1]]
         return returnitem
 
     def insert(self, vertex, priority):
-        item = PriorityNode(priority, vertex)
-        self.vertices_in_heap.append(vertex)
+        item = (priority, vertex)
         """!!!THIS CODE WAS COPIED AND MODIFIED!!! Source: Lib/heapq.py"""
         """Push item onto heap, maintaining the heap invariant."""
         self.heap.append(item)
+        self.vertices_in_heap[vertex] = len(self.heap) - 1
         self._siftdown(0, len(self.heap) - 1)
 
     def remove(self, vertex):
-        self.vertices_in_heap.remove(vertex)
-        for index, priority_node in enumerate(self.heap):
-            if priority_node.vertex == vertex:
-                self.heap[index] = self.heap[len(self.heap) - 1]
-                self.heap.remove(self.heap[len(self.heap) - 1])
-                break
-        self.build_heap()
+        pos = self.vertices_in_heap.pop(vertex)
+        lastelt = self.heap.pop()
+        if pos < len(self.heap):
+            # move the last leaf into the hole and restore the invariant from there
+            self.heap[pos] = lastelt
+            self.vertices_in_heap[lastelt[1]] = pos
+            self._restore(pos)
 
     def update(self, vertex, priority):
-        for index, priority_node in enumerate(self.heap):
-            if priority_node.vertex == vertex:
-                self.heap[index].priority = priority
-                break
-        self.build_heap()
+        pos = self.vertices_in_heap[vertex]
+        self.heap[pos] = (priority, vertex)
+        self._restore(pos)
+
+    def _restore(self, pos):
+        """
+        move the node at pos up or down until the heap invariant holds again
+        :param pos: position of a node whose priority might be out of order
+        """
+        if pos > 0 and self.heap[pos] < self.heap[(pos - 1) >> 1]:
+            self._siftdown(0, pos)
+        else:
+            self._siftup(pos)
 
     # !!!THIS FUNCTION WAS COPIED AND MODIFIED!!! Source: Lib/heapq.py
     def build_heap(self):
         """Transform list into a heap, in-place, in O(len(x)) time."""
         n = len(self.heap)
+        for index, priority_node in enumerate(self.heap):
+            self.vertices_in_heap[priority_node[1]] = index
         # Transform bottom-up.  The largest index there's any point to looking at
         # is the largest with a child index in-range, so must have 2*i + 1 < n,
         # or i < (n-1)/2.  If n is even = 2*j, this is (2*j-1)/2 = j-1/2 so
@@ -122,35 +97,97 @@ class PriorityQueue:
     # is the index of a leaf with a possibly out-of-order value.  Restore the
     # heap invariant.
     def _siftdown(self, startpos, pos):
-        newitem = self.heap[pos]
+        heap = self.heap
+        positions = self.vertices_in_heap
+        newitem = heap[pos]
         # Follow the path to the root, moving parents down until finding a place
         # newitem fits.
         while pos > startpos:
             parentpos = (pos - 1) >> 1
-            parent = self.heap[parentpos]
+            parent = heap[parentpos]
             if newitem < parent:
-                self.heap[pos] = parent
+                heap[pos] = parent
+                positions[parent[1]] = pos
                 pos = parentpos
                 continue
             break
-        self.heap[pos] = newitem
+        heap[pos] = newitem
+        positions[newitem[1]] = pos
 
     def _siftup(self, pos):
-        endpos = len(self.heap)
+        heap = self.heap
+        positions = self.vertices_in_heap
+        endpos = len(heap)
         startpos = pos
-        newitem = self.heap[pos]
+        newitem = heap[pos]
         # Bubble up the smaller child until hitting a leaf.
         childpos = 2 * pos + 1  # leftmost child position
         while childpos < endpos:
             # Set childpos to index of smaller child.
             rightpos = childpos + 1
-            if rightpos < endpos and not self.heap[childpos] < self.heap[rightpos]:
+            if rightpos < endpos and not heap[childpos] < heap[rightpos]:
                 childpos = rightpos
             # Move the smaller child up.
-            self.heap[pos] = self.heap[childpos]
+            heap[pos] = heap[childpos]
+            positions[heap[pos][1]] = pos
             pos = childpos
             childpos = 2 * pos + 1
         # The leaf at pos is empty now.  Put newitem there, and bubble it up
         # to its final resting place (by sifting its parents down).
-        self.heap[pos] = newitem
+        heap[pos] = newitem
+        positions[newitem[1]] = pos
         self._siftdown(startpos, pos)
+
+
+class LazyPriorityQueue:
+    """
+    binary min-heap with lazy deletion. remove() only drops the vertex from the index, which
+    leaves its heap node stale, and update() re-inserts the vertex. stale nodes are discarded
+    once they reach the top, and the heap is rebuilt from the live nodes once the stale ones
+    outnumber them, so that it stays at most about twice the size of the queue
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.vertices_in_heap = {}  # vertex -> its live node in self.heap
+
+    def __contains__(self, vertex):
+        return vertex in self.vertices_in_heap
+
+    def __len__(self):
+        return len(self.vertices_in_heap)
+
+    def _discard_removed(self):
+        heap = self.heap
+        while heap and self.vertices_in_heap.get(heap[0][1]) is not heap[0]:
+            heapq.heappop(heap)
+
+    def top(self):
+        self._discard_removed()
+        return self.heap[0][1]
+
+    def top_key(self):
+        self._discard_removed()
+        if len(self.heap) == 0: return INFINITE
+        return self.heap[0][0]
+
+    def pop(self):
+        self._discard_removed()
+        item = heapq.heappop(self.heap)  # raises appropriate IndexError if heap is empty
+        del self.vertices_in_heap[item[1]]
+        return item
+
+    def insert(self, vertex, priority):
+        item = (priority, vertex)
+        self.vertices_in_heap[vertex] = item
+        heapq.heappush(self.heap, item)
+
+    def remove(self, vertex):
+        del self.vertices_in_heap[vertex]
+        if len(self.heap) > 2 * len(self.vertices_in_heap):
+            self.heap = list(self.vertices_in_heap.values())
+            heapq.heapify(self.heap)
+
+    def update(self, vertex, priority):
+        self.remove(vertex)
+        self.insert(vertex, priority)
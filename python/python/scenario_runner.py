@@ -0,0 +1,200 @@
+"""
+replay many (map, start, goal, change script) scenarios, e.g. to validate a release, over a pool
+of worker processes. every map is placed in shared memory once and the workers attach to it when
+they start, so a scenario only ships its start, goal and script to the worker. the results are
+appended to a JSON lines file as the scenarios finish, in the order they finish, with the id of
+the scenario. every scenario is driven as in benchmark.run_case
+
+a scenario file has one JSON object per line:
+
+    {"map": "floor.npy", "start": [1, 1], "goal": [98, 98], "script": [[10, 3, 0, 2, 255]],
+     "planner": "dstar", "view_range": 5, "options": {"epsilon": 1.5}}
+
+"map" is any file load_map reads, the script is a change script as made by benchmark.make_case.
+without a scenario file the scenarios are generated like the benchmark suite
+
+usage: python scenario_runner.py [scenarios.jsonl] [--output results.jsonl] [--processes 4]
+                                 [--sizes 100] [--generators maze random rooms] [--densities 0.2]
+                                 [--change-rates 0.05] [--planners dstar flat] [--seeds 0 1 2 3]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from benchmark import make_case, run_case, GENERATORS, PLANNERS
+from map_io import load_map
+
+# worker state, set by _attach: map key -> (grid in shared memory, cost table)
+_MAPS = {}
+_SEGMENTS = []
+
+
+def load_scenarios(path: str) -> Tuple[List[dict], Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    :param path: JSON lines scenario file, map paths are relative to it
+    :return: (scenarios, maps): the scenarios refer to their map by its key in maps, which holds
+             the grid and cost table of every map file once
+    """
+    scenarios, maps = [], {}
+    directory = os.path.dirname(path)
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            scenario = json.loads(line)
+            key = os.path.join(directory, scenario['map'])
+            if key not in maps:
+                world = load_map(key)
+                maps[key] = (np.ascontiguousarray(world.get_map()), world.cost_table)
+            scenario['map'] = key
+            scenarios.append(scenario)
+    return scenarios, maps
+
+
+def make_scenarios(sizes, generators, densities, change_rates, planners, seeds,
+                   view_range: int = 5) -> Tuple[List[dict], Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    :return: (scenarios, maps) of every combination of the parameters, see benchmark.run_suite
+    """
+    scenarios, maps = [], {}
+    for size in sizes:
+        for generator in generators:
+            for density in densities:
+                for change_rate in change_rates:
+                    for seed in seeds:
+                        case = make_case(generator, size, density, change_rate, seed, view_range)
+                        # the change rate only changes the script, the map is the same
+                        key = '{}-{}-{}-{}'.format(generator, size, density, seed)
+                        maps.setdefault(key, (case['grid'], None))
+                        for planner in planners:
+                            scenarios.append({'map': key, 'start': case['start'], 'goal': case['goal'],
+                                              'script': case['script'], 'planner': planner,
+                                              'view_range': view_range, 'change_rate': change_rate})
+    return scenarios, maps
+
+
+def _attach(specs: dict):
+    """
+    pool initializer: attach the maps in shared memory
+    :param specs: map key -> (shared memory name, shape, cost table)
+    """
+    from multiprocessing import shared_memory  # python >= 3.8
+
+    for key, (name, shape, cost_table) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _SEGMENTS.append(shm)
+        _MAPS[key] = (np.ndarray(shape, dtype=np.uint8, buffer=shm.buf), cost_table)
+
+
+def _run(task: Tuple[int, dict]) -> dict:
+    """
+    :return: the result line of one scenario
+    """
+    (index, scenario) = task
+    (grid, cost_table) = _MAPS[scenario['map']]
+    # run_case drives on a copy of the grid, the shared one stays as it is
+    case = {'grid': grid, 'start': tuple(scenario['start']), 'goal': tuple(scenario['goal']),
+            'script': [tuple(event) for event in scenario.get('script', [])]}
+    t = time.perf_counter()
+    metrics = run_case(case, scenario.get('planner', 'dstar'), scenario.get('view_range', 5),
+                       cost_table=cost_table, options=scenario.get('options'))
+    result = {key: value for key, value in scenario.items() if key != 'script'}
+    result.update(id=index,
+                  status=metrics['status'],
+                  steps=metrics['steps'],
+                  path_cost=metrics['path_cost'],
+                  expansions=metrics['expansions'],
+                  planning_time=metrics['planning_time'],
+                  wall_time=time.perf_counter() - t,
+                  worker=os.getpid())
+    return result
+
+
+def run_scenarios(scenarios: List[dict], maps: Dict[str, Tuple[np.ndarray, np.ndarray]], output: str,
+                  processes: int = None, log=sys.stderr) -> dict:
+    """
+    :param scenarios: scenarios referring to their map by key, see load_scenarios
+    :param maps: map key -> (grid, cost table)
+    :param output: JSON lines file the results are appended to as they finish
+    :param processes: size of the worker pool, default one per core. 0 runs in this process, as
+                      does any number on python < 3.8, which has no multiprocessing.shared_memory
+    :param log: print progress to this file, None for quiet
+    :return: summary: number of scenarios per status and the wall time
+    """
+    # the largest maps first, so that no long scenario is left running alone at the end
+    order = sorted(range(len(scenarios)), key=lambda i: -maps[scenarios[i]['map']][0].size)
+    tasks = [(i, scenarios[i]) for i in order]
+    counts = {}
+    t = time.perf_counter()
+    (pool, segments) = (None, [])
+    try:
+        from multiprocessing import shared_memory  # python >= 3.8
+    except ImportError:
+        processes = 0
+    try:
+        if processes == 0:
+            _MAPS.update(maps)
+            results = map(_run, tasks)
+        else:
+            specs = {}
+            for key, (grid, cost_table) in maps.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(grid.nbytes, 1))
+                segments.append(shm)
+                np.ndarray(grid.shape, dtype=np.uint8, buffer=shm.buf)[...] = grid
+                specs[key] = (shm.name, grid.shape, cost_table)
+            pool = multiprocessing.Pool(processes, initializer=_attach, initargs=(specs,))
+            results = pool.imap_unordered(_run, tasks)
+        with open(output, 'a') as f:
+            for done, result in enumerate(results, 1):
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                if log:
+                    print("{}/{} scenario {} {} in {:.2f} s".format(done, len(tasks), result['id'], result['status'],
+                                                                   result['wall_time']), file=log)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+        if processes == 0:
+            _MAPS.clear()
+    return {'scenarios': len(tasks), 'status': counts, 'wall_time': time.perf_counter() - t}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='?', default=None, help='JSON lines scenario file')
+    parser.add_argument('--output', default='results.jsonl', help='JSON lines file the results are appended to')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100])
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--change-rates', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--planners', nargs='+', choices=sorted(PLANNERS), default=sorted(PLANNERS))
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2, 3])
+    parser.add_argument('--view-range', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        scenarios, maps = load_scenarios(args.scenarios)
+    else:
+        scenarios, maps = make_scenarios(args.sizes, args.generators, args.densities, args.change_rates,
+                                         args.planners, args.seeds, view_range=args.view_range)
+    summary = run_scenarios(scenarios, maps, args.output, processes=args.processes)
+    print("{} scenarios in {:.1f} s: {}".format(summary['scenarios'], summary['wall_time'],
+                                                ', '.join('{} {}'.format(n, status)
+                                                          for status, n in sorted(summary['status'].items()))))
+    return summary
+
+
+if __name__ == '__main__':
+    main()
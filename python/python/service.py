@@ -0,0 +1,331 @@
+"""
+a local planning service that many robot controllers query concurrently. the service owns one
+planner and one sensed map per robot. controllers send their position and what they observe
+around it, and get the next cell to drive to back. observations that arrive while the planner
+of a robot is replanning are queued and applied together in one batched replan, whose result
+answers all of them. the planning runs in an executor, so the event loop keeps accepting
+requests while the planners compute
+
+the protocol is one JSON object per line in both directions. a request may carry an "id" that
+is echoed in its reply, so a controller can send several requests without waiting:
+
+    {"op": "open", "robot": "r1", "start": [1, 1], "goal": [98, 98]}
+    {"op": "update", "robot": "r1", "position": [4, 3], "origin": [0, 0], "window": [[0, 255, ...], ...]}
+    {"op": "close", "robot": "r1"}
+    {"op": "stats"}
+
+open and update reply {"next": [x, y], "batch": n} with the number of updates the replan
+answered, or {"next": null, "error": "no path"}. the window of an update holds the observed cell
+values (0 to 255) with its first cell at origin inside the map, e.g. OccupancyGridMap.local_window
+of a sensor. a request that can not be served is answered with {"error": "..."}
+
+usage: python service.py [--size 100 100] [--host 127.0.0.1] [--port 8765] [--unix path]
+                         [--planner dstar] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap
+from utils import EdgeChanges, NoPathError
+
+PLANNERS = {
+    'dstar': DStarLite,
+    'flat': FlatDStarLite,
+}
+
+
+class RobotSession:
+    def __init__(self, planner, sensed_map: OccupancyGridMap):
+        self.planner = planner
+        self.sensed_map = sensed_map
+        self.pending = []  # (position, origin, window) of the updates not planned for yet
+        self.waiters = []  # futures of the requests of the pending updates
+        self.replanning = False
+        self.closed = False
+        self.updates = 0
+        self.replans = 0
+
+
+def replan(session: RobotSession, batch: list) -> list:
+    """
+    apply a batch of updates to the sensed map of a robot and replan once for all of them. runs
+    in the executor, only ever one at a time per session. an update that can not be observed is
+    answered with an error on its own, the others are planned for
+    :param batch: (position, origin, window) of every update, in the order they arrived
+    :return: the reply to every update of the batch, in the same order
+    """
+    replies = [None] * len(batch)
+    changes = []
+    position = None
+    try:
+        for i, (update_position, origin, window) in enumerate(batch):
+            try:
+                if window is not None:
+                    changes.append(session.sensed_map.observe(origin, window))
+                position = update_position
+            except (ValueError, IndexError) as e:
+                replies[i] = {'error': "bad request: {}".format(e)}
+    finally:
+        # every window written into the sensed map has to reach the planner, even if the batch
+        # failed halfway, or its g and rhs no longer match its map
+        changes = EdgeChanges.concatenate(changes) if changes else None
+        try:
+            session.planner.apply_changes(changes=changes, robot_position=position)
+            step = {'next': list(session.planner.next_step())}
+        except NoPathError:
+            step = {'next': None, 'error': 'no path'}
+    planned = sum(reply is None for reply in replies)
+    return [dict(step, batch=planned) if reply is None else reply for reply in replies]
+
+
+class PlanningService:
+    def __init__(self, map: OccupancyGridMap, planner: str = 'dstar', executor: Executor = None, **options):
+        """
+        :param map: what is known of the floor before the robots observe it, copied into the
+                    sensed map of every robot. unknown cells are free
+        :param planner: one of PLANNERS
+        :param executor: runs the replans, default a thread pool with one thread per core. the
+                         planners hold the GIL while they search, the pool mainly keeps the
+                         event loop responsive
+        :param options: further arguments of the planner, e.g. epsilon
+        """
+        self.map = map
+        self.planner = PLANNERS[planner]
+        self.options = options
+        self.executor = executor or ThreadPoolExecutor(max_workers=os.cpu_count())
+        self.sessions = {}
+        self.updates = 0
+        self.replans = 0
+
+    async def handle(self, message: dict) -> dict:
+        """
+        :param message: one request, see the module docstring
+        :return: its reply
+        """
+        op = message.get('op')
+        robot = message.get('robot')
+        if op == 'stats':
+            return {'robots': len(self.sessions), 'updates': self.updates, 'replans': self.replans}
+        if op == 'open':
+            for name in ('start', 'goal'):
+                if not self.map.in_bounds(tuple(message[name])):
+                    return {'error': "bad request: {} {} is outside of the map".format(name, message[name])}
+            sensed_map = self.map.empty_like()
+            sensed_map.set_map(np.array(self.map.get_map(), dtype=np.uint8))
+            start = tuple(message['start'])
+            planner = self.planner(map=sensed_map, s_start=start, s_goal=tuple(message['goal']),
+                                   sensed_map=sensed_map, **self.options)
+            self.sessions[robot] = RobotSession(planner, sensed_map)
+            return await self.update(robot, start)
+        if robot not in self.sessions:
+            return {'error': "unknown robot {!r}".format(robot)}
+        if op == 'update':
+            # checked here, so that a bad update is answered on its own and never joins a batch
+            (position, origin) = (tuple(message['position']), tuple(message.get('origin', (0, 0))))
+            if not self.map.in_bounds(position):
+                return {'error': "bad request: position {} is outside of the map".format(list(position))}
+            window = message.get('window')
+            if window is not None:
+                if not self.map.in_bounds(origin):
+                    return {'error': "bad request: origin {} is outside of the map".format(list(origin))}
+                window = np.array(window)
+                if window.ndim != 2 or not np.issubdtype(window.dtype, np.integer) or \
+                        (window.size and (window.min() < 0 or window.max() > 255)):
+                    return {'error': "bad request: the window has to be rows of cell values 0 to 255"}
+                window = window.astype(np.uint8)
+            return await self.update(robot, position, origin, window)
+        if op == 'close':
+            self.sessions.pop(robot).closed = True
+            return {}
+        return {'error': "unknown op {!r}".format(op)}
+
+    async def update(self, robot, position: (int, int), origin: (int, int) = None, window: np.ndarray = None) -> dict:
+        """
+        queue an update of a robot and wait for the replan that includes it
+        :return: the reply of that replan
+        """
+        session = self.sessions[robot]
+        future = asyncio.get_event_loop().create_future()
+        session.pending.append((position, origin, window))
+        session.waiters.append(future)
+        session.updates += 1
+        self.updates += 1
+        if not session.replanning:
+            self._replan(session)
+        return await future
+
+    def _replan(self, session: RobotSession):
+        """
+        start one replan for all pending updates of a session
+        """
+        (batch, waiters) = (session.pending, session.waiters)
+        (session.pending, session.waiters) = ([], [])
+        session.replanning = True
+        session.replans += 1
+        self.replans += 1
+        job = asyncio.get_event_loop().run_in_executor(self.executor, replan, session, batch)
+        job.add_done_callback(partial(self._replanned, session, waiters))
+
+    def _replanned(self, session: RobotSession, waiters: list, job: asyncio.Future):
+        session.replanning = False
+        replies = [None] * len(waiters) if job.exception() is not None else job.result()
+        for future, reply in zip(waiters, replies):
+            if future.cancelled():
+                continue
+            if job.exception() is not None:
+                future.set_exception(job.exception())
+            else:
+                future.set_result(reply)
+        # everything that arrived meanwhile is answered by one more replan
+        if session.pending and not session.closed:
+            self._replan(session)
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        serve one controller. every request is handled in its own task, so that the requests
+        of a controller that does not wait for its replies are coalesced as well
+        """
+        tasks = set()
+
+        async def respond(message: dict):
+            try:
+                reply = await self.handle(message)
+            except (KeyError, TypeError, ValueError, IndexError, OverflowError) as e:
+                reply = {'error': "bad request: {}".format(e)}
+            except Exception as e:  # every request gets a reply
+                reply = {'error': "failed: {!r}".format(e)}
+            if 'id' in message:
+                reply['id'] = message['id']
+            writer.write((json.dumps(reply) + '\n').encode())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    writer.write(b'{"error": "bad request: not JSON"}\n')
+                    continue
+                task = asyncio.ensure_future(respond(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, unix: str = None) -> asyncio.AbstractServer:
+        """
+        :param host: interface to listen on, local only by default
+        :param port: TCP port, 0 picks a free one
+        :param unix: listen on this unix socket instead of TCP
+        :return: the started server
+        """
+        if unix is not None:
+            return await asyncio.start_unix_server(self._connection, path=unix)
+        return await asyncio.start_server(self._connection, host=host, port=port)
+
+
+class PlanningClient:
+    """
+    connection of a controller to a PlanningService. requests can be sent concurrently, the
+    replies are matched to them by id
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.waiting = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 8765, unix: str = None) -> 'PlanningClient':
+        if unix is not None:
+            return cls(*await asyncio.open_unix_connection(path=unix))
+        return cls(*await asyncio.open_connection(host=host, port=port))
+
+    async def request(self, **message) -> dict:
+        """
+        :param message: the request, see the module docstring
+        :return: its reply
+        """
+        self.next_id += 1
+        message['id'] = self.next_id
+        future = asyncio.get_event_loop().create_future()
+        self.waiting[self.next_id] = future
+        self.writer.write((json.dumps(message) + '\n').encode())
+        await self.writer.drain()
+        return await future
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.waiting.pop(reply.get('id'), None)
+            if future is not None and not future.cancelled():
+                future.set_result(reply)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("the service closed the connection"))
+        self.waiting.clear()
+
+    async def close(self):
+        self.writer.close()
+        await self._receiver
+
+
+def run_until_complete(coroutine):
+    """
+    run a coroutine in a new event loop until it is done, as asyncio.run of python >= 3.7
+    :return: its result
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, nargs=2, default=[100, 100], help='x_dim and y_dim of the floor')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='0 picks a free port')
+    parser.add_argument('--unix', default=None, help='listen on this unix socket instead')
+    parser.add_argument('--planner', choices=sorted(PLANNERS), default='dstar')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='threads running the replans')
+    args = parser.parse_args(argv)
+
+    world = OccupancyGridMap(x_dim=args.size[0], y_dim=args.size[1])
+    service = PlanningService(world, planner=args.planner, executor=ThreadPoolExecutor(max_workers=args.workers))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(service.serve(host=args.host, port=args.port, unix=args.unix))
+    address = args.unix or '{}:{}'.format(*server.sockets[0].getsockname()[:2])
+    print("listening on {}".format(address), flush=True)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+snapshots of the planner state, so that a restarted planner process resumes where it stopped
+instead of planning from scratch. a snapshot holds everything D* Lite carries from one replan to
+the next: g and rhs, the queue with its keys, k_m, s_last, the robot position and the sensed map.
+only the vertices the search reached are written, as numpy arrays in one uncompressed .npz file,
+so that restoring is a few array copies and no search at all
+"""
+import heapq
+
+import numpy as np
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap
+from instrumentation import PlannerStats
+from kernel import ArrayPriorityQueue
+from priority_queue import LazyPriorityQueue
+from utils import SparseValues
+
+FORMAT_VERSION = 1
+
+
+def _finite(values: np.ndarray):
+    """
+    :return: (indices, values) of the finite entries of a flat array
+    """
+    index = np.flatnonzero(np.isfinite(values))
+    return index, values[index]
+
+
+def save_snapshot(planner, path: str, include_map: bool = True):
+    """
+    :param planner: DStarLite or FlatDStarLite
+    :param path: .npz file to write
+    :param include_map: also write the sensed map. leave it out if the sensed map is persisted
+                        on its own, e.g. as memory mapped file of a fleet, and pass it to load_snapshot
+    """
+    arrays = {'version': np.array(FORMAT_VERSION), 'k_m': np.array(planner.k_m, dtype=float),
+              'planned': np.array(planner.planned)}
+    sensed_map = planner.sensed_map
+    if include_map:
+        arrays['sensed_map'] = np.asarray(sensed_map.get_map(), dtype=np.uint8)
+        arrays['cost_table'] = sensed_map.cost_table
+    arrays['shape'] = np.array([sensed_map.x_dim, sensed_map.y_dim])
+
+    if isinstance(planner, FlatDStarLite):
+        arrays['planner'] = np.array('flat')
+        for name in ('s_start', 's_goal', 's_last'):
+            arrays[name] = np.array(planner.to_pos(getattr(planner, name)))
+        for name in ('g', 'rhs'):
+            values = np.fromiter(getattr(planner, name), dtype=float, count=planner.n)
+            arrays[name + '_index'], arrays[name] = _finite(values)
+        # only the live entries of the lazy heap, with the epoch their key was computed in
+        queued = np.flatnonzero(np.fromiter(planner.queued, dtype=np.int64, count=planner.n))
+        arrays['queue'] = queued
+        arrays['queue_k1'] = np.array([planner.k1[u] for u in queued.tolist()], dtype=float)
+        arrays['queue_k2'] = np.array([planner.k2[u] for u in queued.tolist()], dtype=float)
+        arrays['queue_epoch'] = np.array([planner.queued[u] for u in queued.tolist()], dtype=np.int64)
+        arrays['epoch'] = np.array(planner.epoch)
+    elif isinstance(planner, DStarLite):
+        arrays['planner'] = np.array('dstar')
+        for name in ('s_start', 's_goal', 's_last'):
+            arrays[name] = np.array(getattr(planner, name))
+        arrays['state'] = np.array('sparse' if isinstance(planner.g, SparseValues) else 'dense')
+        arrays['epsilon'] = np.array(planner.epsilon)
+        arrays['kernel'] = np.array(planner.kernel)
+        for name in ('g', 'rhs'):
+            values = getattr(planner, name)
+            if isinstance(values, SparseValues):
+                positions = np.array(list(values.keys()), dtype=int).reshape(-1, 2)
+                values = np.array(list(values.values()), dtype=float)
+                keep = np.isfinite(values)
+                arrays[name + '_index'], arrays[name] = positions[keep], values[keep]
+            else:
+                index, values = _finite(values.ravel())
+                arrays[name + '_index'] = np.stack(np.unravel_index(index, planner.g.shape), axis=1)
+                arrays[name] = values
+        # the indexed heaps are written in heap order, so that they are restored without sifting
+        U = planner.U
+        lazy = isinstance(U, LazyPriorityQueue)
+        if isinstance(U, ArrayPriorityQueue):
+            nodes = U.nodes()
+        else:
+            nodes = list(U.vertices_in_heap.values()) if lazy else U.heap
+        arrays['lazy_deletion'] = np.array(lazy)
+        arrays['queue'] = np.array([vertex for key, vertex in nodes], dtype=int).reshape(-1, 2)
+        arrays['queue_k1'] = np.array([key[0] for key, vertex in nodes], dtype=float)
+        arrays['queue_k2'] = np.array([key[1] for key, vertex in nodes], dtype=float)
+    else:
+        raise TypeError("can not snapshot a {}".format(type(planner).__name__))
+    np.savez(path, **arrays)
+
+
+def load_snapshot(path: str, sensed_map: OccupancyGridMap = None, stats: PlannerStats = None):
+    """
+    :param path: .npz file written by save_snapshot
+    :param sensed_map: plan on this map instead of the one in the snapshot, required if the
+                       snapshot was saved without it. it has to be the map the planner saw last
+    :param stats: collect counters and timers of the restored planner in this PlannerStats
+    :return: the restored DStarLite or FlatDStarLite, ready for the next apply_changes
+    """
+    with np.load(path) as data:
+        if int(data['version']) != FORMAT_VERSION:
+            raise ValueError("{} has snapshot format {}, expected {}".format(path, int(data['version']),
+                                                                             FORMAT_VERSION))
+        data = dict(data)
+    if sensed_map is None:
+        if 'sensed_map' not in data:
+            raise ValueError("{} was saved without its sensed map, pass sensed_map".format(path))
+        sensed_map = OccupancyGridMap(x_dim=int(data['shape'][0]), y_dim=int(data['shape'][1]),
+                                      cost_table=data['cost_table'])
+        sensed_map.set_map(data['sensed_map'])
+    elif (sensed_map.x_dim, sensed_map.y_dim) != tuple(data['shape'].tolist()):
+        raise ValueError("the sensed map is {}x{}, the snapshot {}x{}".format(
+            sensed_map.x_dim, sensed_map.y_dim, *data['shape'].tolist()))
+
+    (s_start, s_goal, s_last) = (tuple(data[name].tolist()) for name in ('s_start', 's_goal', 's_last'))
+    if str(data['planner']) == 'flat':
+        planner = FlatDStarLite(map=sensed_map, s_start=s_start, s_goal=s_goal, stats=stats, sensed_map=sensed_map)
+        inf = float('inf')
+        for name in ('g', 'rhs'):
+            values = np.full(planner.n, inf)
+            values[data[name + '_index']] = data[name]
+            setattr(planner, name, values.tolist())
+        (k1, k2, epochs) = ([inf] * planner.n, [inf] * planner.n, [0] * planner.n)
+        for u, key1, key2, epoch in zip(data['queue'].tolist(), data['queue_k1'].tolist(),
+                                        data['queue_k2'].tolist(), data['queue_epoch'].tolist()):
+            (k1[u], k2[u], epochs[u]) = (key1, key2, epoch)
+        (planner.k1, planner.k2, planner.queued) = (k1, k2, epochs)
+        planner.heap = list(zip(data['queue_k1'].tolist(), data['queue_k2'].tolist(), data['queue'].tolist()))
+        heapq.heapify(planner.heap)
+        planner.epoch = int(data['epoch'])
+        planner.s_last = planner.to_index(s_last)
+    else:
+        lazy = bool(data['lazy_deletion'])
+        kernel = bool(data.get('kernel', False))  # not written by older snapshots
+        planner = DStarLite(map=sensed_map, s_start=s_start, s_goal=s_goal, lazy_deletion=lazy, stats=stats,
+                            sensed_map=sensed_map, state=str(data['state']), epsilon=float(data['epsilon']),
+                            kernel=kernel)
+        for name in ('g', 'rhs'):
+            values = getattr(planner, name)
+            index = data[name + '_index']
+            if isinstance(values, SparseValues):
+                values.clear()
+                values.update(zip(map(tuple, index.tolist()), data[name].tolist()))
+            else:
+                values[...] = np.inf
+                values[index[:, 0], index[:, 1]] = data[name]
+        nodes = [((k1, k2), tuple(vertex)) for vertex, k1, k2 in
+                 zip(data['queue'].tolist(), data['queue_k1'].tolist(), data['queue_k2'].tolist())]
+        U = planner.U
+        if kernel:
+            U.remove(s_goal)  # queued by the constructor
+            for key, vertex in nodes:
+                U.insert(vertex, key)
+        elif lazy:
+            heapq.heapify(nodes)
+            (U.heap, U.vertices_in_heap) = (nodes, {node[1]: node for node in nodes})
+        else:
+            (U.heap, U.vertices_in_heap) = (nodes, {node[1]: i for i, node in enumerate(nodes)})
+        planner.s_last = s_last
+    planner.k_m = float(data['k_m'])
+    planner.planned = bool(data['planned'])
+    return planner
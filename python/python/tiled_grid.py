@@ -0,0 +1,227 @@
+import json
+from typing import Tuple
+
+import numpy as np
+
+from grid import OccupancyGridMap
+from utils import heuristic
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+
+class TiledOccupancyGridMap(OccupancyGridMap):
+    """
+    occupancy grid split into square tiles of tile_size x tile_size cells.
+
+    in memory, a tile is only allocated when a cell in it gets a value other than UNOCCUPIED,
+    all other cells read as unoccupied. with a path the tiles live in a tile-major .npy file of shape
+    (x_tiles, y_tiles, tile_size, tile_size) that is memory mapped, so the operating system
+    only keeps the pages of the tiles in use, and a JSON sidecar (path + '.json') with the map
+    dimensions. open() maps an existing file again without reading it.
+
+    the cell methods (is_unoccupied, set_obstacle, succ, local_observation, ...) work as on
+    OccupancyGridMap. occupancy_grid_map and get_map() assemble a dense read-only copy, only
+    meant for small maps (e.g. the gui)
+    """
+
+    def __init__(self, x_dim, y_dim, exploration_setting='8N', tile_size: int = 256, path: str = None,
+                 cost_table=None):
+        """
+        :param x_dim: dimension in the x direction
+        :param y_dim: dimension in the y direction
+        :param exploration_setting: '4N' or '8N' connectivity
+        :param tile_size: side length of a tile in cells
+        :param path: create the map as memory mapped .npy file at this path, None keeps it in memory
+        :param cost_table: cost factor of every cell value, see OccupancyGridMap
+        """
+        self.tile_size = tile_size
+        self.tiles_shape = (-(-x_dim // tile_size), -(-y_dim // tile_size))
+        self._tiles = {}  # (tx, ty) -> (tile_size, tile_size) array
+        self._store = None
+        self.path = path
+        self._initialized = False
+        super().__init__(x_dim=x_dim, y_dim=y_dim, exploration_setting=exploration_setting, cost_table=cost_table)
+        self._initialized = True
+
+        if path is not None:
+            self._store = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                                    shape=self.tiles_shape + (tile_size, tile_size))
+            with open(path + '.json', 'w') as f:
+                json.dump({'x_dim': x_dim, 'y_dim': y_dim, 'tile_size': tile_size,
+                           'exploration_setting': exploration_setting}, f)
+
+    @classmethod
+    def open(cls, path: str, mode: str = 'r+', cost_table=None) -> 'TiledOccupancyGridMap':
+        """
+        map a tiled map file created with path=... without reading it
+        :param path: the .npy file
+        :param mode: 'r+' to write through to the file, 'r' read only, 'c' copy on write
+        :param cost_table: cost factor of every cell value, see OccupancyGridMap
+        :return: the map
+        """
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        grid = cls.__new__(cls)
+        grid.tile_size = meta['tile_size']
+        grid._tiles = {}
+        grid._store = np.load(path, mmap_mode=mode)
+        grid.tiles_shape = grid._store.shape[:2]
+        grid.path = path
+        grid._initialized = False
+        OccupancyGridMap.__init__(grid, x_dim=meta['x_dim'], y_dim=meta['y_dim'],
+                                  exploration_setting=meta['exploration_setting'], cost_table=cost_table)
+        grid._initialized = True
+        return grid
+
+    def flush(self):
+        """
+        write changed tiles of a memory mapped map to its file
+        """
+        if self._store is not None:
+            self._store.flush()
+
+    def empty_like(self) -> 'TiledOccupancyGridMap':
+        return TiledOccupancyGridMap(x_dim=self.x_dim, y_dim=self.y_dim, exploration_setting=self.exploration_setting,
+                                     tile_size=self.tile_size, cost_table=self.cost_table)
+
+    @property
+    def occupancy_grid_map(self) -> np.ndarray:
+        return self.get_map()
+
+    @occupancy_grid_map.setter
+    def occupancy_grid_map(self, value: np.ndarray):
+        # the dense empty map assigned by OccupancyGridMap.__init__ is dropped, tiles read as
+        # unoccupied until they are allocated
+        if self._initialized:
+            self.set_map(value)
+
+    @property
+    def allocated_tiles(self) -> int:
+        """
+        :return: number of tiles held in memory
+        """
+        return len(self._tiles)
+
+    def _tile(self, tx: int, ty: int, create: bool = False) -> np.ndarray:
+        """
+        :return: the tile, None if it is not allocated and create is False
+        """
+        tile = self._tiles.get((tx, ty))
+        if tile is None:
+            if self._store is not None:
+                tile = self._store[tx, ty]
+            elif create:
+                tile = np.zeros((self.tile_size, self.tile_size), dtype=np.uint8)
+            else:
+                return None
+            self._tiles[(tx, ty)] = tile
+        return tile
+
+    def get_map(self) -> np.ndarray:
+        """
+        :return: dense read-only copy of the whole map
+        """
+        grid = np.zeros((self.x_dim, self.y_dim), dtype=np.uint8)
+        t = self.tile_size
+        if self._store is not None:
+            tiles = ((tx, ty) for tx in range(self.tiles_shape[0]) for ty in range(self.tiles_shape[1]))
+        else:
+            tiles = list(self._tiles)
+        for (tx, ty) in tiles:
+            part = grid[tx * t:(tx + 1) * t, ty * t:(ty + 1) * t]
+            part[...] = self._tile(tx, ty)[:part.shape[0], :part.shape[1]]
+        grid.setflags(write=False)
+        return grid
+
+    def set_map(self, new_ogrid: np.ndarray):
+        """
+        :param new_ogrid: dense (x_dim, y_dim) grid to copy into the tiles
+        """
+        self._tiles = {}
+        if self._store is not None:
+            self._store[...] = UNOCCUPIED
+        self.set_window((0, 0), np.asarray(new_ogrid))
+
+    def _value(self, x: int, y: int) -> int:
+        t = self.tile_size
+        tile = self._tile(x // t, y // t)
+        return UNOCCUPIED if tile is None else tile[x % t, y % t]
+
+    def is_unoccupied(self, pos: (int, int)) -> bool:
+        (x, y) = (round(pos[0]), round(pos[1]))  # make sure pos is int
+        return self._traversable[self._value(x, y)]
+
+    def c(self, u: (int, int), v: (int, int)) -> float:
+        cost = self._cost
+        return heuristic(u, v) * (cost[self._value(*u)] + cost[self._value(*v)]) * 0.5
+
+    def set_obstacle(self, pos: (int, int)):
+        (x, y) = (round(pos[0]), round(pos[1]))  # make sure pos is int
+        t = self.tile_size
+        self._tile(x // t, y // t, create=True)[x % t, y % t] = OBSTACLE
+
+    def remove_obstacle(self, pos: (int, int)):
+        (x, y) = (round(pos[0]), round(pos[1]))  # make sure pos is int
+        t = self.tile_size
+        tile = self._tile(x // t, y // t)
+        if tile is not None:
+            tile[x % t, y % t] = UNOCCUPIED
+
+    def occupancy_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        x, y = np.asarray(x), np.asarray(y)
+        t = self.tile_size
+        if self._store is not None:
+            return self._store[x // t, y // t, x % t, y % t]
+        values = np.zeros(x.shape, dtype=np.uint8)
+        tx, ty = x // t, y // t
+        for key in set(zip(tx.ravel().tolist(), ty.ravel().tolist())):
+            tile = self._tiles.get(key)
+            if tile is not None:
+                mask = (tx == key[0]) & (ty == key[1])
+                values[mask] = tile[x[mask] % t, y[mask] % t]
+        return values
+
+    def _window_tiles(self, x_min: int, y_min: int, x_max: int, y_max: int):
+        """
+        :return: iterator over (tx, ty, window slice, tile slice) of the tiles overlapping the window
+        """
+        t = self.tile_size
+        for tx in range(x_min // t, (x_max - 1) // t + 1):
+            for ty in range(y_min // t, (y_max - 1) // t + 1):
+                x0, x1 = max(x_min, tx * t), min(x_max, (tx + 1) * t)
+                y0, y1 = max(y_min, ty * t), min(y_max, (ty + 1) * t)
+                yield (tx, ty,
+                       (slice(x0 - x_min, x1 - x_min), slice(y0 - y_min, y1 - y_min)),
+                       (slice(x0 - tx * t, x1 - tx * t), slice(y0 - ty * t, y1 - ty * t)))
+
+    def local_window(self, global_position: (int, int), view_range: int = 2) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        :return: copy of the cells within view range, clipped to the map, and the (x,y) position
+                 of its first cell. write changes back with set_window
+        """
+        (px, py) = global_position
+        x_min, y_min = max(px - view_range, 0), max(py - view_range, 0)
+        x_max, y_max = min(px + view_range + 1, self.x_dim), min(py + view_range + 1, self.y_dim)
+        return self.window((x_min, y_min), (x_max - x_min, y_max - y_min)), (x_min, y_min)
+
+    def window(self, origin: Tuple[int, int], shape: Tuple[int, int]) -> np.ndarray:
+        """
+        :return: copy of the cells of the window, write changes back with set_window
+        """
+        (x_min, y_min) = origin
+        window = np.zeros(shape, dtype=np.uint8)
+        for tx, ty, in_window, in_tile in self._window_tiles(x_min, y_min, x_min + shape[0], y_min + shape[1]):
+            tile = self._tile(tx, ty)
+            if tile is not None:
+                window[in_window] = tile[in_tile]
+        return window
+
+    def set_window(self, origin: Tuple[int, int], window: np.ndarray):
+        (x_min, y_min) = origin
+        (x_max, y_max) = (x_min + window.shape[0], y_min + window.shape[1])
+        for tx, ty, in_window, in_tile in self._window_tiles(x_min, y_min, x_max, y_max):
+            values = window[in_window]
+            tile = self._tile(tx, ty, create=bool(np.any(values)))
+            if tile is not None:
+                tile[in_tile] = values
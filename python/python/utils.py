@@ -1,8 +1,17 @@
 import math
+import numpy as np
 from typing import List
 
 
+class NoPathError(Exception):
+    """
+    raised by the planners when the robot position has no known path to the goal
+    """
+
+
 class Vertex:
+    __slots__ = ('pos', 'edges_and_costs')
+
     def __init__(self, pos: (int, int)):
         self.pos = pos
         self.edges_and_costs = {}
@@ -17,6 +26,8 @@ class Vertex:
 
 
 class Vertices:
+    __slots__ = ('list',)
+
     def __init__(self):
         self.list = []
 
@@ -27,6 +38,107 @@ class Vertices:
     def vertices(self):
         return self.list
 
+    def edges(self):
+        """
+        :return: iterator over all changed directed edges as (u, v, c_old)
+        """
+        for vertex in self.list:
+            for u, c_old in vertex.edges_and_costs.items():
+                yield u, vertex.pos, c_old
+
+
+class SparseValues(dict):
+    """
+    (x,y) indexed values of the vertices of a map that only stores the vertices that were
+    assigned, all others read as the default. np.asarray(values) gives the dense array
+    """
+
+    def __init__(self, shape: (int, int), default: float = float('inf')):
+        """
+        :param shape: (x_dim, y_dim) of the map
+        :param default: value of the vertices that were never assigned
+        """
+        super().__init__()
+        self.shape = shape
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+    def __array__(self, dtype=None, copy=None):
+        grid = np.full(self.shape, self.default, dtype=dtype or float)
+        if self:
+            index = np.array(list(self.keys()), dtype=int)
+            grid[index[:, 0], index[:, 1]] = list(self.values())
+        return grid
+
+    def copy(self) -> 'SparseValues':
+        values = SparseValues(self.shape, self.default)
+        values.update(self)
+        return values
+
+
+class EdgeChanges:
+    """
+    compact record of the cells that changed in one scan. for every changed cell v it holds
+    the K possible predecessors u and the cost c(u, v) the edge had before the change
+    """
+
+    def __init__(self, cells: np.ndarray, successors: np.ndarray, old_costs: np.ndarray, valid: np.ndarray):
+        """
+        :param cells: (M, 2) changed cell positions
+        :param successors: (M, K, 2) neighbor positions of every changed cell
+        :param old_costs: (M, K) edge costs before the change
+        :param valid: (M, K) False where a neighbor is out of bounds
+        """
+        self.cells = cells
+        self.successors = successors
+        self.old_costs = old_costs
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.cells)
+
+    @staticmethod
+    def concatenate(changes: List['EdgeChanges']) -> 'EdgeChanges':
+        """
+        :param changes: records of consecutive scans of the same map
+        :return: one record with the changes of all scans, in order
+        """
+        return EdgeChanges(cells=np.concatenate([c.cells for c in changes]),
+                           successors=np.concatenate([c.successors for c in changes]),
+                           old_costs=np.concatenate([c.old_costs for c in changes]),
+                           valid=np.concatenate([c.valid for c in changes]))
+
+    def edges(self):
+        """
+        :return: iterator over all changed directed edges as (u, v, c_old)
+        """
+        for v, succ, costs, valid in zip(self.cells.tolist(), self.successors.tolist(),
+                                         self.old_costs.tolist(), self.valid.tolist()):
+            v = tuple(v)
+            for u, c_old, in_bounds in zip(succ, costs, valid):
+                if in_bounds:
+                    yield tuple(u), v, c_old
+
+    def to_vertices(self) -> Vertices:
+        """
+        :return: the same changes as Vertices
+        """
+        vertices = Vertices()
+        for v, succ, costs, valid in zip(self.cells.tolist(), self.successors.tolist(),
+                                         self.old_costs.tolist(), self.valid.tolist()):
+            vertex = Vertex(pos=tuple(v))
+            for u, c_old, in_bounds in zip(succ, costs, valid):
+                if in_bounds:
+                    vertex.add_edge_with_cost(succ=tuple(u), cost=c_old)
+            vertices.add_vertex(vertex)
+        return vertices
+
+    @property
+    def vertices(self):
+        return self.to_vertices().vertices
+
 
 def heuristic(p: (int, int), q: (int, int)) -> float:
     """
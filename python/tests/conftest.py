@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the planner modules import each other as top-level modules (see python/main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+
+from benchmark import GENERATORS  # noqa: E402
+from grid import OccupancyGridMap  # noqa: E402
+
+CORNERS = ((0, 0), (0, -1), (-1, 0), (-1, -1))
+
+
+@pytest.fixture
+def random_world():
+    """
+    factory of seeded maps made by the generators of the benchmark suite
+    """
+
+    def make(size=30, density=0.2, seed=0, generator='random', free=CORNERS, **kwargs) -> OccupancyGridMap:
+        """
+        :param size: edge length of the map, or its (x_dim, y_dim) for the random generator
+        :param free: cells that are kept free, negative coordinates count from the far edges
+        :param kwargs: further arguments of OccupancyGridMap, e.g. cost_table
+        """
+        grid = GENERATORS[generator](size, density, np.random.default_rng(seed))
+        world = OccupancyGridMap(x_dim=grid.shape[0], y_dim=grid.shape[1], **kwargs)
+        world.set_map(grid)
+        for (x, y) in free:
+            world.remove_obstacle((x % world.x_dim, y % world.y_dim))
+        return world
+
+    return make
@@ -0,0 +1,39 @@
+import numpy as np
+
+from benchmark import apply_event, make_case, run_case, GENERATORS
+from grid import OccupancyGridMap
+
+
+def test_cases_are_reproducible():
+    for generator in GENERATORS:
+        a = make_case(generator, size=41, density=0.2, change_rate=0.1, seed=3, view_range=3)
+        b = make_case(generator, size=41, density=0.2, change_rate=0.1, seed=3, view_range=3)
+        assert np.array_equal(a['grid'], b['grid'])
+        assert a['script'] == b['script']
+        assert a['grid'][a['start']] == 0 and a['grid'][a['goal']] == 0
+
+
+def test_run_case_reports_metrics():
+    case = make_case('rooms', size=31, density=0.1, change_rate=0.0, seed=0, view_range=3)
+    metrics = run_case(case, planner='dstar', view_range=3)
+    assert metrics['status'] == 'reached'
+    assert metrics['expansions'] > 0
+    assert metrics['heap_operations'] > 0
+    assert metrics['replans'] == metrics['steps']
+
+
+def test_change_script_is_applied():
+    case = make_case('maze', size=31, density=0.1, change_rate=0.2, seed=0, view_range=3)
+    metrics = run_case(case, planner='dstar', view_range=3)
+    # a scripted block may wall off a maze corridor
+    assert metrics['status'] in ('reached', 'no_path')
+    assert metrics['replans'] > 0
+
+
+def test_event_off_the_map_does_not_wrap():
+    world = OccupancyGridMap(x_dim=50, y_dim=50)
+    apply_event(world, (1, 0), (48, 48), (0, 2, 10, 1, 255))
+    assert np.count_nonzero(world.get_map()) <= 1
+    # a block inside the map is set in full, except the robot cell
+    apply_event(world, (1, 1), (48, 48), (0, 2, 0, 3, 255))
+    assert np.count_nonzero(world.get_map()) == 8
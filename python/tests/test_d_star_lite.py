@@ -0,0 +1,211 @@
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM, linear_cost_table
+from instrumentation import PlannerStats
+from utils import heuristic, NoPathError
+
+
+def walled_world():
+    world = OccupancyGridMap(x_dim=30, y_dim=30)
+    for y in range(3, 30):
+        world.set_obstacle((15, y))
+    return world
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_stepping_reaches_goal(planner_cls):
+    world = walled_world()
+    start, goal = (2, 20), (28, 20)
+    dstar = planner_cls(map=world, s_start=start, s_goal=goal)
+    slam = SLAM(map=world, view_range=4)
+
+    position = start
+    path = [start]
+    while position != goal:
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        planned = dstar.current_path()
+        assert next(planned) == position
+        position = dstar.next_step()
+        assert world.is_unoccupied(position)
+        assert heuristic(path[-1], position) < 1.5
+        path.append(position)
+        assert len(path) < 200
+    assert dstar.next_step() == goal
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_current_path_is_lazy_and_complete(planner_cls):
+    world = OccupancyGridMap(x_dim=20, y_dim=20)
+    dstar = planner_cls(map=world, s_start=(0, 0), s_goal=(19, 19))
+    path = list(dstar.current_path())
+    assert path[0] == (0, 0) and path[-1] == (19, 19)
+    assert len(path) == 20
+
+    # following the path does not replan
+    dstar.next_step()
+    assert list(dstar.current_path()) == path[1:]
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_off_path_robot_position(planner_cls):
+    world = OccupancyGridMap(x_dim=20, y_dim=20)
+    dstar = planner_cls(map=world, s_start=(0, 0), s_goal=(19, 19))
+    dstar.next_step()
+    dstar.apply_changes(changes=None, robot_position=(19, 0))
+    path = list(dstar.current_path())
+    assert path[0] == (19, 0) and path[-1] == (19, 19)
+    assert len(path) == 20
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_missing_path_raises(planner_cls):
+    world = OccupancyGridMap(x_dim=10, y_dim=10)
+    for y in range(10):
+        world.set_obstacle((5, y))
+    dstar = planner_cls(map=world, s_start=(0, 0), s_goal=(9, 9), sensed_map=world)
+    with pytest.raises(NoPathError):
+        dstar.next_step()
+    with pytest.raises(NoPathError):
+        list(dstar.current_path())
+
+
+def test_sparse_state_matches_dense():
+    world = walled_world()
+    start, goal = (2, 20), (28, 20)
+    runs = []
+    for state in ('dense', 'sparse'):
+        dstar = DStarLite(map=world, s_start=start, s_goal=goal, state=state)
+        slam = SLAM(map=world, view_range=4)
+        position = start
+        path = [start]
+        while position != goal:
+            changes, slam_map = slam.rescan(global_position=position)
+            dstar.apply_changes(changes=changes, sensed_map=slam_map)
+            position = dstar.next_step()
+            path.append(position)
+        runs.append((path, np.asarray(dstar.g), np.asarray(dstar.rhs), dstar))
+
+    (dense_path, dense_g, dense_rhs, _), (sparse_path, sparse_g, sparse_rhs, sparse) = runs
+    assert dense_path == sparse_path
+    assert np.array_equal(dense_g, sparse_g)
+    assert np.array_equal(dense_rhs, sparse_rhs)
+    assert len(sparse.g) < world.x_dim * world.y_dim
+
+
+def test_cost_map_detours_around_slow_zone():
+    world = OccupancyGridMap(x_dim=20, y_dim=20, cost_table=linear_cost_table(max_factor=10.0))
+    # a slow zone across the straight line from start to goal, passable but expensive
+    world.occupancy_grid_map[8:12, 0:16] = 254
+    start, goal = (2, 5), (18, 5)
+    dstar = DStarLite(map=world, s_start=start, s_goal=goal)
+    slam = SLAM(map=world, view_range=3)
+
+    position = start
+    path = [start]
+    while position != goal:
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        position = dstar.next_step()
+        path.append(position)
+        assert len(path) < 100
+
+    assert all(world.occupancy_grid_map[p] == 0 for p in path)
+
+    with pytest.raises(ValueError):
+        FlatDStarLite(map=world, s_start=start, s_goal=goal, sensed_map=slam.slam_map)
+
+
+@pytest.mark.parametrize('planner', ['dstar', 'flat'])
+def test_batched_edge_changes_match_per_edge(planner):
+    from benchmark_edge_changes import reveal
+    per_edge = reveal(size=30, block=8, planner=planner, batched=False)
+    batched = reveal(size=30, block=8, planner=planner, batched=True)
+    assert np.array_equal(batched['g'], per_edge['g'])
+    assert batched['apply_recomputations'] < per_edge['apply_recomputations']
+
+
+def known_path_cost(dstar):
+    path = list(dstar.current_path())
+    return sum(heuristic(p, q) for p, q in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_epsilon_bounds_suboptimality(seed, random_world):
+    start, goal = (1, 1), (38, 38)
+    world = random_world(size=40, density=0.25, seed=seed, free=(start, goal))
+
+    optimal = DStarLite(map=world, s_start=start, s_goal=goal, sensed_map=world, stats=PlannerStats())
+    optimal.replan()
+    weighted = DStarLite(map=world, s_start=start, s_goal=goal, sensed_map=world, stats=PlannerStats(), epsilon=2.0)
+    weighted.replan()
+    assert weighted.stats.expansions <= optimal.stats.expansions
+    assert known_path_cost(weighted) <= 2.0 * known_path_cost(optimal) + 1e-9
+
+    # anytime: lowering epsilon to 1 continues the search up to the optimal path
+    weighted.set_epsilon(1.0)
+    weighted.next_step()
+    assert weighted.g[start] == pytest.approx(optimal.g[start])
+
+    with pytest.raises(ValueError):
+        weighted.set_epsilon(0.5)
+
+
+def test_epsilon_stepping_reaches_goal():
+    world = walled_world()
+    start, goal = (2, 20), (28, 20)
+    dstar = DStarLite(map=world, s_start=start, s_goal=goal, epsilon=3.0)
+    slam = SLAM(map=world, view_range=4)
+    position = start
+    for _ in range(200):
+        if position == goal:
+            break
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        position = dstar.next_step()
+    assert position == goal
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_budgeted_search_resumes_to_the_same_plan(planner_cls):
+    world = walled_world()
+    start, goal = (2, 20), (28, 20)
+    full = planner_cls(map=world, s_start=start, s_goal=goal, sensed_map=world)
+    assert full.replan()
+
+    stats = PlannerStats()
+    budgeted = planner_cls(map=world, s_start=start, s_goal=goal, sensed_map=world, stats=stats)
+    budgeted.set_budget(max_expansions=50)
+    slices = 1
+    while not budgeted.replan():
+        assert not budgeted.planned
+        slices += 1
+    assert slices > 3 and stats.interrupted == slices - 1
+    assert list(budgeted.current_path()) == list(full.current_path())
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_budgeted_stepping_reaches_goal(planner_cls):
+    world = walled_world()
+    start, goal = (2, 20), (28, 20)
+    records = []
+    dstar = planner_cls(map=world, s_start=start, s_goal=goal, stats=PlannerStats(on_replan=records.append))
+    dstar.set_budget(max_expansions=40, time_budget=0.05)
+    slam = SLAM(map=world, view_range=4)
+
+    position = start
+    waits = 0
+    for _ in range(400):
+        if position == goal:
+            break
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        step = dstar.next_step()
+        waits += step == position
+        assert world.is_unoccupied(step) and heuristic(position, step) < 1.5
+        position = step
+    assert position == goal
+    assert waits > 0 and max(record['expansions'] for record in records) <= 40
@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+
+
+def path_cost(path):
+    return sum(math.dist(p, q) for p, q in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_first_plan_matches_reference(seed, random_world):
+    world = random_world(size=30, density=0.2, seed=seed)
+    results = []
+    for planner_cls in (DStarLite, FlatDStarLite):
+        planner = planner_cls(map=world, s_start=(0, 0), s_goal=(29, 29))
+        planner.sensed_map = world
+        path, g, rhs = planner.move_and_replan(robot_position=(0, 0))
+        results.append((path, np.asarray(g)))
+
+    (ref_path, ref_g), (flat_path, flat_g) = results
+    assert ref_g[0, 0] == flat_g[0, 0]
+    assert path_cost(ref_path) == pytest.approx(path_cost(flat_path))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_walk_with_slam_reaches_goal(seed, random_world):
+    world = random_world(size=25, density=0.2, seed=seed)
+    goal = (24, 24)
+    planner = FlatDStarLite(map=world, s_start=(0, 0), s_goal=goal)
+    slam = SLAM(map=world, view_range=3)
+    position = (0, 0)
+    for _ in range(200):
+        if position == goal:
+            break
+        planner.new_edges_and_old_costs, planner.sensed_map = slam.rescan(global_position=position)
+        path, g, rhs = planner.move_and_replan(robot_position=position)
+        assert world.is_unoccupied(path[1])
+        position = path[1]
+    assert position == goal
+
+
+def test_apply_changes_syncs_the_changed_cells_only():
+    world = OccupancyGridMap(x_dim=20, y_dim=20)
+    slam = SLAM(map=world, view_range=3)
+    dstar = FlatDStarLite(map=world, s_start=(0, 0), s_goal=(19, 19), sensed_map=slam.slam_map)
+    world.set_obstacle((2, 2))
+    # a change the robot did not report is not synced
+    slam.slam_map.set_obstacle((15, 15))
+    changes, slam_map = slam.rescan(global_position=(0, 0))
+    dstar.apply_changes(changes=changes, sensed_map=slam_map)
+    assert dstar.occupancy[dstar.to_index((2, 2))] == 1
+    assert dstar.occupancy[dstar.to_index((15, 15))] == 0
+
+    # another map is synced in full
+    other = slam.slam_map.empty_like()
+    other.set_obstacle((15, 15))
+    dstar.apply_changes(changes=None, sensed_map=other)
+    assert dstar.occupancy[dstar.to_index((2, 2))] == 0
+    assert dstar.occupancy[dstar.to_index((15, 15))] == 1
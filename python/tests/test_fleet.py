@@ -0,0 +1,57 @@
+import sys
+
+import pytest
+
+from fleet import FleetPlanner
+from grid import OccupancyGridMap
+
+
+def walled_world():
+    world = OccupancyGridMap(x_dim=30, y_dim=30)
+    for y in range(3, 30):
+        world.set_obstacle((15, y))
+    return world
+
+
+ROBOTS = [((2, 20), (28, 20)), ((2, 25), (28, 25)), ((5, 5), (5, 5)), ((25, 5), (2, 28))]
+
+
+@pytest.mark.parametrize('planner', ['dstar', 'flat'])
+def test_fleet_shares_sensed_map(planner):
+    world = walled_world()
+    with FleetPlanner(world, ROBOTS, view_range=3, planner=planner) as fleet:
+        assert all(dstar.sensed_map is fleet.slam.slam_map for dstar in fleet.planners)
+        result = fleet.run()
+        # the robot that starts at its goal never plans
+        assert not fleet.planners[2].planned
+    assert result['status'] == ['reached'] * len(ROBOTS)
+    for (start, goal), path in zip(ROBOTS, result['paths']):
+        assert path[0] == start and path[-1] == goal
+        assert all(world.is_unoccupied(p) for p in path)
+
+
+def test_fleet_reports_no_path():
+    world = walled_world()
+    world.set_obstacle((15, 0))
+    world.set_obstacle((15, 1))
+    world.set_obstacle((15, 2))
+    with FleetPlanner(world, ROBOTS[:2], view_range=3) as fleet:
+        result = fleet.run()
+    assert result['status'] == ['no_path', 'no_path']
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="multiprocessing.shared_memory")
+def test_fleet_process_shards_match_in_process():
+    world = walled_world()
+    with FleetPlanner(world, ROBOTS, view_range=3, processes=0) as fleet:
+        expected = fleet.run()
+    with FleetPlanner(world, ROBOTS, view_range=3, processes=2) as fleet:
+        assert fleet.run() == expected
+
+
+def test_benchmark_runs():
+    import benchmark_fleet
+
+    results = benchmark_fleet.main(['--size', '30', '--robots', '2', '--steps', '2'])
+    assert [r['fleet'] for r in results] == ['independent', 'shared, 0 processes']
+    assert all(r['step_time'] > 0 for r in results)
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from goal_cache import GoalCache, clone_planner, planner_bytes
+from grid import SLAM
+from instrumentation import PlannerStats
+
+
+OPTIONS = {
+    'dense': ('dstar', {}),
+    'sparse': ('dstar', {'state': 'sparse'}),
+    'lazy': ('dstar', {'lazy_deletion': True}),
+    'kernel': ('dstar', {'kernel': True}),
+    'flat': ('flat', {}),
+}
+
+
+def path_cost(world, path):
+    return sum(world.c(u, v) for u, v in zip(path, path[1:]))
+
+
+def fresh_cost(world, start, goal, planner, options):
+    dstar = (DStarLite if planner == 'dstar' else FlatDStarLite)(map=world, s_start=start, s_goal=goal,
+                                                                sensed_map=world, **options)
+    return path_cost(world, list(dstar.current_path()))
+
+
+@pytest.mark.parametrize('name', sorted(OPTIONS))
+def test_cached_goal_plans_like_a_fresh_planner(name, random_world):
+    planner, options = OPTIONS[name]
+    world = random_world(size=40, density=0.25, seed=4)
+    goal = (39, 39)
+    cache = GoalCache(world, planner=planner, **options)
+
+    first_stats, second_stats = PlannerStats(), PlannerStats()
+    first = cache.planner_for((0, 0), goal, stats=first_stats)
+    second = cache.planner_for((0, 39), goal, stats=second_stats)
+    assert (cache.hits, cache.misses) == (1, 1)
+    # both come planned, and the second start reused the tree of the first
+    for dstar, start in ((first, (0, 0)), (second, (0, 39))):
+        path = list(dstar.current_path())
+        assert path[0] == start and path[-1] == goal
+        assert path_cost(world, path) == pytest.approx(fresh_cost(world, start, goal, planner, options))
+    assert first_stats.expansions == second_stats.expansions == 0
+
+    # the planners are independent of each other and of the cache
+    assert first.next_step() != (0, 0)
+    assert list(second.current_path())[0] == (0, 39)
+
+
+def test_repeated_goal_expands_less(random_world):
+    world = random_world(size=60, density=0.25, seed=4)
+    goal = (59, 59)
+    fresh = PlannerStats()
+    DStarLite(map=world, s_start=(0, 59), s_goal=goal, stats=fresh, sensed_map=world).replan()
+
+    cache = GoalCache(world)
+    cache.planner_for((0, 0), goal)
+    before = cache.roots[goal].stats
+    root_stats = PlannerStats()
+    cache.roots[goal].stats = root_stats
+    cache.planner_for((0, 59), goal)
+    cache.roots[goal].stats = before
+    assert root_stats.expansions < fresh.expansions
+
+
+def test_changes_reach_the_cached_searches(random_world):
+    world = random_world(size=40, density=0.25, seed=4)
+    start, goal = (0, 0), (39, 39)
+    slam = SLAM(map=world, view_range=3)
+    cache = GoalCache(slam.slam_map)
+    dstar = cache.planner_for(start, goal)
+
+    position = start
+    for _ in range(10):
+        changes, _ = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes)
+        cache.apply_changes(changes)
+        position = dstar.next_step()
+
+    path = list(cache.planner_for((39, 0), goal).current_path())
+    assert all(slam.slam_map.is_unoccupied(cell) for cell in path)
+    assert path_cost(slam.slam_map, path) == pytest.approx(fresh_cost(slam.slam_map, (39, 0), goal, 'dstar', {}))
+
+
+def test_least_recently_used_goals_are_evicted(random_world):
+    world = random_world(size=40, density=0.25, seed=4)
+    goals = [(39, 39), (39, 0), (0, 39)]
+    unlimited = GoalCache(world, memory_budget=float('inf'))
+    for goal in goals:
+        unlimited.planner_for((0, 0), goal)
+    assert len(unlimited) == 3 and unlimited.evictions == 0
+
+    cache = GoalCache(world, memory_budget=unlimited.memory - 1)
+    for goal in goals:
+        cache.planner_for((0, 0), goal)
+    assert list(cache.roots) == [(39, 0), (0, 39)]
+    cache.planner_for((0, 0), (39, 0))
+    cache.planner_for((0, 0), (39, 39))
+    assert list(cache.roots) == [(39, 0), (39, 39)]
+    assert cache.evictions == 2
+    assert cache.memory == sum(planner_bytes(root) for root in cache.roots.values())
+
+    # the goal used last is kept whatever the budget
+    tiny = GoalCache(world, memory_budget=0)
+    for goal in goals:
+        tiny.planner_for((0, 0), goal)
+    assert list(tiny.roots) == [(0, 39)]
+
+
+def test_clone_is_independent(random_world):
+    world = random_world(size=40, density=0.25, seed=4)
+    dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(39, 39), sensed_map=world)
+    dstar.replan()
+    clone = clone_planner(dstar)
+    g = dstar.g.copy()
+    clone.apply_changes(changes=None, robot_position=(39, 0))
+    assert np.array_equal(dstar.g, g)
+    assert len(clone.U) != len(dstar.U) or not np.array_equal(clone.g, g)
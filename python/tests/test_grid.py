@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from grid import OccupancyGridMap, SLAM, linear_cost_table
+from utils import heuristic
+
+
+@pytest.mark.parametrize('exploration_setting', ['4N', '8N'])
+def test_neighbor_table_matches_succ(exploration_setting, random_world):
+    world = random_world((7, 9), density=0.3, free=(), exploration_setting=exploration_setting)
+    neighbors, valid, distances = world.neighbor_table()
+    for x in range(7):
+        for y in range(9):
+            index = x * 9 + y
+            successors = [divmod(s, 9) for s in neighbors[index][valid[index]].tolist()]
+            assert successors == world.succ((x, y))
+            parity = (x + y + 1) % 2
+            assert distances[parity][valid[index]].tolist() == [heuristic((x, y), s) for s in successors]
+
+
+@pytest.mark.parametrize('exploration_setting', ['4N', '8N'])
+def test_succ_batch(exploration_setting, random_world):
+    world = random_world((7, 9), density=0.3, free=(), exploration_setting=exploration_setting)
+    vertices = np.array([(x, y) for x in range(7) for y in range(9)])
+    successors, costs, valid = world.succ_batch(vertices)
+
+    for vertex, succ, cost, mask in zip(vertices.tolist(), successors, costs, valid):
+        vertex = tuple(vertex)
+        expected = world.succ(vertex)
+        assert [tuple(s) for s in succ[mask].tolist()] == expected
+        for s, c in zip(expected, cost[mask]):
+            if world.is_unoccupied(vertex) and world.is_unoccupied(s):
+                assert c == heuristic(vertex, s)
+            else:
+                assert c == float('inf')
+        assert np.all(np.isinf(cost[~mask]))
+
+
+def test_rescan_matches_local_observation(random_world):
+    world = random_world(40, density=0.3, seed=3, free=())
+    vectorized = SLAM(map=world, view_range=4)
+    reference = SLAM(map=world, view_range=4)
+
+    for position in [(5, 5), (6, 6), (20, 7), (39, 39), (0, 39)]:
+        changes, slam_map = vectorized.rescan(global_position=position)
+        observation = world.local_observation(global_position=position, view_range=4)
+        vertices = reference.update_changed_edge_costs(local_grid=observation)
+
+        assert np.array_equal(slam_map.occupancy_grid_map, reference.slam_map.occupancy_grid_map)
+        changed = {vertex.pos for vertex in vertices.vertices}
+        assert {tuple(cell) for cell in changes.cells.tolist()} == changed
+
+        # the reference updates the slam map cell by cell, so only edges from cells that
+        # did not change themselves see the same old cost
+        expected = {(u, vertex.pos): c_old for vertex in vertices.vertices
+                    for u, c_old in vertex.edges_and_c_old.items() if u not in changed}
+        actual = {(u, v): c_old for u, v, c_old in changes.edges() if u not in changed}
+        assert actual == expected
+        assert [v.pos for v in changes.vertices] == [v.pos for v in vertices.vertices]
+
+
+def test_cost_table():
+    world = OccupancyGridMap(x_dim=5, y_dim=5, cost_table=linear_cost_table(max_factor=3.0))
+    world.occupancy_grid_map[2, 2] = 254
+    world.set_obstacle((0, 0))
+    assert world.weighted
+    assert world.c((2, 1), (2, 2)) == pytest.approx(2.0)
+    assert world.c((1, 1), (2, 2)) == pytest.approx(2.0 * np.sqrt(2))
+    assert world.c((0, 0), (0, 1)) == float('inf')
+    assert world.is_unoccupied((2, 2)) and not world.is_unoccupied((0, 0))
+    assert not OccupancyGridMap(x_dim=5, y_dim=5).weighted
+
+    with pytest.raises(ValueError):
+        world.set_cost_table(np.full(256, 0.5))
+
+
+def test_rescan_senses_cost_changes():
+    world = OccupancyGridMap(x_dim=10, y_dim=10, cost_table=linear_cost_table())
+    world.occupancy_grid_map[4, 4] = 100
+    slam = SLAM(map=world, view_range=2)
+    changes, slam_map = slam.rescan(global_position=(4, 5))
+    assert {tuple(cell) for cell in changes.cells.tolist()} == {(4, 4)}
+    assert slam_map.c((4, 4), (4, 5)) == world.c((4, 4), (4, 5))
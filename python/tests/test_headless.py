@@ -0,0 +1,33 @@
+import json
+import sys
+
+import numpy as np
+
+import headless
+
+
+def test_cli_writes_json_without_pygame(tmp_path):
+    grid = np.zeros((20, 20), dtype=np.uint8)
+    grid[5:15, 10] = 255
+    map_file = tmp_path / 'map.npy'
+    np.save(map_file, grid)
+    output = tmp_path / 'result.json'
+
+    headless.main([str(map_file), '--start', '0', '0', '--goal', '19', '19', '--view-range', '3',
+                   '--output', str(output)])
+
+    result = json.loads(output.read_text())
+    assert result['status'] == 'reached'
+    assert result['path'][0] == [0, 0] and result['path'][-1] == [19, 19]
+    assert all(grid[x, y] == 0 for x, y in result['path'])
+    assert result['stats']['replans'] == result['stats']['steps']
+    assert 'pygame' not in sys.modules
+
+
+def test_plan_reports_missing_path():
+    grid = np.zeros((10, 10), dtype=np.uint8)
+    grid[:, 5] = 255
+    world = headless.OccupancyGridMap(x_dim=10, y_dim=10)
+    world.set_map(grid)
+    result = headless.plan(world, start=(0, 0), goal=(9, 9), view_range=2, planner='flat')
+    assert result['status'] == 'no_path'
@@ -0,0 +1,125 @@
+import heapq
+import math
+
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from grid import SLAM
+from hierarchical import ClusterGraph, HierarchicalPlanner, distance_fields
+from utils import NoPathError
+
+
+def path_cost(world, path):
+    return sum(world.c(u, v) for u, v in zip(path, path[1:]))
+
+
+def dijkstra(factors, source):
+    (w, h) = factors.shape
+    costs = np.full((w, h), np.inf)
+    costs[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        cost, (x, y) = heapq.heappop(queue)
+        if cost > costs[x, y]:
+            continue
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                (sx, sy) = (x + dx, y + dy)
+                if (dx, dy) != (0, 0) and 0 <= sx < w and 0 <= sy < h:
+                    new = cost + math.hypot(dx, dy) * (factors[x, y] + factors[sx, sy]) * 0.5
+                    if new < costs[sx, sy]:
+                        costs[sx, sy] = new
+                        heapq.heappush(queue, (new, (sx, sy)))
+    return costs
+
+
+def test_distance_fields_match_dijkstra():
+    rng = np.random.default_rng(3)
+    factors = rng.choice([1.0, 1.0, 1.0, 3.0, np.inf], size=(2, 12, 9))
+    sources = [[(0, 0), (11, 8), (5, 4)], [(6, 2)]]
+    for window in sources:
+        factors[sources.index(window)][tuple(zip(*window))] = 1.0
+
+    fields = distance_fields(factors, sources)
+    assert fields.shape == (2, 3, 12, 9)
+    for i, window in enumerate(sources):
+        for j, source in enumerate(window):
+            assert np.allclose(fields[i, j], dijkstra(factors[i], source))
+    # windows with fewer sources are padded with unreachable fields
+    assert np.all(np.isinf(fields[1, 1:]))
+
+
+def test_path_on_known_map(random_world):
+    world = random_world(size=64)
+    start, goal = (0, 0), (63, 63)
+    planner = HierarchicalPlanner(map=world, s_start=start, s_goal=goal, cluster_size=16, sensed_map=world,
+                                  epsilon=1.0)
+    planner.next_step()
+    path = [start] + list(planner.current_path())
+    assert path[-1] == goal
+    assert all(world.is_unoccupied(cell) for cell in path)
+    assert all(max(abs(u[0] - v[0]), abs(u[1] - v[1])) == 1 for u, v in zip(path, path[1:]))
+
+    dstar = DStarLite(map=world, s_start=start, s_goal=goal, sensed_map=world)
+    dstar.replan()
+    assert path_cost(world, path) <= 1.1 * dstar.g[start]
+    # only the clusters around the route were computed
+    assert len(planner.graph._intra) < np.prod(planner.graph.clusters_shape)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_stepping_with_slam_reaches_goal(seed, random_world):
+    world = random_world(size=48, seed=seed)
+    start, goal = (0, 0), (47, 47)
+    slam = SLAM(map=world, view_range=3)
+    planner = HierarchicalPlanner(map=world, s_start=start, s_goal=goal, cluster_size=8,
+                                  sensed_map=slam.slam_map)
+
+    position = start
+    path = [start]
+    while position != goal:
+        changes, slam_map = slam.rescan(global_position=position)
+        planner.apply_changes(changes=changes, sensed_map=slam_map)
+        position = planner.next_step()
+        path.append(position)
+        assert len(path) < 1000
+    assert all(world.is_unoccupied(cell) for cell in path)
+    assert all(max(abs(u[0] - v[0]), abs(u[1] - v[1])) == 1 for u, v in zip(path, path[1:]))
+
+
+def test_moving_without_changes(random_world):
+    world = random_world(size=64)
+    planner = HierarchicalPlanner(map=world, s_start=(0, 0), s_goal=(63, 63), cluster_size=16, sensed_map=world)
+    position = planner.next_step()
+    planner.apply_changes(changes=None, robot_position=(0, 0))
+    assert planner.next_step() == position
+
+
+def test_unfinished_abstract_search_raises_no_path_error(random_world):
+    world = random_world(size=64)
+    planner = HierarchicalPlanner(map=world, s_start=(0, 0), s_goal=(63, 63), cluster_size=16, sensed_map=world)
+    # the abstract search stops before it reaches the robot, so its path ends at the robot
+    planner.dstar.set_budget(max_expansions=1)
+    with pytest.raises(NoPathError):
+        planner.next_step()
+
+
+def test_update_matches_rebuild(random_world):
+    world = random_world(size=40, seed=2)
+    graph = ClusterGraph(world, cluster_size=8)
+    graph._load(sorted(graph.nodes))
+
+    cells = [(15, 3), (16, 3), (8, 20), (23, 24), (31, 31), (0, 0)]
+    for cell in cells:
+        world.set_obstacle(cell)
+    world.remove_obstacle((12, 12))
+    changed = graph.update(np.array(cells + [(12, 12)]))
+    assert changed
+
+    rebuilt = ClusterGraph(world, cluster_size=8)
+    rebuilt._load(sorted(rebuilt.nodes))
+    assert graph.inter == rebuilt.inter
+    assert {cluster: nodes for cluster, nodes in graph.nodes.items() if nodes} == \
+           {cluster: nodes for cluster, nodes in rebuilt.nodes.items() if nodes}
+    assert graph._intra == rebuilt._intra
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap, SLAM
+from inflation import InflationLayer
+
+OBSTACLE = 255
+
+
+def test_incremental_update_matches_rebuild(random_world):
+    world = random_world(size=40, density=0.1, free=())
+    layer = InflationLayer(SLAM(map=world, view_range=4), robot_radius=1.0, inflation_radius=3.0)
+    for position in [(5, 5), (7, 6), (20, 20), (39, 0), (30, 35)]:
+        changes, costmap = layer.rescan(global_position=position)
+        reference = InflationLayer(layer.slam, robot_radius=1.0, inflation_radius=3.0)
+        assert np.array_equal(costmap.occupancy_grid_map, reference.costmap.occupancy_grid_map)
+        assert np.array_equal(layer.distance, reference.distance)
+
+    # removing an obstacle again restores the free cells around it
+    cell = tuple(np.argwhere(layer.slam.slam_map.occupancy_grid_map == OBSTACLE)[0].tolist())
+    layer.slam.slam_map.remove_obstacle(cell)
+    changes = layer.update(np.array([cell]))
+    assert cell in {tuple(c) for c in changes.cells.tolist()}
+    reference = InflationLayer(layer.slam, robot_radius=1.0, inflation_radius=3.0)
+    assert np.array_equal(layer.costmap.occupancy_grid_map, reference.costmap.occupancy_grid_map)
+
+
+def test_planning_keeps_clearance():
+    world = OccupancyGridMap(x_dim=30, y_dim=30)
+    for y in range(0, 20):
+        world.set_obstacle((15, y))
+    start, goal = (10, 5), (20, 5)
+    layer = InflationLayer(SLAM(map=world, view_range=4), robot_radius=1.0, inflation_radius=3.0)
+    dstar = DStarLite(map=world, s_start=start, s_goal=goal, sensed_map=layer.costmap)
+
+    position = start
+    path = [start]
+    while position != goal:
+        changes, costmap = layer.rescan(global_position=position)
+        dstar.apply_changes(changes=changes)
+        position = dstar.next_step()
+        path.append(position)
+        assert len(path) < 200
+
+    # the robot passes the end of the wall at more than its radius
+    assert min(np.hypot(x - 15, y - 19) for x, y in path if y >= 19) > 1.0
+
+
+def test_invalid_radii(random_world):
+    world = random_world(size=40, density=0.1, free=())
+    with pytest.raises(ValueError):
+        InflationLayer(SLAM(map=world, view_range=4), robot_radius=3.0, inflation_radius=2.0)
@@ -0,0 +1,49 @@
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from instrumentation import PlannerStats
+
+OBSTACLE = 255
+
+
+def drive(planner_cls, stats):
+    world = OccupancyGridMap(x_dim=30, y_dim=30)
+    for y in range(3, 30):
+        world.set_obstacle((15, y))
+    start, goal = (2, 20), (28, 20)
+    dstar = planner_cls(map=world, s_start=start, s_goal=goal, stats=stats)
+    slam = SLAM(map=world, view_range=4)
+    position = start
+    while position != goal:
+        dstar.new_edges_and_old_costs, dstar.sensed_map = slam.rescan(global_position=position)
+        path, g, rhs = dstar.move_and_replan(robot_position=position)
+        position = path[1]
+
+
+def test_counters_and_hook():
+    for planner_cls in (DStarLite, FlatDStarLite):
+        records = []
+        stats = PlannerStats(on_replan=records.append)
+        drive(planner_cls, stats)
+
+        assert stats.replans == len(records) > 1
+        assert stats.expansions == sum(r['expansions'] for r in records) > 0
+        assert stats.expansions == stats.rekeys + stats.overconsistent + stats.underconsistent
+        assert stats.underconsistent > 0  # the wall is discovered while driving
+        assert stats.edge_changes > 0 and stats.rhs_recomputations > 0
+        assert stats.heap_inserts > 0 and stats.heap_removes > 0
+        assert stats.time['compute_shortest_path'] <= stats.time['move_and_replan']
+        assert records[0]['k_m'] == 0 and records[0]['s_start'] == (2, 20)
+
+
+def test_stats_do_not_change_the_plan():
+    for planner_cls in (DStarLite, FlatDStarLite):
+        world = OccupancyGridMap(x_dim=20, y_dim=20)
+        world.set_obstacle((10, 10))
+        paths = []
+        for stats in (None, PlannerStats()):
+            dstar = planner_cls(map=world, s_start=(0, 0), s_goal=(19, 19), stats=stats)
+            slam = SLAM(map=world, view_range=3)
+            dstar.new_edges_and_old_costs, dstar.sensed_map = slam.rescan(global_position=(0, 0))
+            paths.append(dstar.move_and_replan(robot_position=(0, 0))[0])
+        assert paths[0] == paths[1]
@@ -0,0 +1,131 @@
+import random
+
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from grid import SLAM, linear_cost_table
+from instrumentation import PlannerStats
+import kernel
+from kernel import ArrayPriorityQueue
+from priority_queue import PriorityQueue
+
+UNOCCUPIED = 0
+
+
+def counters(stats):
+    return {name: value for name, value in stats.as_dict().items() if not name.startswith('time')}
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('cost_map', [False, True])
+def test_first_plan_matches_reference(seed, cost_map, random_world):
+    world = random_world(density=0.25, seed=seed, cost_table=linear_cost_table() if cost_map else None)
+    if cost_map:
+        # a random cost factor on every free cell
+        grid = world.get_map()
+        free = grid == UNOCCUPIED
+        grid[free] = np.random.default_rng(seed).integers(0, 200, np.count_nonzero(free))
+    results = []
+    for kernel in (False, True):
+        stats = PlannerStats()
+        dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(29, 29), sensed_map=world, stats=stats, kernel=kernel)
+        dstar.replan()
+        results.append((dstar.g, dstar.rhs, list(dstar.current_path()), counters(stats)))
+
+    (ref_g, ref_rhs, ref_path, ref_stats), (g, rhs, path, stats) = results
+    # bit for bit, not only approximately
+    assert np.array_equal(g, ref_g)
+    assert np.array_equal(rhs, ref_rhs)
+    assert path == ref_path
+    assert stats == ref_stats
+
+
+@pytest.mark.parametrize('options', [{}, {'epsilon': 1.5}, {'max_expansions': 50}], ids=['plain', 'epsilon', 'budget'])
+def test_walk_with_slam_matches_reference(options, random_world):
+    world = random_world(size=25, density=0.2, seed=7)
+    goal = (24, 24)
+    options = dict(options)
+    max_expansions = options.pop('max_expansions', None)
+    planners = []
+    for kernel in (False, True):
+        dstar = DStarLite(map=world, s_start=(0, 0), s_goal=goal, kernel=kernel, **options)
+        dstar.set_budget(max_expansions=max_expansions)
+        dstar.changed_vertices = set()
+        planners.append((dstar, SLAM(map=world, view_range=3)))
+
+    positions = [(0, 0), (0, 0)]
+    for _ in range(300):
+        for i, (dstar, slam) in enumerate(planners):
+            changes, slam_map = slam.rescan(global_position=positions[i])
+            dstar.apply_changes(changes=changes, sensed_map=slam_map)
+            positions[i] = dstar.next_step()
+        assert positions[0] == positions[1]
+        if positions[0] == goal:
+            break
+    assert positions[0] == goal
+    (reference, _), (dstar, _) = planners
+    assert np.array_equal(dstar.g, reference.g)
+    assert np.array_equal(dstar.rhs, reference.rhs)
+    assert dstar.changed_vertices == reference.changed_vertices
+
+
+def test_array_queue_orders_like_priority_queue():
+    rng = random.Random(3)
+    reference, queue = PriorityQueue(), ArrayPriorityQueue(20, 20)
+    for _ in range(2000):
+        vertex = (rng.randrange(20), rng.randrange(20))
+        # few distinct keys, so that many ties are broken on the vertex
+        key = (float(rng.randrange(5)), float(rng.randrange(3)))
+        if vertex not in reference:
+            reference.insert(vertex, key)
+            queue.insert(vertex, key)
+        elif rng.random() < 0.5:
+            reference.update(vertex, key)
+            queue.update(vertex, key)
+        else:
+            reference.remove(vertex)
+            queue.remove(vertex)
+        assert len(queue) == len(reference)
+        if len(reference):
+            assert (queue.top_key(), queue.top()) == (reference.top_key(), reference.top())
+    while len(reference):
+        assert queue.pop() == reference.pop()
+    assert queue.top_key() == reference.top_key()
+
+
+def test_kernel_needs_dense_state(random_world):
+    world = random_world(density=0.25)
+    with pytest.raises(ValueError):
+        DStarLite(map=world, s_start=(0, 0), s_goal=(29, 29), state='sparse', kernel=True)
+    with pytest.raises(ValueError):
+        DStarLite(map=world, s_start=(0, 0), s_goal=(29, 29), lazy_deletion=True, kernel=True)
+
+
+def test_dense_map_is_not_copied(monkeypatch, random_world):
+    world = random_world(density=0.25)
+    dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(29, 29), sensed_map=world, kernel=True)
+    grids = []
+    search = kernel.search
+    monkeypatch.setattr(kernel, 'search', lambda g, rhs, grid, *args: grids.append(grid) or search(g, rhs, grid, *args))
+    dstar.replan()
+    assert np.shares_memory(grids[0], world.get_map())
+
+    # a map of another dtype is copied once per call
+    world.set_map(world.get_map().astype(np.int64))
+    dstar.apply_changes(changes=None, robot_position=(1, 1))
+    assert grids[-1].dtype == np.uint8 and not np.shares_memory(grids[-1], world.get_map())
+
+
+def test_deadline_is_checked_in_chunks(monkeypatch, random_world):
+    world = random_world(size=60, density=0.1)
+    dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(59, 59), sensed_map=world, kernel=True)
+    dstar.set_budget(time_budget=10.0)
+    chunks = []
+    search = kernel.search
+    monkeypatch.setattr(kernel, 'search', lambda *args: chunks.append(args[-3]) or search(*args))
+    dstar.replan()
+    assert dstar.planned and len(chunks) > 1
+    assert set(chunks) == {kernel.DEADLINE_CHUNK}
+    # a few milliseconds of the interpreted kernel
+    assert kernel.NUMBA or kernel.DEADLINE_CHUNK <= 100
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from grid import OccupancyGridMap, linear_cost_table
+from map_io import load_map, load_ros_map, save_map
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+
+def random_world(size=50, seed=0):
+    rng = np.random.default_rng(seed)
+    world = OccupancyGridMap(x_dim=size, y_dim=size + 7)
+    world.set_map(rng.choice([UNOCCUPIED, UNOCCUPIED, 100, OBSTACLE], size=(size, size + 7)).astype(np.uint8))
+    return world
+
+
+@pytest.mark.parametrize('extension', ['.npy', '.npz', '.rle'])
+def test_round_trip(tmp_path, extension):
+    world = random_world()
+    world.set_cost_table(linear_cost_table(4.0))
+    path = str(tmp_path / ('map' + extension))
+    save_map(world, path)
+
+    loaded = load_map(path)
+    assert loaded.get_map().dtype == np.uint8
+    assert np.array_equal(loaded.get_map(), world.get_map())
+    # only .npz keeps the cost table
+    assert loaded.weighted == (extension == '.npz')
+
+
+def test_npy_is_mapped_copy_on_write(tmp_path):
+    world = random_world()
+    path = str(tmp_path / 'map.npy')
+    save_map(world, path)
+
+    loaded = load_map(path)
+    assert isinstance(loaded.get_map(), np.memmap)
+    cell = tuple(np.argwhere(world.get_map() == UNOCCUPIED)[0].tolist())
+    loaded.set_obstacle(cell)
+    assert not loaded.is_unoccupied(cell)
+    assert load_map(path).is_unoccupied(cell)
+
+
+def test_corrupt_rle(tmp_path):
+    path = tmp_path / 'map.rle'
+    save_map(random_world(), str(path))
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        load_map(str(path))
+
+
+@pytest.mark.parametrize('binary', [True, False])
+def test_ros_map(tmp_path, binary):
+    # 3 x 4 image: the top row is black (occupied), one grey pixel (unknown), the rest white (free)
+    pixels = np.full((3, 4), 254, dtype=np.uint8)
+    pixels[0] = 0
+    pixels[1, 2] = 205
+    if binary:
+        (tmp_path / 'floor.pgm').write_bytes(b'P5\n# CREATOR: map_saver\n4 3\n255\n' + pixels.tobytes())
+    else:
+        rows = '\n'.join(' '.join(str(p) for p in row) for row in pixels)
+        (tmp_path / 'floor.pgm').write_text('P2\n4 3\n255\n' + rows + '\n')
+    (tmp_path / 'floor.yaml').write_text('image: floor.pgm\nresolution: 0.050000\n'
+                                         'origin: [-1.0, 2.5, 0.0]\nnegate: 0\n'
+                                         'occupied_thresh: 0.65\nfree_thresh: 0.196  # map_server default\n')
+
+    world, meta = load_ros_map(str(tmp_path / 'floor.yaml'), unknown=100)
+    assert meta['resolution'] == 0.05 and meta['origin'] == [-1.0, 2.5, 0.0]
+    # x runs along the image columns, y upwards from the bottom row of the image
+    assert (world.x_dim, world.y_dim) == (4, 3)
+    grid = world.get_map()
+    assert np.all(grid[:, 2] == OBSTACLE)
+    assert grid[2, 1] == 100
+    assert np.count_nonzero(grid == UNOCCUPIED) == 7
+
+    # loading the yaml as map treats unknown cells as free
+    assert np.count_nonzero(load_map(str(tmp_path / 'floor.yaml')).get_map() == UNOCCUPIED) == 8
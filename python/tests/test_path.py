@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import OccupancyGridMap, SLAM
+from path import PathExtractor, line_of_sight, smooth_path, supercover
+
+
+@pytest.mark.parametrize('planner_cls', [DStarLite, FlatDStarLite])
+def test_cached_path_matches_extraction(planner_cls, random_world):
+    world = random_world(seed=1)
+    start, goal = (0, 0), (29, 29)
+    slam = SLAM(map=world, view_range=3)
+    dstar = planner_cls(map=world, s_start=start, s_goal=goal, sensed_map=slam.slam_map)
+    extractor = PathExtractor(dstar)
+
+    position = start
+    full = 0
+    while position != goal:
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes)
+        path = list(dstar.current_path())
+        full += len(path)
+        assert extractor.path() == path
+        position = dstar.next_step()
+    # the cache only extracts again what changed
+    assert extractor.extracted < 0.75 * full
+
+
+def test_line_of_sight():
+    world = OccupancyGridMap(x_dim=10, y_dim=10)
+    world.set_obstacle((2, 2))
+    assert line_of_sight(world, (0, 0), (9, 4))
+    assert not line_of_sight(world, (0, 0), (4, 4))
+    # the segment passes exactly between (1, 2) and (2, 2)
+    assert not line_of_sight(world, (0, 2), (4, 2))
+    assert not line_of_sight(world, (1, 1), (2, 3))
+
+
+@pytest.mark.parametrize('obstacle', [(1, 1), (4, 1)])
+def test_line_of_sight_sees_every_crossed_cell(obstacle):
+    world = OccupancyGridMap(x_dim=10, y_dim=10)
+    world.set_obstacle(obstacle)
+    assert not line_of_sight(world, (0, 0), (5, 2))
+    assert not line_of_sight(world, (5, 2), (0, 0))
+
+
+def test_supercover_touches_corners():
+    assert supercover((0, 0), (2, 2)) == [(0, 0), (1, 0), (0, 1), (1, 1), (2, 1), (1, 2), (2, 2)]
+    assert supercover((3, 3), (0, 1)) == [(3, 3), (2, 3), (2, 2), (1, 2), (1, 1), (0, 1)]
+    assert supercover((4, 2), (0, 2)) == [(4, 2), (3, 2), (2, 2), (1, 2), (0, 2)]
+
+
+def test_smoothing_keeps_clear_of_obstacles():
+    world = OccupancyGridMap(x_dim=20, y_dim=20)
+    for y in range(0, 15):
+        world.set_obstacle((10, y))
+    dstar = DStarLite(map=world, s_start=(2, 2), s_goal=(18, 2), sensed_map=world)
+    extractor = PathExtractor(dstar, smooth=True)
+    path = extractor.path()
+    waypoints = extractor.waypoints()
+
+    assert waypoints[0] == path[0] and waypoints[-1] == path[-1]
+    assert 2 < len(waypoints) < len(path)
+    # a shortcut is in line of sight, a diagonal step of the path itself may touch the corner of the wall
+    edges = set(zip(path, path[1:]))
+    assert all((p, q) in edges or line_of_sight(world, p, q) for p, q in zip(waypoints, waypoints[1:]))
+    length = sum(np.hypot(p[0] - q[0], p[1] - q[1]) for p, q in zip(waypoints, waypoints[1:]))
+    assert length < dstar.g[path[0]]
+    assert smooth_path(world, path[:2]) == path[:2]
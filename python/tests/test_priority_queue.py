@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from priority_queue import PriorityQueue, LazyPriorityQueue
+
+
+@pytest.mark.parametrize('queue_cls', [PriorityQueue, LazyPriorityQueue])
+def test_queue_matches_reference_order(queue_cls):
+    rng = random.Random(1)
+    queue = queue_cls()
+    reference = {}
+    for _ in range(2000):
+        vertex = (rng.randrange(30), rng.randrange(30))
+        key = (rng.randrange(50), rng.randrange(50))
+        if vertex not in reference:
+            queue.insert(vertex, key)
+            reference[vertex] = key
+        elif rng.random() < 0.5:
+            queue.update(vertex, key)
+            reference[vertex] = key
+        else:
+            queue.remove(vertex)
+            del reference[vertex]
+
+        assert len(queue) == len(reference)
+        assert (vertex in queue) == (vertex in reference)
+        if reference:
+            assert queue.top_key() == min(reference.values())
+            assert reference[queue.top()] == min(reference.values())
+
+    while reference:
+        key, vertex = queue.pop()
+        assert key == min(reference.values())
+        del reference[vertex]
+    assert queue.top_key() == (float('inf'), float('inf'))
+
+
+def test_lazy_heap_stays_bounded():
+    rng = random.Random(2)
+    queue = LazyPriorityQueue()
+    vertices = [(i, 0) for i in range(50)]
+    for vertex in vertices:
+        queue.insert(vertex, (rng.random(), 0.0))
+    for _ in range(10000):
+        queue.update(rng.choice(vertices), (rng.random(), 0.0))
+        assert len(queue.heap) <= 2 * len(queue) + 1
+    keys = [queue.pop()[0] for _ in range(len(vertices))]
+    assert keys == sorted(keys) and len(queue) == 0
+    queue = PriorityQueue()
+    for i in range(100):
+        queue.insert((i, i), (100 - i, 0))
+    for i in range(0, 100, 3):
+        queue.remove((i, i))
+    for i in range(1, 100, 3):
+        queue.update((i, i), (i, 0))
+    for vertex, pos in queue.vertices_in_heap.items():
+        assert queue.heap[pos][1] == vertex
+
+
+@pytest.mark.parametrize('queue_cls', [PriorityQueue, LazyPriorityQueue])
+def test_equal_keys_are_ordered_by_vertex(queue_cls):
+    queue = queue_cls()
+    for vertex in ((3, 1), (0, 2), (3, 0), (1, 5)):
+        queue.insert(vertex, (1.0, 1.0))
+    queue.insert((0, 0), (1.0, 2.0))
+    assert [queue.pop()[1] for _ in range(5)] == [(0, 2), (1, 5), (3, 0), (3, 1), (0, 0)]
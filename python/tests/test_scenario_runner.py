@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+
+from grid import OccupancyGridMap
+from map_io import save_map
+from scenario_runner import load_scenarios, make_scenarios, run_scenarios
+
+
+def read_results(path):
+    with open(path) as f:
+        return sorted((json.loads(line) for line in f), key=lambda result: result['id'])
+
+
+def test_pool_runs_every_scenario_like_the_main_process(tmp_path):
+    scenarios, maps = make_scenarios(sizes=[30], generators=['random', 'rooms'], densities=[0.2],
+                                     change_rates=[0.05], planners=['dstar', 'flat'], seeds=[0, 1])
+    grids = {key: grid.copy() for key, (grid, cost_table) in maps.items()}
+    inline, pooled = str(tmp_path / 'inline.jsonl'), str(tmp_path / 'pooled.jsonl')
+    summary = run_scenarios(scenarios, maps, inline, processes=0, log=None)
+    assert summary['scenarios'] == len(scenarios) == 8
+    assert sum(summary['status'].values()) == 8
+    run_scenarios(scenarios, maps, pooled, processes=2, log=None)
+
+    inline_results, pooled_results = read_results(inline), read_results(pooled)
+    assert [result['id'] for result in pooled_results] == list(range(8))
+    for a, b in zip(inline_results, pooled_results):
+        for key in ('map', 'planner', 'status', 'steps', 'path_cost', 'expansions'):
+            assert a[key] == b[key]
+    # the scripts changed the private copies of the workers only
+    for key, (grid, cost_table) in maps.items():
+        assert np.array_equal(grid, grids[key])
+
+
+def test_scenario_file(tmp_path):
+    world = OccupancyGridMap(x_dim=20, y_dim=20)
+    world.set_obstacle((10, 10))
+    save_map(world, str(tmp_path / 'floor.npy'))
+    with open(str(tmp_path / 'scenarios.jsonl'), 'w') as f:
+        for goal in ([19, 19], [0, 19]):
+            f.write(json.dumps({'map': 'floor.npy', 'start': [0, 0], 'goal': goal,
+                                'script': [[2, 3, 0, 1, 255]], 'planner': 'flat'}) + '\n')
+
+    scenarios, maps = load_scenarios(str(tmp_path / 'scenarios.jsonl'))
+    assert len(maps) == 1 and len(scenarios) == 2
+    output = str(tmp_path / 'results.jsonl')
+    summary = run_scenarios(scenarios, maps, output, processes=1, log=None)
+    assert summary['status'] == {'reached': 2}
+    results = read_results(output)
+    assert [result['goal'] for result in results] == [[19, 19], [0, 19]]
+    assert all(result['steps'] >= 19 for result in results)
@@ -0,0 +1,120 @@
+import asyncio
+
+import numpy as np
+
+from grid import OccupancyGridMap
+from d_star_lite import DStarLite
+from service import PlanningClient, PlanningService, replan, run_until_complete
+
+OBSTACLE = 255
+UNOCCUPIED = 0
+
+
+def wall_world(size=30):
+    world = OccupancyGridMap(x_dim=size, y_dim=size)
+    grid = np.zeros((size, size), dtype=np.uint8)
+    grid[size // 2, :size - 5] = OBSTACLE
+    world.set_map(grid)
+    return world
+
+
+def test_updates_during_a_replan_are_coalesced():
+    world = wall_world()
+
+    async def run():
+        service = PlanningService(world.empty_like())
+        opened = await service.handle({'op': 'open', 'robot': 'r1', 'start': [0, 0], 'goal': [29, 0]})
+        assert opened['next'] == [1, 0]
+        window, origin = world.local_window((1, 0), view_range=3)
+        message = {'op': 'update', 'robot': 'r1', 'position': [1, 0], 'origin': list(origin),
+                   'window': window.tolist()}
+        replies = await asyncio.gather(*[service.handle(dict(message)) for _ in range(5)])
+        stats = await service.handle({'op': 'stats'})
+        return replies, stats
+
+    replies, stats = run_until_complete(run())
+    # the first update starts a replan, the four arriving meanwhile share the next one
+    assert [reply['batch'] for reply in replies] == [1, 4, 4, 4, 4]
+    assert stats == {'robots': 1, 'updates': 6, 'replans': 3}
+    assert all(reply['next'] == replies[0]['next'] for reply in replies)
+
+
+def test_robot_drives_through_the_service():
+    world = wall_world()
+    goal = (29, 0)
+
+    async def run():
+        service = PlanningService(world.empty_like(), planner='flat')
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        client = await PlanningClient.connect(port=port)
+        try:
+            path = [(0, 0)]
+            reply = await client.request(op='open', robot='r1', start=path[0], goal=goal)
+            while tuple(reply['next']) != path[-1]:
+                path.append(tuple(reply['next']))
+                window, origin = world.local_window(path[-1], view_range=3)
+                reply = await client.request(op='update', robot='r1', position=path[-1], origin=origin,
+                                             window=window.tolist())
+            errors = [await client.request(op='update', robot='r2', position=[0, 0]),
+                      await client.request(op='jump', robot='r1')]
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+        return path, errors
+
+    path, errors = run_until_complete(run())
+    assert path[-1] == goal
+    assert all(world.is_unoccupied(cell) for cell in path)
+    assert [error['error'] for error in errors] == ["unknown robot 'r2'", "unknown op 'jump'"]
+
+
+def test_bad_updates_are_answered_on_their_own():
+    world = wall_world()
+
+    async def run():
+        service = PlanningService(world.empty_like())
+        await service.handle({'op': 'open', 'robot': 'r1', 'start': [0, 0], 'goal': [29, 0]})
+        window, origin = world.local_window((1, 0), view_range=3)
+        good = {'op': 'update', 'robot': 'r1', 'position': [1, 0], 'origin': list(origin), 'window': window.tolist()}
+        bad = [dict(good, window=[[0, 300]]), dict(good, origin=[-1, 0]), dict(good, window=[[0, 0], [0]]),
+               dict(good, position=[40, 0])]
+        server = await service.serve(port=0)
+        client = await PlanningClient.connect(port=server.sockets[0].getsockname()[1])
+        try:
+            replies = await asyncio.gather(*[client.request(**message) for message in bad + [good]])
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+        return replies, service.sessions['r1']
+
+    replies, session = run_until_complete(run())
+    assert all(reply['error'].startswith('bad request') for reply in replies[:-1])
+    assert replies[-1]['next'] == [2, 0] and replies[-1]['batch'] == 1
+    # only the good window reached the sensed map
+    assert np.array_equal(session.sensed_map.get_map()[:5, :4], world.get_map()[:5, :4])
+
+
+def test_failed_update_does_not_desync_the_batch():
+    world = wall_world()
+
+    async def run():
+        service = PlanningService(world.empty_like())
+        await service.handle({'op': 'open', 'robot': 'r1', 'start': [12, 10], 'goal': [29, 10]})
+        return service.sessions['r1']
+
+    session = run_until_complete(run())
+    (first, first_origin), (last, last_origin) = (world.local_window((13, 10), view_range=3),
+                                                  world.local_window((14, 10), view_range=3))
+    batch = [((13, 10), first_origin, first.copy()), ((13, 10), (-1, 0), first.copy()),
+             ((14, 10), last_origin, last.copy())]
+    replies = replan(session, batch)
+    assert replies[1]['error'].startswith('bad request')
+    assert replies[0] == replies[2] and replies[0]['batch'] == 2
+
+    # both good windows reached the sensed map and the planner, it plans like a fresh one
+    assert np.array_equal(session.sensed_map.get_map()[10:18, 7:14], world.get_map()[10:18, 7:14])
+    fresh = DStarLite(map=world, s_start=session.planner.s_start, s_goal=(29, 10), sensed_map=session.sensed_map)
+    assert list(session.planner.current_path()) == list(fresh.current_path())
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from d_star_lite import DStarLite
+from flat_d_star_lite import FlatDStarLite
+from grid import SLAM
+from instrumentation import PlannerStats
+from snapshot import load_snapshot, save_snapshot
+
+
+PLANNERS = {
+    'dense': lambda **kwargs: DStarLite(**kwargs),
+    'sparse': lambda **kwargs: DStarLite(state='sparse', **kwargs),
+    'lazy': lambda **kwargs: DStarLite(lazy_deletion=True, epsilon=1.5, **kwargs),
+    'kernel': lambda **kwargs: DStarLite(kernel=True, **kwargs),
+    'flat': lambda **kwargs: FlatDStarLite(**kwargs),
+}
+
+
+@pytest.mark.parametrize('planner', sorted(PLANNERS))
+def test_restored_planner_continues_like_the_original(tmp_path, planner, random_world):
+    world = random_world(size=40, density=0.25, seed=4)
+    start, goal = (0, 0), (39, 39)
+    slam = SLAM(map=world, view_range=3)
+    stats = PlannerStats()
+    dstar = PLANNERS[planner](map=world, s_start=start, s_goal=goal, stats=stats, sensed_map=slam.slam_map)
+
+    position = start
+    for _ in range(15):
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        position = dstar.next_step()
+
+    path = str(tmp_path / 'planner.npz')
+    save_snapshot(dstar, path)
+    restored_stats = PlannerStats()
+    restored = load_snapshot(path, stats=restored_stats)
+    assert type(restored) is type(dstar)
+    assert restored.sensed_map is not slam.slam_map
+    assert np.array_equal(restored.sensed_map.get_map(), slam.slam_map.get_map())
+    restored_slam = SLAM(map=world, view_range=3)
+    restored_slam.slam_map = restored.sensed_map
+
+    # both take the same steps and do the same work, the restored one does not plan again
+    stats.reset()
+    while position != goal:
+        changes, slam_map = slam.rescan(global_position=position)
+        dstar.apply_changes(changes=changes, sensed_map=slam_map)
+        restored_changes, restored_map = restored_slam.rescan(global_position=position)
+        restored.apply_changes(changes=restored_changes, sensed_map=restored_map)
+        position = dstar.next_step()
+        assert restored.next_step() == position
+    assert restored_stats.expansions == stats.expansions
+    assert np.array_equal(np.asarray(restored.g), np.asarray(dstar.g))
+
+
+def test_snapshot_without_map(tmp_path, random_world):
+    world = random_world(size=40, density=0.25, seed=4)
+    dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(39, 39), sensed_map=world)
+    dstar.replan()
+    path = str(tmp_path / 'planner.npz')
+    save_snapshot(dstar, path, include_map=False)
+
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+    restored = load_snapshot(path, sensed_map=world)
+    assert restored.sensed_map is world
+    assert list(restored.current_path()) == list(dstar.current_path())
@@ -0,0 +1,90 @@
+import numpy as np
+
+from d_star_lite import DStarLite
+from grid import OccupancyGridMap, SLAM
+from tiled_grid import TiledOccupancyGridMap
+
+OBSTACLE = 255
+
+
+def dense_and_tiled(grid, **kwargs):
+    dense = OccupancyGridMap(x_dim=grid.shape[0], y_dim=grid.shape[1])
+    dense.set_map(grid.copy())
+    tiled = TiledOccupancyGridMap(x_dim=grid.shape[0], y_dim=grid.shape[1], tile_size=16, **kwargs)
+    tiled.set_map(grid)
+    return dense, tiled
+
+
+def test_cell_methods_match_dense_map(random_world):
+    dense, tiled = dense_and_tiled(random_world((70, 90), free=()).get_map())
+    assert np.array_equal(tiled.get_map(), dense.get_map())
+    for pos in [(0, 0), (15, 16), (16, 15), (69, 89), (33, 47)]:
+        assert tiled.is_unoccupied(pos) == dense.is_unoccupied(pos)
+        assert tiled.succ(pos) == dense.succ(pos)
+        assert tiled.succ(pos, avoid_obstacles=True) == dense.succ(pos, avoid_obstacles=True)
+        assert tiled.local_observation(pos, view_range=3) == dense.local_observation(pos, view_range=3)
+        assert np.array_equal(tiled.local_window(pos, 5)[0], dense.local_window(pos, 5)[0])
+    cells = np.array([(0, 0), (15, 16), (69, 89), (31, 32)])
+    for a, b in zip(tiled.succ_batch(cells), dense.succ_batch(cells)):
+        assert np.array_equal(a, b)
+
+    tiled.set_obstacle((40, 40))
+    tiled.remove_obstacle((0, 1))
+    assert not tiled.is_unoccupied((40, 40)) and tiled.is_unoccupied((0, 1))
+
+
+def test_observe_writes_into_tiles(random_world):
+    grid = random_world((70, 90), free=()).get_map()
+    dense, tiled = dense_and_tiled(np.zeros_like(grid))
+    for origin in [(0, 0), (10, 12), (60, 80)]:
+        observed = grid[origin[0]:origin[0] + 20, origin[1]:origin[1] + 20]
+        expected = dense.observe(origin, observed)
+        changes = tiled.observe(origin, observed)
+        assert np.array_equal(changes.cells, expected.cells)
+        assert np.array_equal(changes.old_costs, expected.old_costs)
+    assert np.array_equal(tiled.get_map(), dense.get_map())
+    assert tiled.observe((10, 12), grid[10:30, 12:32]).cells.shape == (0, 2)
+
+
+def test_tiles_are_allocated_lazily():
+    tiled = TiledOccupancyGridMap(x_dim=10000, y_dim=10000, tile_size=100)
+    assert tiled.allocated_tiles == 0
+    assert tiled.is_unoccupied((5000, 5000))
+    tiled.set_obstacle((5000, 5000))
+    tiled.set_obstacle((5001, 5050))
+    assert tiled.allocated_tiles == 1
+    assert not tiled.is_unoccupied((5000, 5000))
+
+
+def test_planning_on_tiled_map(random_world):
+    grid = random_world(40, density=0.15, seed=2, free=()).get_map()
+    grid[0, 0] = grid[39, 39] = 0
+    paths = []
+    for world in dense_and_tiled(grid):
+        dstar = DStarLite(map=world, s_start=(0, 0), s_goal=(39, 39))
+        slam = SLAM(map=world, view_range=3)
+        assert type(slam.slam_map) is type(world)
+        position = (0, 0)
+        path = [position]
+        while position != (39, 39):
+            changes, slam_map = slam.rescan(global_position=position)
+            dstar.apply_changes(changes=changes, sensed_map=slam_map)
+            position = dstar.next_step()
+            path.append(position)
+        paths.append(path)
+    assert paths[0] == paths[1]
+
+
+def test_memory_mapped_map_reopens(tmp_path, random_world):
+    path = str(tmp_path / 'site.npy')
+    grid = random_world((70, 90), free=()).get_map()
+    _, tiled = dense_and_tiled(grid, path=path)
+    tiled.set_obstacle((1, 2))
+    tiled.flush()
+    grid[1, 2] = OBSTACLE
+    del tiled
+
+    reopened = TiledOccupancyGridMap.open(path)
+    assert (reopened.x_dim, reopened.y_dim, reopened.tile_size) == (70, 90, 16)
+    assert np.array_equal(reopened.get_map(), grid)
+    assert not reopened.is_unoccupied((1, 2))